@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+binlog_bench.py
+
+Size and CPU comparison of the telemetry log formats in utils/logger.py:
+
+  csv (old)   strftime timestamp per row + csv.writer, as before the
+              binary format existed
+  csv         timestamp / fault words formatted in the writer thread
+              (logger._csv_row) + csv.writer
+  binary      utils/binlog.BinaryLogWriter fixed struct records
+
+Also times reading a column back (csv.reader vs the mmap numpy reader)
+and checks that `binlog convert` reproduces the CSV writer's output.
+
+Run from vcu_project/:  python Testing/binlog_bench.py [rows]
+Exit code is 1 if the converted CSV differs from the live CSV.
+"""
+
+import csv
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy    # noqa: F401  (imported up front so the read timing excludes it)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import binlog
+from utils import logger
+
+ROWS = 20000
+
+
+def make_rows(n):
+    """Rows shaped like logger.log_data output (raw timestamp and fault words)."""
+    rnd = random.Random(1)
+    t0 = time.time_ns()
+    m0 = time.monotonic_ns()
+    rows = []
+    for i in range(n):
+        rpm = rnd.randint(0, 1500)
+        stale = i % 97 == 0
+        rows.append([
+            t0 + i * 100_000_000,
+            rpm, rnd.randint(0, 2000), float(rpm - 3), 1, rpm + 2.4, rpm - 1.6,
+            1, 0, 1, 0,
+            round(rnd.uniform(25, 60), 2), round(rnd.uniform(25, 60), 2), "" if stale else 41.37,
+            3,
+            round(rnd.uniform(48, 58), 1), round(rnd.uniform(-120, 0), 2), 98, 153, 100, 35,
+            *([""] * 6 if stale else [round(rnd.uniform(48, 58), 1), -42.17, 97, 160, 100, 36]),
+            round(rnd.uniform(0, 30), 3), round(rnd.uniform(0, 30), 3), round(rnd.uniform(0, 40), 3),
+            0, 0x0042 if i % 500 == 0 else 0, 0,
+            m0 + i * 100_000_000,
+        ])
+        # Window statistics columns (config.LOG_STATS)
+        rows[-1] += [float(rpm + k) for k in range(len(logger.DATA_HEADERS) - len(rows[-1]))]
+    return rows
+
+
+def write_csv_old(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(logger.DATA_HEADERS)
+        for row in rows:
+            row = list(row)
+            row[0] = datetime.fromtimestamp(row[0] / 1e9).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            writer.writerow(row)
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(logger.DATA_HEADERS)
+        for row in rows:
+            writer.writerow(logger._csv_row(row))
+
+
+def write_binary(path, rows):
+    log = binlog.BinaryLogWriter(path, logger.DATA_FIELDS)
+    for row in rows:
+        log.write(row)
+    log.close()
+
+
+def timed(func, *args):
+    start = time.process_time()
+    result = func(*args)
+    return time.process_time() - start, result
+
+
+def read_csv_column(path, name):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        index = next(reader).index(name)
+        return [float(row[index]) if row[index] else math.nan for row in reader]
+
+
+def read_binary_column(path, name):
+    log = binlog.BinaryLog(path)
+    try:
+        return log.column(name).copy()
+    finally:
+        log.close()
+
+
+def same(a, b):
+    try:
+        return math.isclose(float(a), float(b), rel_tol=1e-3, abs_tol=0.011)
+    except ValueError:
+        return a == b
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rows = make_rows(n)
+    tmp = tempfile.mkdtemp(prefix="binlog_bench_")
+    paths = {name: os.path.join(tmp, name) for name in ("old.csv", "new.csv", "log.vbl", "conv.csv")}
+
+    results = [
+        ("csv (old)", timed(write_csv_old, paths["old.csv"], rows)[0], paths["old.csv"]),
+        ("csv", timed(write_csv, paths["new.csv"], rows)[0], paths["new.csv"]),
+        ("binary", timed(write_binary, paths["log.vbl"], rows)[0], paths["log.vbl"]),
+    ]
+    print(f"{n} rows, {len(logger.DATA_HEADERS)} columns")
+    print(f"{'format':12} {'bytes/row':>10} {'total KiB':>10} {'write us/row':>13}")
+    for name, cpu, path in results:
+        size = os.path.getsize(path)
+        print(f"{name:12} {size / n:10.1f} {size / 1024:10.0f} {cpu / n * 1e6:13.1f}")
+
+    column = "FeedbackRPM_Left"
+    csv_cpu, csv_col = timed(read_csv_column, paths["new.csv"], column)
+    bin_cpu, bin_col = timed(read_binary_column, paths["log.vbl"], column)
+    print(f"read {column}: csv {csv_cpu * 1000:.1f} ms, binary (mmap/numpy) {bin_cpu * 1000:.1f} ms")
+
+    conv_cpu, _ = timed(lambda: binlog.main(["convert", paths["log.vbl"], paths["conv.csv"]]))
+    print(f"convert to csv: {conv_cpu * 1000:.0f} ms")
+
+    with open(paths["new.csv"], newline="") as a, open(paths["conv.csv"], newline="") as b:
+        mismatches = sum(1 for ra, rb in zip(csv.reader(a), csv.reader(b))
+                         for va, vb in zip(ra, rb) if not same(va, vb))
+    print(f"converted csv vs live csv: {mismatches} mismatched cells")
+    shutil.rmtree(tmp)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+diag_bench.py
+
+Console cost in the 20 Hz control loop: print() vs utils/diag.py.
+
+A child process runs a 20 Hz control tick for a few seconds while a CAN
+thread (60 motor feedback frames/s) runs next to it, each making the
+console calls the old code made in that situation (throttle read failing,
+BMSManager without a DBC entry for the frame):
+
+  control tick   "Throttle/feedback drive failed: ..." every tick
+                 the logger's two BMS current prints every 10th tick (2 rows/s)
+  CAN thread     "[BMSManager] DBC decode failed: ..." per frame
+                 "Decoded: {...}" BMS dict every 20th frame
+
+  none    no console calls (baseline: the timer and an empty call)
+  print   the old print() calls
+  diag    the new calls at config.LOG_LEVEL (error rate-limited to one per
+          config.DIAG_RATE_S per call site, debug dropped at INFO)
+
+The child's stdout goes to:
+  pipe       a reader draining it as fast as it can
+  stalled    a 4 KiB pipe whose reader stops for 1 s out of every 2
+             (journald busy flushing / rotating: the pipe fills and
+             write() blocks the thread that prints)
+  journald   systemd-cat, when a journal is running
+
+Reported per control tick: time spent in the console calls (mean / p99 /
+max); for the run: the child's CPU time (all threads, incl. its write()
+syscalls) per second and the bytes it sent to stdout. The child runs with
+PYTHONUNBUFFERED=1 as under systemd.
+
+Run from vcu_project/:  python Testing/diag_bench.py [seconds]   (default 10)
+"""
+
+import fcntl
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+F_SETPIPE_SZ = 1031          # linux/fcntl.h
+TICK_HZ = 20
+FRAME_HZ = 60
+BMS_DICT = {"battery_voltage": 52.4, "current": -12.3, "soc": 81.0, "max_voltage": 3412,
+            "min_voltage": 3398, "max_voltage_cells": 4, "min_voltage_cells": 11,
+            "max_temp": 31, "max_temp_cell": 2, "min_temp": 29, "min_temp_cell": 5,
+            "charge_dis_status": 2, "charge_mos_status": 1, "dis_mos_status": 1,
+            "bms_life": 97, "residual_capacity": 88.2}
+
+
+# ---------------- Child ----------------
+def child(mode, seconds):
+    if mode == "diag":
+        from utils import diag
+
+        def drive_failed(e):
+            diag.error("Drive", "Throttle/feedback drive failed: %s", e)
+
+        def bms_currents(a, b):
+            diag.debug("Logger", "BMS currents %s / %s", a, b)
+
+        def dbc_failed(e):
+            diag.debug("BMSManager", "DBC decode failed: %s", e)
+
+        def decoded(d):
+            diag.debug("BMS", "Decoded: %s", d)
+    elif mode == "none":
+        def drive_failed(e):
+            pass
+
+        bms_currents = dbc_failed = decoded = lambda *args: None
+    else:
+        def drive_failed(e):
+            print(f"Throttle/feedback drive failed: {e}")
+
+        def bms_currents(a, b):
+            print(a)
+            print(b)
+
+        def dbc_failed(e):
+            print("[BMSManager] DBC decode failed:", e)
+
+        def decoded(d):
+            print(d)
+
+    running = True
+
+    def can_thread():
+        n = 0
+        next_t = time.monotonic()
+        while running:
+            dbc_failed(KeyError(0x0CF11E04 + n % 3))
+            if n % 20 == 0:
+                decoded(BMS_DICT)
+            n += 1
+            next_t += 1.0 / FRAME_HZ
+            time.sleep(max(0.0, next_t - time.monotonic()))
+
+    t = threading.Thread(target=can_thread, daemon=True)
+    t.start()
+    costs = []
+    next_t = time.monotonic()
+    for tick in range(int(seconds * TICK_HZ)):
+        t0 = time.perf_counter()
+        drive_failed(RuntimeError("no throttle reading"))
+        if tick % 10 == 0:
+            bms_currents(-12.3, -11.8)
+        costs.append(time.perf_counter() - t0)
+        next_t += 1.0 / TICK_HZ
+        time.sleep(max(0.0, next_t - time.monotonic()))
+    running = False
+    t.join()
+    if mode == "diag":
+        diag.flush()
+    cpu = os.times()
+    costs.sort()
+    n = len(costs)
+    sys.stderr.write(f"{sum(costs) / n * 1e6:.1f} {costs[int(n * 0.99)] * 1e6:.1f} {costs[-1] * 1e6:.1f} "
+                     f"{(cpu.user + cpu.system) / seconds * 1000:.2f}\n")
+
+
+# ---------------- Parent ----------------
+def drain(stream, counter, stall):
+    start = time.monotonic()
+    while True:
+        if stall and (time.monotonic() - start) % 2.0 < 1.0:
+            time.sleep(0.01)
+            continue
+        chunk = stream.read1(65536)
+        if not chunk:
+            return
+        counter[0] += len(chunk)
+
+
+def run(mode, sink, seconds):
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", mode, str(seconds)]
+    counter = [0]
+    if sink == "journald":
+        cat = subprocess.Popen(["systemd-cat", "-t", "vcu-diag-bench"], stdin=subprocess.PIPE)
+        proc = subprocess.Popen(cmd, stdout=cat.stdin, stderr=subprocess.PIPE, env=env)
+        cat.stdin.close()
+        reader = None
+    else:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        if sink == "stalled":
+            fcntl.fcntl(proc.stdout.fileno(), F_SETPIPE_SZ, 4096)
+        reader = threading.Thread(target=drain, args=(proc.stdout, counter, sink == "stalled"))
+        reader.start()
+    err = proc.stderr.read().decode()
+    proc.wait()
+    if reader:
+        reader.join()
+    else:
+        cat.wait()
+    mean, p99, worst, cpu = (float(v) for v in err.split()[-4:])
+    sent = f"{counter[0] / seconds / 1024:7.1f} KiB/s" if reader else "      -"
+    print(f"{sink:10} {mode:6} {mean:9.1f} {p99:9.1f} {worst:9.1f} {cpu:9.2f}   {sent}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], float(sys.argv[3]))
+        return 0
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    sinks = ["pipe", "stalled"]
+    if shutil.which("systemd-cat") and os.path.exists("/run/systemd/journal/stdout"):
+        sinks.append("journald")
+    print(f"{seconds:.0f} s per run, {TICK_HZ} Hz control tick, {FRAME_HZ} CAN frames/s")
+    print(f"{'stdout':10} {'calls':6} {'mean us':>9} {'p99 us':>9} {'max us':>9} {'cpu ms/s':>9}   stdout")
+    for sink in sinks:
+        for mode in ("none", "print", "diag"):
+            run(mode, sink, seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+import_audit.py
+
+Imports every runtime module of the VCU and reports any I/O done at
+import time (files, sockets, subprocesses, new directories, threads).
+Device handles must only be created by the startup phases in main.py.
+
+Run from vcu_project/:  python Testing/import_audit.py
+Exit code is 1 if any module does I/O on import.
+"""
+
+import os
+import sys
+import time
+import threading
+import importlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODULES = [
+    "config", "state", "hal", "startup",
+    "canbus.can_reader", "canbus.can_bus_active",
+    "control.motor_manager", "control.on_road", "control.mode_manager",
+    "sensors.Current_sensor_acs", "sensors.temperature_sensor",
+    "utils.logger", "utils.machine_stats",
+    "display.lcd_display", "display.lcd_display_th",
+    "display.st7920_driver", "display.st7920_graphic", "display.st7920_spi",
+    "main",
+]
+
+# Reading module source / extension files and installed package metadata is
+# what importing is; anything else counts.
+CODE_SUFFIXES = (".py", ".pyc", ".so", ".pth")
+LIB_PREFIXES = tuple({sys.prefix, sys.base_prefix, sys.exec_prefix})
+IO_EVENTS = ("open", "os.mkdir", "os.system", "subprocess.Popen", "socket.socket",
+             "socket.connect", "socket.bind", "fcntl.ioctl")
+
+findings = []
+current = [None]
+
+
+def _audit(event, args):
+    if current[0] is None or not event.startswith(IO_EVENTS):
+        return
+    if event == "open":
+        path = str(args[0])
+        if path.endswith(CODE_SUFFIXES) or path.startswith(LIB_PREFIXES) or os.path.isdir(path):
+            return
+    findings.append((current[0], event, args[:2]))
+
+
+_thread_start = threading.Thread.start
+
+
+def _start(self):
+    if current[0] is not None:
+        findings.append((current[0], "thread.start", (self.name,)))
+    return _thread_start(self)
+
+
+def main():
+    sys.addaudithook(_audit)
+    threading.Thread.start = _start
+
+    failed = 0
+    for name in MODULES:
+        current[0] = name
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            status = "ok"
+        except ImportError as e:
+            status = f"skipped ({e})"
+        except Exception as e:
+            status = f"FAILED ({e!r})"
+            failed += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        current[0] = None
+        print(f"{name:<30}{elapsed:8.1f} ms  {status}")
+
+    threading.Thread.start = _thread_start
+
+    if findings:
+        print("\nI/O at import time:")
+        for module, event, args in findings:
+            print(f"  {module:<28}{event:<18}{args}")
+    else:
+        print("\nNo I/O at import time.")
+    return 1 if findings or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+log_query_bench.py
+
+Time-range extraction on a simulated day of logs (utils/log_query.py).
+
+Writes one day of CSV segments the way utils/logger.py does (rotation at
+config.LOG_SEGMENT_KB / LOG_SEGMENT_MINUTES, a sidecar index entry every
+config.LOG_INDEX_EVERY rows) with enough rows per second to reach the
+requested size, then extracts the 10 minutes around 14:32:
+
+  scan      csv.reader over every segment, keeping the rows in range
+            (what extracting a range cost without the index)
+  indexed   log_query.query() rows / query_arrays() numpy columns
+
+first on the raw segments, then again after compressing them with
+LogArchiver.compress() (gzip members on index entries). The indexed rows
+must match the scanned rows.
+
+Run from vcu_project/:  python Testing/log_query_bench.py [GB]   (default 2)
+Needs about 1.2x that much free space in the temp directory.
+"""
+
+import csv
+import gzip
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy    # noqa: F401  (imported up front so the query timing excludes it)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from utils import clock
+from utils import log_index
+from utils import log_query
+from utils import logger
+from utils.log_archive import LogArchiver
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from binlog_bench import make_rows
+
+
+def row_tails(n):
+    """CSV text of `n` logger rows after the Timestamp cell (",...\\r\\n")."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in make_rows(n):
+        writer.writerow(logger._csv_row(row)[1:])
+    return ["," + line + "\r\n" for line in buf.getvalue().split("\r\n")[:-1]]
+
+
+def write_day(directory, day_start, size):
+    """Write a day of segments of about `size` bytes; returns (rows, segments)."""
+    tails = row_tails(1000)
+    row_bytes = 24 + sum(map(len, tails)) / len(tails)
+    n_rows = max(1, round(size / row_bytes))
+    step = 86400 * clock.NS // n_rows
+    header = (",".join(logger.DATA_HEADERS) + "\r\n").encode()
+    every = config.LOG_INDEX_EVERY
+    seg_bytes = config.LOG_SEGMENT_KB * 1024
+    seg_ns = config.LOG_SEGMENT_MINUTES * 60 * clock.NS
+
+    f = index = None
+    segments = offset = seg_start = 0
+    second, prefix = None, ""
+    for r0 in range(0, n_rows, every):
+        ts = day_start + r0 * step
+        if f is None or offset >= seg_bytes or ts - seg_start >= seg_ns:
+            if f:
+                f.close()
+                index.close()
+            path = os.path.join(directory, clock.format_ns(ts, 0, "%Y-%m-%d_%H%M%S_data.csv"))
+            f = open(path, "wb")
+            index = log_index.IndexWriter(log_index.index_path(path))
+            f.write(header)
+            offset, seg_start = len(header), ts
+            segments += 1
+        parts = []
+        for r in range(r0, min(n_rows, r0 + every)):
+            sec, frac = divmod(r * step, clock.NS)
+            if sec != second:
+                second, prefix = sec, clock.format_ns(day_start + sec * clock.NS, 0)
+            parts.append(f"{prefix}.{frac // 1_000_000:03d}{tails[r % 1000]}")
+        chunk = "".join(parts).encode()
+        index.add(ts, offset)
+        f.write(chunk)
+        offset += len(chunk)
+    f.close()
+    index.close()
+    return n_rows, segments
+
+
+def scan(directory, start_ns, end_ns):
+    """Rows in range found by reading every segment from the start."""
+    lo, hi = clock.format_ns(start_ns), clock.format_ns(end_ns)
+    found = []
+    for _, _, path in log_query.segments(directory):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            found += [row for row in reader if lo <= row[0] <= hi]
+    return found
+
+
+def indexed(directory, start_ns, end_ns):
+    return [row for _, _, rows in log_query.query(directory, start_ns, end_ns) for row in rows]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def report(label, directory, start_ns, end_ns):
+    t_scan, scanned = timed(scan, directory, start_ns, end_ns)
+    t_rows, rows = timed(indexed, directory, start_ns, end_ns)
+    t_arr, arrays = timed(log_query.query_arrays, directory, start_ns, end_ns,
+                          ["Timestamp", "CurrentRPM", "BMS1_Current"])
+    ok = rows == scanned and len(arrays["Timestamp"]) == len(rows)
+    print(f"{label:12} scan {t_scan:8.2f} s   indexed rows {t_rows * 1000:8.1f} ms   "
+          f"arrays {t_arr * 1000:8.1f} ms   {len(rows)} rows  {'ok' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main():
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    tmp = tempfile.mkdtemp(prefix="log_query_bench_")
+    day = datetime.combine(datetime.now().date() - timedelta(days=1), datetime.min.time())
+    day_start = int(day.timestamp()) * clock.NS
+    centre = day_start + (14 * 3600 + 32 * 60) * clock.NS
+    start_ns, end_ns = centre - 5 * 60 * clock.NS, centre + 5 * 60 * clock.NS
+    try:
+        t_write, (rows, segments) = timed(write_day, tmp, day_start, size * 1e9)
+        raw = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp) if n.endswith(".csv"))
+        idx = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp) if n.endswith(".idx"))
+        print(f"{rows} rows ({rows / 86400:.0f}/s), {segments} segments, {raw / 1e9:.2f} GB csv, "
+              f"{idx / 1024:.0f} KiB index, written in {t_write:.0f} s")
+        print(f"range {clock.format_ns(start_ns)} .. {clock.format_ns(end_ns)}")
+        ok = report("raw csv", tmp, start_ns, end_ns)
+
+        archiver = LogArchiver(tmp, "gzip", level=1)
+        t_zip = 0.0
+        stored = 0
+        for _, _, path in log_query.segments(tmp):
+            _, size_out, seconds = archiver.compress(path)
+            t_zip += seconds
+            stored += size_out
+        print(f"gzip -1: {stored / 1e9:.2f} GB in {t_zip:.0f} s")
+        ok = report("csv.gz", tmp, start_ns, end_ns) and ok
+    finally:
+        shutil.rmtree(tmp)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+traction_slip_sim.py
+
+Check of control/traction_control.py against the simulated motor plant
+(hal.sim.SimMotorPlant): the wheels lag their command (tau 0.3 s), so a
+command ramped down at WHEEL_DECEL_RATE leaves the feedback well above
+it. That is coasting, not slip. No bus or hardware: the plant, the slew
+limiters and traction control are stepped directly, TX at the
+MotorManager rate and feedback at the controllers' rate.
+
+Cases (both wheels):
+  throttle release    2000 rpm, then target 0
+  partial release     2500 rpm, then target 1000
+  reversal            2000 rpm forward, direction change to 2000 reverse
+                      (ramp-down, DIRECTION_PAUSE, switch, ramp-up as in
+                      control/on_road.py)
+  wheel loses grip    2000 rpm, left wheel gain jumps to 1.5 (must detect)
+
+Run from vcu_project/:  python Testing/traction_slip_sim.py
+Exit code is 1 if a coasting case reports slip or the grip loss goes unseen.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state
+from hal.sim import SimMotorPlant
+from control import on_road
+from control.motor_manager import UPDATE_RATE_HZ
+from control.slew_limiter import SlewLimiter
+from control.traction_control import TractionControl, LEFT_DEVICE, RIGHT_DEVICE
+
+STEP_HZ = 100
+FEEDBACK_HZ = 50
+DURATION = 7.0
+EVENT_AT = 3.0
+FORWARD, REVERSE = 0x01, 0x02
+TX_EVERY = STEP_HZ // UPDATE_RATE_HZ
+FEEDBACK_EVERY = STEP_HZ // FEEDBACK_HZ
+
+# (name, rpm before EVENT_AT, rpm after, reverse at EVENT_AT, left gain after, expect slip)
+CASES = [
+    ("throttle release", 2000, 0, False, 1.0, False),
+    ("partial release", 2500, 1000, False, 1.0, False),
+    ("reversal", 2000, 2000, True, 1.0, False),
+    ("wheel loses grip", 2000, 2000, False, 1.5, True),
+]
+
+
+def run_case(before, after, reverse, gain):
+    plant = SimMotorPlant()
+    traction = TractionControl(enabled=True)
+    slew = {dev: SlewLimiter(state.WHEEL_ACCEL_RATE, state.WHEEL_DECEL_RATE, state.EMERGENCY_DECEL_RATE)
+            for dev in (LEFT_DEVICE, RIGHT_DEVICE)}
+    out = {LEFT_DEVICE: 0, RIGHT_DEVICE: 0}
+    direction = FORWARD
+    state.dir_change_phase = on_road.DIR_IDLE
+    pause_end = None
+    min_factor = 1.0
+    dt = 1.0 / STEP_HZ
+
+    for i in range(int(DURATION * STEP_HZ)):
+        now = i * dt
+        target = before
+        if now >= EVENT_AT:
+            target = after
+            plant.gains[LEFT_DEVICE] = gain
+
+        # Reversal, sequenced like on_road.advance_direction_change
+        if reverse and now >= EVENT_AT and direction == FORWARD:
+            phase = state.dir_change_phase
+            if phase == on_road.DIR_IDLE:
+                phase = on_road.DIR_RAMP_DOWN
+            if phase == on_road.DIR_RAMP_DOWN and out[LEFT_DEVICE] == 0 and out[RIGHT_DEVICE] == 0:
+                phase = on_road.DIR_PAUSE
+                pause_end = now + state.DIRECTION_PAUSE
+            elif phase == on_road.DIR_PAUSE and now >= pause_end:
+                direction = REVERSE
+                phase = on_road.DIR_IDLE
+            state.dir_change_phase = phase
+            if phase != on_road.DIR_IDLE:
+                target = 0
+
+        if i % TX_EVERY == 0:
+            for dev in (LEFT_DEVICE, RIGHT_DEVICE):
+                out[dev], cmd_dir = slew[dev].update(target, direction, now)
+            rpm_l, rpm_r = traction.limit(out[LEFT_DEVICE], out[RIGHT_DEVICE])
+            plant.on_command(LEFT_DEVICE, rpm_l, cmd_dir)
+            plant.on_command(RIGHT_DEVICE, rpm_r, cmd_dir)
+
+        plant.step(dt)
+        if i % FEEDBACK_EVERY == 0:
+            for dev in (LEFT_DEVICE, RIGHT_DEVICE):
+                traction.on_feedback(dev, int(round(plant.rpm[dev])), now, out[dev])
+            min_factor = min(min_factor, *traction.factor)
+
+    state.dir_change_phase = on_road.DIR_IDLE
+    return traction.events, min_factor
+
+
+def main():
+    failed = 0
+    print(f"{'case':<22}{'events':>8}{'min factor':>12}{'result':>8}")
+    for name, before, after, reverse, gain, expect in CASES:
+        events, min_factor = run_case(before, after, reverse, gain)
+        ok = (events > 0) == expect
+        failed += not ok
+        print(f"{name:<22}{events:>8}{min_factor:>12.2f}{'ok' if ok else 'FAIL':>8}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+watchdog_latency.py
+
+Measures how long utils/watchdog.py takes to react to a hung loop: a
+20 Hz loop beats a RESPONSE_STOP heartbeat (deadline 0.2 s, like the
+control loop in main.py), then stops beating as if hung. The time from
+its last beat to the first stop_all() call is the stop latency; it must
+stay well under MotorManager.TIMEOUT_SEC (0.5 s).
+
+Run from vcu_project/:  python Testing/watchdog_latency.py
+Exit code is 1 if any trial exceeds the budget.
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import watchdog as wd
+
+TRIALS = 10
+LOOP_PERIOD = 0.05
+DEADLINE = 0.2
+BUDGET = 0.5
+
+
+class StopRecorder:
+    """Stands in for MotorManager: records when stop_all() is first called."""
+
+    def __init__(self):
+        self.stopped_at = None
+
+    def stop_all(self, emergency=False):
+        if self.stopped_at is None:
+            self.stopped_at = time.monotonic()
+
+
+def trial(index):
+    motors = StopRecorder()
+    dog = wd.Watchdog(motors, device="")
+    hb = dog.register("control", DEADLINE, wd.RESPONSE_STOP)
+    hang = threading.Event()
+
+    def loop():
+        while not hang.is_set():
+            hb.beat()
+            time.sleep(LOOP_PERIOD)
+
+    worker = threading.Thread(target=loop, daemon=True)
+    dog.start()
+    worker.start()
+    time.sleep(0.5 + 0.013 * index)     # stagger the hang against the check phase
+    hang.set()
+    worker.join()
+    last_beat = hb.last
+    time.sleep(DEADLINE + 3 * wd.CHECK_PERIOD)
+    dog.stop()
+    return motors.stopped_at - last_beat if motors.stopped_at else None
+
+
+def main():
+    latencies = [trial(i) for i in range(TRIALS)]
+    failed = [lat for lat in latencies if lat is None or lat > BUDGET]
+    valid = [lat for lat in latencies if lat is not None]
+    print(f"deadline {DEADLINE * 1000:.0f} ms, check period {wd.CHECK_PERIOD * 1000:.0f} ms, {TRIALS} trials")
+    if valid:
+        print(f"last beat -> stop_all: min {min(valid) * 1000:.0f} ms, "
+              f"mean {sum(valid) / len(valid) * 1000:.0f} ms, max {max(valid) * 1000:.0f} ms "
+              f"(budget {BUDGET * 1000:.0f} ms)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+wheel_sync_sim.py
+
+Closed-loop check of control/wheel_sync.py against the simulated motor
+plant (hal.sim.SimMotorPlant) with mismatched left/right wheels. No bus
+or hardware: the plant is stepped directly at the feedback rate.
+
+For each case it prints the steady-state differential error with and
+without sync, and how long the synced loop takes to get (and stay)
+inside FEEDBACK_TOLERANCE after a step command from standstill.
+
+Run from vcu_project/:  python Testing/wheel_sync_sim.py
+Exit code is 1 if any synced case fails to converge.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import state
+from hal.sim import SimMotorPlant
+from control.wheel_sync import WheelSync, LEFT_DEVICE, RIGHT_DEVICE
+
+FEEDBACK_HZ = 50
+DURATION = 6.0
+DIRECTION = 0x01
+
+# (name, left gain, right gain, left cmd, right cmd)
+CASES = [
+    ("straight, left 8% slow", 0.92, 1.00, 1000, 1000),
+    ("straight, right 7% slow", 1.00, 0.93, 1200, 1200),
+    ("differential 900/600, left 10% fast", 1.10, 1.00, 900, 600),
+    ("straight, left 20% slow (saturates)", 0.80, 1.00, 1000, 1000),
+    ("below LOW_RPM_FEEDBACK_OFF", 0.80, 1.00, 250, 250),
+]
+
+
+def run_case(gain_l, gain_r, cmd_l, cmd_r, synced):
+    plant = SimMotorPlant(gains={LEFT_DEVICE: gain_l, RIGHT_DEVICE: gain_r})
+    sync = WheelSync()
+    dt = 1.0 / FEEDBACK_HZ
+    settled_at = None
+    error = 0.0
+
+    for i in range(int(DURATION * FEEDBACK_HZ)):
+        now = i * dt
+        trim_l, trim_r = (sync.trim_left, sync.trim_right) if synced else (0, 0)
+        plant.on_command(LEFT_DEVICE, max(0, cmd_l - trim_l), DIRECTION)
+        plant.on_command(RIGHT_DEVICE, max(0, cmd_r - trim_r), DIRECTION)
+        plant.step(dt)
+
+        fb_l = int(round(plant.rpm[LEFT_DEVICE]))
+        fb_r = int(round(plant.rpm[RIGHT_DEVICE]))
+        sync.on_feedback(RIGHT_DEVICE, fb_r, now, cmd_l, cmd_r)
+        sync.on_feedback(LEFT_DEVICE, fb_l, now, cmd_l, cmd_r)
+
+        error = (fb_l - fb_r) - (cmd_l - cmd_r)
+        if abs(error) <= state.FEEDBACK_TOLERANCE:
+            if settled_at is None:
+                settled_at = now
+        else:
+            settled_at = None
+
+    return error, settled_at, sync
+
+
+def main():
+    failed = 0
+    print(f"{'case':<38}{'open err':>10}{'sync err':>10}{'settle s':>10}{'trim L/R':>12}")
+    for name, gain_l, gain_r, cmd_l, cmd_r in CASES:
+        open_err, _, _ = run_case(gain_l, gain_r, cmd_l, cmd_r, synced=False)
+        err, settled, sync = run_case(gain_l, gain_r, cmd_l, cmd_r, synced=True)
+        trim = max(sync.trim_left, sync.trim_right)
+        if min(cmd_l, cmd_r) < state.LOW_RPM_FEEDBACK_OFF:
+            ok = trim == 0
+            settle = "bypass"
+        elif abs(open_err) - state.RE_ALIGN_RPM_REDUCTION > state.FEEDBACK_TOLERANCE:
+            # Mismatch beyond the trim authority: must sit at the limit, not wind up
+            ok = trim == state.RE_ALIGN_RPM_REDUCTION and abs(sync.integral) <= trim
+            settle = "limit"
+        else:
+            ok = settled is not None
+            settle = f"{settled:.2f}" if ok else "never"
+        failed += not ok
+        print(f"{name:<38}{open_err:>10.0f}{err:>10.0f}{settle:>10}"
+              f"{f'{sync.trim_left}/{sync.trim_right}':>12}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,13 @@
-import os
-import time
+import hal
 
 def check_can0():
-    result = os.popen("ip link show can0").read()
-    if "DOWN" in result:
-        print("can0 is DOWN. Restarting...")
-        os.system("sudo ip link set can0 down")
-        os.system("sudo ip link set can0 type can bitrate 500000 restart-ms 100")
-        os.system("sudo ip link set can0 up")
+    """Bring can0 up if the kernel reports it down (reads sysfs, no shell parsing)."""
+    link = hal.can_link("can0")
+    if link["operstate"] != "up":
+        print(f"can0 is {link['operstate'].upper()}. Restarting...")
+        hal.restart_can("can0")
     else:
         print("can0 is UP.")
 
-while True:
+if __name__ == "__main__":
     check_can0()
-    break
-
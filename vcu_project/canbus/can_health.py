@@ -0,0 +1,279 @@
+# can_health.py
+# CAN bus health: controller error state from error frames, interface
+# status from the kernel, recovery decided from those, and outage timing.
+#
+# Error frames (linux/can/error.h, enabled by python-can's socketcan bus):
+#   arbitration_id  class bits (CAN_ERR_BUSOFF, CAN_ERR_RESTARTED, ...)
+#   data[1]         controller status (warning / passive / active)
+#   data[6], [7]    TX / RX error counters (with CAN_ERR_CNT)
+#
+# Recovery ladder:
+#   error-warning / error-passive  record only; the controller recovers
+#                                  on its own once traffic is ACKed
+#   bus-off                        the kernel restarts after restart-ms;
+#                                  if it has not after BUSOFF_GRACE, restart
+#                                  the interface (hal.restart_can)
+#   interface down / send ENETDOWN restart, at most every RESTART_BACKOFF
+# After any restart the python-can bus objects are re-opened and handed to
+# the listeners (MotorManager, BMSManager) without restarting the process.
+import errno
+import time
+import threading
+
+import hal
+import state
+from utils import blackbox
+from utils import diag
+
+# ---------------- Config ----------------
+RECV_TIMEOUT = 0.05
+LINK_POLL = 0.5             # s between interface status reads
+BUSOFF_GRACE = 0.5          # s to wait for the kernel's own bus-off restart
+RESTART_BACKOFF = 2.0       # s between interface restarts
+
+# Error frame class bits (can_id)
+CAN_ERR_CRTL = 0x004
+CAN_ERR_BUSOFF = 0x040
+CAN_ERR_RESTARTED = 0x100
+CAN_ERR_CNT = 0x200
+
+# Controller status bits (data[1])
+CAN_ERR_CRTL_RX_WARNING = 0x04
+CAN_ERR_CRTL_TX_WARNING = 0x08
+CAN_ERR_CRTL_RX_PASSIVE = 0x10
+CAN_ERR_CRTL_TX_PASSIVE = 0x20
+CAN_ERR_CRTL_ACTIVE = 0x40
+
+ERROR_ACTIVE = "error-active"
+ERROR_WARNING = "error-warning"
+ERROR_PASSIVE = "error-passive"
+BUS_OFF = "bus-off"
+LINK_DOWN = "down"
+
+# The running monitor, so safe_send can report without holding a reference
+monitor = None
+
+
+def on_send_error(exc):
+    """Called by safe_send with the CanError from bus.send()."""
+    if monitor is not None:
+        monitor.send_error(exc)
+
+
+def state_from_counters(tec, rec):
+    """ISO 11898 fault confinement state from the error counters."""
+    worst = max(tec, rec)
+    if tec >= 256:
+        return BUS_OFF
+    if worst >= 128:
+        return ERROR_PASSIVE
+    if worst >= 96:
+        return ERROR_WARNING
+    return ERROR_ACTIVE
+
+
+class CanHealthMonitor:
+    def __init__(self, channel="can0"):
+        self.channel = channel
+        self.bus = None                 # own socket: sees every frame incl. error frames
+        self.listeners = []             # callables(new_bus) after a re-open
+
+        self.state = ERROR_ACTIVE
+        self.tec = 0
+        self.rec = 0
+        self.link = {}
+        self.busoff_since = None
+        self.last_restart = 0.0
+        self.outage_start = None
+        self.outages = 0
+        self.last_outage = 0.0
+        self.total_outage = 0.0
+        self.error_frames = 0
+        self.tx_overflows = 0
+
+        self.running = False
+        self.thread = None
+
+    def add_listener(self, func):
+        self.listeners.append(func)
+
+    # ----------- Inputs -----------
+    def error_frame(self, msg, now):
+        """Update the controller state from one error frame."""
+        self.error_frames += 1
+        cls = msg.arbitration_id
+        data = msg.data
+
+        if cls & CAN_ERR_CNT and len(data) >= 8:
+            self.tec, self.rec = data[6], data[7]
+        new = state_from_counters(self.tec, self.rec)
+
+        if cls & CAN_ERR_CRTL and len(data) >= 2:
+            ctrl = data[1]
+            if ctrl & (CAN_ERR_CRTL_RX_PASSIVE | CAN_ERR_CRTL_TX_PASSIVE):
+                new = ERROR_PASSIVE
+            elif ctrl & (CAN_ERR_CRTL_RX_WARNING | CAN_ERR_CRTL_TX_WARNING):
+                new = ERROR_WARNING
+            elif ctrl & CAN_ERR_CRTL_ACTIVE:
+                new = ERROR_ACTIVE
+
+        if cls & CAN_ERR_BUSOFF:
+            new = BUS_OFF
+        if cls & CAN_ERR_RESTARTED:
+            # Kernel restarted the controller after bus-off
+            self.tec = self.rec = 0
+            new = ERROR_ACTIVE
+            self._reopen(now, "restarted by kernel")
+
+        self._set_state(new, now)
+
+    def send_error(self, exc):
+        """Classify a send failure by errno (not by message text)."""
+        code = getattr(exc, "error_code", None)
+        now = time.monotonic()
+        if code == errno.ENOBUFS or code is None:
+            # TX queue full: nobody ACKs or the bus is saturated; the error
+            # frames / counters say which, so only count it here. ENOBUFS
+            # comes from the kernel rejecting the write; python-can's own
+            # "Transmit buffer full" (socket not writable within the send
+            # timeout) carries no errno.
+            self.tx_overflows += 1
+            state.can_tx_overflows = self.tx_overflows
+        elif code in (errno.ENETDOWN, errno.ENODEV, errno.ENXIO):
+            self._set_state(LINK_DOWN, now)
+        else:
+            diag.error("CAN", "send error: %s", exc)
+
+    def frame_received(self, now):
+        """Any good frame on the bus ends an outage."""
+        if self.outage_start is not None and self.state not in (BUS_OFF, LINK_DOWN):
+            self._end_outage(now)
+
+    # ----------- State -----------
+    def _set_state(self, new, now):
+        if new == self.state:
+            return
+        diag.warning("CAN", "%s: %s -> %s (TEC %d, REC %d)", self.channel, self.state, new,
+                     self.tec, self.rec, every=0)
+        self.state = new
+        if new in (BUS_OFF, LINK_DOWN):
+            if self.outage_start is None:
+                self.outage_start = now
+                blackbox.trigger("can_down", f"{self.channel} {new}")
+            if new == BUS_OFF and self.busoff_since is None:
+                self.busoff_since = now
+        else:
+            self.busoff_since = None
+        self._publish()
+
+    def _end_outage(self, now):
+        duration = now - self.outage_start
+        self.outage_start = None
+        self.outages += 1
+        self.last_outage = duration
+        self.total_outage += duration
+        diag.info("CAN", "%s back after %.0f ms outage", self.channel, duration * 1000, every=0)
+        self._publish()
+
+    def _publish(self):
+        state.can_state = self.state
+        state.can_tec = self.tec
+        state.can_rec = self.rec
+        state.can_down = self.outage_start is not None
+        state.can_outages = self.outages
+        state.can_last_outage = self.last_outage
+        state.can_outage_total = self.total_outage
+        state.can_tx_overflows = self.tx_overflows
+
+    # ----------- Recovery -----------
+    def _decide(self, now):
+        """Restart the interface if the counters / link say the kernel will not."""
+        link = self.link
+        need = None
+        if link.get("operstate", "up") not in ("up", "unknown"):
+            self._set_state(LINK_DOWN, now)
+            need = "interface down"
+        elif self.state == LINK_DOWN:
+            need = "send reported interface down"
+        elif self.state == BUS_OFF and self.busoff_since is not None \
+                and now - self.busoff_since > BUSOFF_GRACE:
+            need = f"bus-off for {now - self.busoff_since:.1f}s"
+
+        if need and now - self.last_restart >= RESTART_BACKOFF:
+            self.last_restart = now
+            diag.warning("CAN", "Restarting %s: %s", self.channel, need, every=0)
+            if hal.restart_can(self.channel):
+                self.tec = self.rec = 0
+                self._set_state(ERROR_ACTIVE, now)
+                self._reopen(now, need)
+
+    def _reopen(self, now, reason):
+        """Fresh python-can bus objects for us and every listener."""
+        try:
+            old = self.bus
+            self.bus = hal.open_can_bus(self.channel)
+            if old is not None:
+                old.shutdown()
+        except Exception as e:
+            diag.error("CAN", "re-open failed (%s): %s", reason, e)
+            return
+        for func in self.listeners:
+            try:
+                func(hal.open_can_bus(self.channel))
+            except Exception as e:
+                diag.error("CAN", "listener re-open failed: %s", e)
+
+    # ----------- Thread loop -----------
+    def poll_link(self, now):
+        self.link = hal.can_link(self.channel)
+        state.can_link = self.link
+
+    def run(self):
+        try:
+            self.bus = hal.open_can_bus(self.channel)
+        except Exception as e:
+            print(f"[CAN] health monitor could not open {self.channel}: {e}")
+        next_link = 0.0
+        self._publish()
+
+        while self.running:
+            now = time.monotonic()
+            if now >= next_link:
+                self.poll_link(now)
+                next_link = now + LINK_POLL
+            self._decide(now)
+
+            if self.bus is None:
+                time.sleep(RECV_TIMEOUT)
+                continue
+            try:
+                msg = self.bus.recv(timeout=RECV_TIMEOUT)
+            except Exception:
+                # Socket gone with the interface; treat as down until restarted
+                self._set_state(LINK_DOWN, time.monotonic())
+                time.sleep(RECV_TIMEOUT)
+                continue
+            if msg is None:
+                continue
+            now = time.monotonic()
+            if msg.is_error_frame:
+                self.error_frame(msg, now)
+            else:
+                self.frame_received(now)
+
+    def start(self):
+        global monitor
+        monitor = self
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if self.bus is not None:
+            self.bus.shutdown()
+            self.bus = None
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import can
-import cantools
+import hal
+from utils import diag
 import time
 import csv
 import os
@@ -52,17 +53,23 @@ dis_mos_status = None
 bms_life = None
 residual_capacity = None
 
-# Load DBC file
-try:
-    db = cantools.database.load_file(DBC_PATH)
-    print(f"DBC file loaded successfully: {DBC_PATH}")
-except Exception as e:
-    print(f"Failed to load DBC file: {e}")
-    db = None
+# DBC database, loaded on demand by load_dbc()
+db = None
+
+def load_dbc(path=DBC_PATH):
+    global db
+    try:
+        import cantools
+        db = cantools.database.load_file(path)
+        print(f"DBC file loaded successfully: {path}")
+    except Exception as e:
+        print(f"Failed to load DBC file: {e}")
+        db = None
+    return db
 
 def setup_can_bus(channel='can0', bustype='socketcan'):
     try:
-        bus = can.interface.Bus(channel=channel, bustype=bustype)
+        bus = hal.open_can_bus(channel)
         print(f"CAN interface '{channel}' initialized.")
         return bus
     except Exception as e:
@@ -168,7 +175,7 @@ def manual_decode(message):
         decoded_full["Reserved_4_0x12344001"] = Reserved_4_0x12344001
         decoded_full["charge_discharge_cycles"] = charge_discharge_cycles 
         decoded_full["Reserved_7_0x12344001"] = Reserved_7_0x12344001
-        print(No_of_btty_string, No_of_Tempe, Charger_status)
+        diag.debug("BMS", "strings %s, temps %s, charger %s", No_of_btty_string, No_of_Tempe, Charger_status)
         
 
     elif message.arbitration_id in [0x12354001, 0x12354002]:
@@ -294,17 +301,14 @@ def manual_decode(message):
 
         decoded_full["battery_failure_status"] = failure_status
         
-        print(battery_voltage, current, soc,max_voltage, min_voltage, max_voltage_cells, min_voltage_cells,max_temp, max_temp_cell,
-         min_temp, min_temp_cell,charge_dis_status, charge_mos_status, dis_mos_status,bms_life, 
-        residual_capacity,No_of_btty_string, No_of_Tempe, Charger_status, Load_status, Reserved_4_0x12344001, charge_discharge_cycles, Reserved_7_0x12344001,
-        frame_number, monomer_voltages, reserved_7_0x12354001,frame_number,cell_balance_states,failure_status,decoded_full)
+        diag.debug("BMS", "Decoded: %s", decoded_full)
 
         
 
     # Save once all fields are collected
     if all(decoded_full[key] is not None for key in FIELDNAMES if key != "timestamp"):
         save_to_csv(decoded_full)
-        print("? Data saved:", decoded_full)
+        diag.debug("BMS", "Data saved: %s", decoded_full)
         decoded_full = {key: None for key in FIELDNAMES if key != "timestamp"}  # Reset for next cycle
 
 def receive_response(bus):
@@ -317,7 +321,7 @@ def receive_response(bus):
         if db:
             try:
                 decoded = db.decode_message(msg.arbitration_id, msg.data)
-                print("Decoded by DBC:", decoded)
+                diag.debug("BMS", "Decoded by DBC: %s", decoded)
             except Exception:
                 manual_decode(msg)
         else:
@@ -330,6 +334,7 @@ def receive_response(bus):
         return None
 
 if __name__ == '__main__':
+    load_dbc()
     bus = setup_can_bus()
     if bus:
         while True:
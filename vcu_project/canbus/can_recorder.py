@@ -0,0 +1,291 @@
+# can_recorder.py
+# Always-on raw CAN recorder.
+#
+# The recorder has its own socket on the interface, so it sees every frame
+# on the bus (other sockets' TX included, through SocketCAN loopback) with
+# its kernel receive timestamp. Frames are packed into a preallocated ring
+# (FrameRing) by the receive thread; a writer thread drains the ring every
+# SPILL_PERIOD, or sooner once it is half full, into rotating files:
+#   binary   can_YYYYmmdd_HHMMSS_mmm.vcr  MAGIC + CLOCK + FRAME records (22 bytes/frame)
+#   candump  can_YYYYmmdd_HHMMSS_mmm.log  "(1700000000.123456) can0 0CF11E04#..."
+#            (candump -l format: canplayer / cantools / python-can read it)
+# A file is closed at CAN_RECORD_FILE_KB and only the newest
+# CAN_RECORD_FILES are kept. If the writer falls behind, the oldest
+# unwritten frames are overwritten and counted in `dropped`.
+#
+# Frame timestamps are the kernel's wall-clock receive times. The CLOCK
+# header of a .vcr is a monotonic / realtime pair (utils/clock.py) taken when
+# the file was opened, so frames line up with the logger's Monotonic_ns.
+#
+# read_recording() turns either format back into can.Message objects;
+# canbus/can_replay.py puts them back on a bus.
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+import config
+import hal
+import state
+from utils import clock
+from utils import diag
+
+# ---------------- Config ----------------
+RECV_TIMEOUT = 0.1
+SPILL_PERIOD = 1.0          # s between ring drains
+
+MAGIC = b"VCUCANR1"
+FRAME = struct.Struct("<dIBB8s")    # timestamp, arbitration id, dlc, flags, data
+CLOCK = struct.Struct("<qq")        # monotonic ns, realtime ns
+
+FLAG_EXT = 0x01
+FLAG_ERR = 0x02
+FLAG_RTR = 0x04
+
+# candump id flags (linux/can.h)
+CAN_EFF_FLAG = 0x80000000
+CAN_RTR_FLAG = 0x40000000
+CAN_ERR_FLAG = 0x20000000
+
+FORMAT_EXT = {"binary": ".vcr", "candump": ".log"}
+
+
+class FrameRing:
+    """Preallocated ring of packed FRAME records (one writer, one reader)."""
+
+    def __init__(self, frames):
+        self.capacity = frames
+        self.buf = bytearray(frames * FRAME.size)
+        self.head = 0           # frames ever put
+        self.tail = 0           # frames ever drained (or dropped)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def put(self, timestamp, arbitration_id, dlc, flags, data):
+        with self._lock:
+            if self.head - self.tail >= self.capacity:
+                self.tail += 1          # overwrite the oldest unwritten frame
+                self.dropped += 1
+            FRAME.pack_into(self.buf, (self.head % self.capacity) * FRAME.size,
+                            timestamp, arbitration_id, dlc, flags, data)
+            self.head += 1
+
+    def _copy(self, start, end):
+        a = (start % self.capacity) * FRAME.size
+        b = (end % self.capacity) * FRAME.size
+        if end - start == 0:
+            return b""
+        if a < b:
+            return bytes(self.buf[a:b])
+        return bytes(self.buf[a:]) + bytes(self.buf[:b])
+
+    def drain(self):
+        """Copy out every pending record (oldest first) as one bytes object."""
+        with self._lock:
+            start, end = self.tail, self.head
+            self.tail = end
+            return self._copy(start, end)
+
+    def snapshot(self):
+        """Copy of every record still held (oldest first), leaving them in the ring."""
+        with self._lock:
+            return self._copy(self.tail, self.head)
+
+
+def frame_flags(msg):
+    return ((FLAG_EXT if msg.is_extended_id else 0) |
+            (FLAG_ERR if msg.is_error_frame else 0) |
+            (FLAG_RTR if msg.is_remote_frame else 0))
+
+
+def candump_line(channel, timestamp, arbitration_id, dlc, flags, data):
+    if flags & FLAG_ERR:
+        can_id = f"{arbitration_id | CAN_ERR_FLAG:08X}"
+    elif flags & FLAG_EXT:
+        can_id = f"{arbitration_id:08X}"
+    else:
+        can_id = f"{arbitration_id:03X}"
+    payload = "R" if flags & FLAG_RTR else data[:dlc].hex().upper()
+    return f"({timestamp:.6f}) {channel} {can_id}#{payload}\n"
+
+
+class CanRecorder:
+    def __init__(self, channel="can0", directory=None, fmt=None,
+                 ring_frames=None, file_kb=None, keep_files=None):
+        self.channel = channel
+        self.directory = config.CAN_RECORD_DIR if directory is None else directory
+        self.fmt = config.CAN_RECORD_FORMAT if fmt is None else fmt
+        if self.fmt not in FORMAT_EXT:
+            raise ValueError(f"Unknown CAN record format '{self.fmt}'")
+        self.ring = FrameRing(config.CAN_RECORD_RING if ring_frames is None else ring_frames)
+        self.file_bytes = (config.CAN_RECORD_FILE_KB if file_kb is None else file_kb) * 1024
+        self.keep_files = config.CAN_RECORD_FILES if keep_files is None else keep_files
+
+        self.bus = None
+        self.taps = []              # callables(timestamp, id, dlc, flags, data) per frame
+        self.f = None
+        self.path = None
+        self.written = 0            # frames written to files
+        self._wake = threading.Event()
+        self.running = False
+        self.thread = None
+        self.writer_thread = None
+
+    # ----------- Capture -----------
+    def add_tap(self, func):
+        """Also hand every received frame to `func` (e.g. the black box ring)."""
+        self.taps.append(func)
+
+    def record(self, msg):
+        ring = self.ring
+        frame = (msg.timestamp, msg.arbitration_id, msg.dlc, frame_flags(msg), bytes(msg.data))
+        ring.put(*frame)
+        for tap in self.taps:
+            tap(*frame)
+        if len(ring) * 2 >= ring.capacity:
+            self._wake.set()
+
+    def set_bus(self, new_bus):
+        """CanHealthMonitor listener: record from the re-opened interface."""
+        old, self.bus = self.bus, new_bus
+        if old is not None:
+            try:
+                old.shutdown()
+            except Exception as e:
+                diag.error("CANREC", "old bus shutdown: %s", e)
+
+    def run(self):
+        try:
+            self.bus = hal.open_can_bus(self.channel)
+        except Exception as e:
+            print(f"[CANREC] could not open {self.channel}: {e}")
+        while self.running:
+            bus = self.bus
+            if bus is None:
+                time.sleep(RECV_TIMEOUT)
+                continue
+            try:
+                msg = bus.recv(timeout=RECV_TIMEOUT)
+            except Exception:
+                time.sleep(RECV_TIMEOUT)        # interface down; CanHealthMonitor re-opens it
+                continue
+            if msg is not None:
+                self.record(msg)
+
+    # ----------- Files -----------
+    def _open_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        name = f"can_{stamp}{FORMAT_EXT[self.fmt]}"
+        self.path = os.path.join(self.directory, name)
+        if self.fmt == "binary":
+            self.f = open(self.path, "ab")
+            if self.f.tell() == 0:
+                ref = clock.reference()
+                self.f.write(MAGIC + CLOCK.pack(ref["monotonic_ns"], ref["realtime_ns"]))
+        else:
+            self.f = open(self.path, "a")
+        self._prune()
+
+    def _prune(self):
+        ext = FORMAT_EXT[self.fmt]
+        files = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("can_") and name.endswith(ext))
+        for name in files[:-self.keep_files] if self.keep_files > 0 else ():
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                diag.error("CANREC", "could not remove %s: %s", name, e)
+
+    def _write(self, chunk):
+        if not chunk:
+            return
+        if self.f is None:
+            self._open_file()
+        if self.fmt == "binary":
+            self.f.write(chunk)
+        else:
+            channel = self.channel
+            self.f.write("".join(candump_line(channel, *frame) for frame in FRAME.iter_unpack(chunk)))
+        self.f.flush()
+        self.written += len(chunk) // FRAME.size
+        state.can_record_frames = self.written
+        state.can_record_dropped = self.ring.dropped
+        if self.f.tell() >= self.file_bytes:
+            self.f.close()
+            self.f = None
+
+    def _writer(self):
+        while self.running:
+            self._wake.wait(SPILL_PERIOD)
+            self._wake.clear()
+            try:
+                self._write(self.ring.drain())
+            except OSError as e:
+                diag.error("CANREC", "write failed: %s", e)
+        self._write(self.ring.drain())
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+    def start(self):
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.writer_thread = threading.Thread(target=self._writer, daemon=True)
+            self.thread.start()
+            self.writer_thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+        if self.thread:
+            self.thread.join()
+            self.writer_thread.join()
+            self.thread = self.writer_thread = None
+        if self.bus is not None:
+            self.bus.shutdown()
+            self.bus = None
+
+
+# ---------------- Reading ----------------
+def read_recording(path):
+    """Yield the frames of a .vcr or candump .log recording as can.Message."""
+    import can
+    if path.endswith(FORMAT_EXT["binary"]):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}: not a CAN recording")
+            f.read(CLOCK.size)
+            while True:
+                record = f.read(FRAME.size)
+                if len(record) < FRAME.size:
+                    return          # end, or a record cut by power loss
+                timestamp, arbitration_id, dlc, flags, data = FRAME.unpack(record)
+                yield can.Message(timestamp=timestamp, arbitration_id=arbitration_id,
+                                  is_extended_id=bool(flags & FLAG_EXT),
+                                  is_error_frame=bool(flags & FLAG_ERR),
+                                  is_remote_frame=bool(flags & FLAG_RTR),
+                                  dlc=dlc, data=data[:dlc])
+        return
+
+    with open(path) as f:
+        for line in f:
+            try:
+                stamp, channel, frame = line.split()
+                can_id, payload = frame.split("#", 1)
+            except ValueError:
+                continue            # blank / partial last line
+            value = int(can_id, 16)
+            error = bool(value & CAN_ERR_FLAG) and len(can_id) == 8
+            remote = payload.startswith("R")
+            data = b"" if remote else bytes.fromhex(payload)
+            yield can.Message(timestamp=float(stamp.strip("()")),
+                              arbitration_id=value & 0x1FFFFFFF,
+                              is_extended_id=len(can_id) == 8,
+                              is_error_frame=error, is_remote_frame=remote,
+                              dlc=len(data), data=data, channel=channel)
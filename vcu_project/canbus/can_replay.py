@@ -0,0 +1,69 @@
+# can_replay.py
+# Push a CAN recording (canbus/can_recorder.py .vcr, or a candump .log)
+# back onto a bus, for offline debugging and benchmarks.
+#
+#   python -m canbus.can_replay can_20250101_120000.vcr                  # vcan0, 1x
+#   python -m canbus.can_replay rec.log --speed 0                         # as fast as possible
+#   python -m canbus.can_replay rec.vcr --interface virtual --channel vcu_sim_can0
+#
+# With --speed S the gaps between frame timestamps are divided by S;
+# --speed 0 sends back to back. Error frames are skipped (a bus cannot
+# transmit them). Set up a kernel virtual bus with:
+#   sudo ip link add dev vcan0 type vcan && sudo ip link set up vcan0
+import argparse
+import sys
+import time
+
+from canbus.can_recorder import read_recording
+
+
+def replay(frames, bus, speed=1.0):
+    """Send `frames` on `bus`; returns (frames sent, send errors, wall seconds)."""
+    sent = errors = 0
+    start = time.monotonic()
+    first = None
+    for msg in frames:
+        if msg.is_error_frame:
+            continue
+        if speed > 0:
+            if first is None:
+                first = msg.timestamp
+            due = start + (msg.timestamp - first) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        try:
+            bus.send(msg)
+            sent += 1
+        except Exception as e:
+            errors += 1
+            if errors <= 5:
+                print(f"[REPLAY] send failed: {e}")
+    return sent, errors, time.monotonic() - start
+
+
+def main():
+    import can
+    parser = argparse.ArgumentParser(description="Replay a CAN recording onto a bus")
+    parser.add_argument("recording", help=".vcr (binary) or .log (candump) file")
+    parser.add_argument("--interface", default="socketcan",
+                        help="python-can interface (socketcan, virtual)")
+    parser.add_argument("--channel", default="vcan0", help="Bus channel")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Time scale: 1 = real time, 0 = as fast as possible")
+    parser.add_argument("--loop", type=int, default=1, help="Times to play the recording")
+    args = parser.parse_args()
+
+    bus = can.interface.Bus(channel=args.channel, interface=args.interface)
+    try:
+        for _ in range(args.loop):
+            sent, errors, elapsed = replay(read_recording(args.recording), bus, args.speed)
+            rate = sent / elapsed if elapsed > 0 else 0.0
+            print(f"[REPLAY] {sent} frames in {elapsed:.2f}s ({rate:.0f} frames/s), {errors} send errors")
+    finally:
+        bus.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
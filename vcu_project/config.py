@@ -5,6 +5,9 @@ PROJECT_NAME = "VCU for Electric Farming Vehicle"
 VERSION = "1.0"
 DEBUG_MODE = True
 
+### === Hardware Abstraction === ###
+HAL_BACKEND = "real"  # "real" (Raspberry Pi) or "sim"; VCU_HAL env var overrides
+
 ### === ADS1115 Settings === ###
 ADC_CHANNEL = 0  # Using A0 (ADS.P0)
 ADC_VOLTAGE_THRESHOLD = 3.0  # Minimum voltage before warning
@@ -13,19 +16,124 @@ ADC_VOLTAGE_THRESHOLD = 3.0  # Minimum voltage before warning
 CAN_CHANNEL = "can0"
 CAN_BUSTYPE = "socketcan"
 CAN_TIMEOUT = 1.0  # seconds
+CAN_BITRATE = 500000
+CAN_RESTART_MS = 100  # kernel auto-restart delay after bus-off
+
+### === CAN Recorder === ###
+CAN_RECORD_ENABLED = True
+CAN_RECORD_DIR = "/home/orbit/VCU-PT-PRO-2.0/vcu_project/utils/logs/can"
+CAN_RECORD_FORMAT = "binary"  # "binary" (.vcr, 22 B/frame) or "candump" (.log text)
+CAN_RECORD_RING = 8192        # frames buffered in memory between file writes
+CAN_RECORD_FILE_KB = 4096     # start a new file after this size
+CAN_RECORD_FILES = 24         # newest files kept; older ones are deleted
+
+### === Black Box === ###
+# Pre-trigger capture (utils/blackbox.py). Memory is fixed at start:
+#   state  (PRE + POST) x HZ samples x (8 + 4 x len(FIELDS)) B = 600 x 112 B =  66 KiB
+#   CAN    (PRE + POST) x CAN_FPS frames x 22 B         = 48000 x 22 B  = 1031 KiB
+# about 1.1 MiB, twice that while a capture is being written.
+BLACKBOX_ENABLED = True
+BLACKBOX_DIR = "/home/orbit/VCU-PT-PRO-2.0/vcu_project/utils/logs/blackbox"
+BLACKBOX_PRE_S = 10.0         # kept before the trigger ...
+BLACKBOX_POST_S = 2.0         # ... and captured after it
+BLACKBOX_HZ = 50              # state snapshots per second
+BLACKBOX_CAN_FPS = 4000       # frame ring sized for this rate (a saturated 500 kbit/s bus)
+BLACKBOX_TRIGGERS = ("fault", "dual_button", "can_down")
+BLACKBOX_FAULT_LEVEL = 2      # controller faults at or above this severity (faults.FAULT_DERATE)
+BLACKBOX_HOLDOFF_S = 30.0     # the same trigger is ignored this long after it fired
+BLACKBOX_FILES = 20           # newest captures kept; older ones are deleted
+BLACKBOX_FIELDS = (
+    "current_rpm", "rotary_current_rpm", "current_direction", "mode",
+    "last_left_rpm", "last_right_rpm",
+    "device_6_rpm", "device_4_rpm", "device_5_rpm",
+    "device_6_current", "device_4_current", "device_5_current",
+    "device_6_error", "device_4_error", "device_5_error",
+    "left_pressed", "right_pressed", "is_safe_stop",
+    "wheel_sync_error", "traction_factor_left", "traction_factor_right",
+    "battery_voltage", "current", "acs_current_mean",
+    "can_tec", "can_rec",
+)
 
 ### === Traction Control Settings === ###
 MAX_SAFE_SPEED = 50  # km/h
 MIN_SAFE_VOLTAGE = 3.0  # volts
+TRACTION_CONTROL_ENABLED = True
+WHEEL_DIAMETER_M = 0.6       # drive wheel diameter, for rpm <-> km/h
+WHEEL_GEAR_RATIO = 10.0      # motor rpm per wheel rpm
+SLIP_RPM_MARGIN = 150        # feedback above command by more than this = slip
+SLIP_SETTLE_S = 1.0          # margin test held off this long after the command last fell
+SLIP_ACCEL_FACTOR = 2.0      # feedback accel above this x the wheel slew rate = slip
+SLIP_TORQUE_CUT = 0.3        # fraction of the command removed per slip detection
+SLIP_MIN_FACTOR = 0.4        # never cut the command below this fraction
+SLIP_RECOVERY_RATE = 0.5     # command fraction restored per second once gripping
+
+### === Twirl Profiles === ###
+# Steps are (duration s, left rpm, right rpm); each step is entered through
+# a linear ramp of "ramp" seconds. Validated and compiled at startup
+# (control/twirl.py), sampled by the MotorManager TX loop.
+TWIRL_MAX_RPM = 3000
+TWIRL_PROFILES = {
+    "on_road_left": {"ramp": 0.5, "steps": [(2.5, 300, 300), (8.5, 300, 100), (2.5, 300, 300)]},
+    "on_road_right": {"ramp": 0.5, "steps": [(2.5, 300, 300), (8.5, 100, 300), (2.5, 300, 300)]},
+    "off_road_left": {"ramp": 0.0, "steps": [(1.0, 2500, 1200), (1.2, 2200, 1400), (1.5, 1800, 1800),
+                                             (1.2, 1400, 2200), (1.0, 1200, 2500)]},
+    "off_road_right": {"ramp": 0.0, "steps": [(1.0, 1200, 2500), (1.2, 1400, 2200), (1.5, 1800, 1800),
+                                              (1.2, 2200, 1400), (1.0, 2500, 1200)]},
+}
 
 ### === Logging Settings === ###
-LOG_LEVEL = "INFO"  # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
+LOG_LEVEL = "INFO"  # Diagnostics (utils/diag.py): DEBUG, INFO, WARNING, ERROR, CRITICAL
+DIAG_RATE_S = 1.0           # a diagnostics call site emits at most once per this many seconds
+DIAG_QUEUE = 1000           # messages held for the diagnostics thread (oldest dropped past this)
+LOG_SAMPLE_HZ = 10          # logging_loop sampling rate (main.py)
+LOG_OUTPUT_HZ = 2           # rows written per second
+LOG_WINDOW_S = 0.5          # each row's statistics cover the last LOG_WINDOW_S of samples
+LOG_STATS = ("mean", "min", "max", "last")  # per aggregated field; the mean keeps the plain column name
+LOG_AGG_FIELDS = ("current_rpm", "rotary_current_rpm",   # state fields aggregated over the window
+                  "device_5_rpm", "device_6_rpm", "device_4_rpm")
+LOG_FORMAT = "csv"  # Telemetry file: "csv", "binary" (utils/binlog.py .vbl) or "both"
+LOG_QUEUE_SIZE = 600        # rows held for the writer (5 min at 2 rows/s)
+LOG_QUEUE_POLICY = "drop_oldest"  # when full: "drop_oldest", "drop_newest" or "decimate"
+LOG_BATCH_ROWS = 50         # rows written per writerows() call
+LOG_FLUSH_S = 1.0           # max time a row waits in the writer before reaching the OS
+LOG_FSYNC_S = 10.0          # fsync cadence (0 = leave it to the kernel)
+LOG_SEGMENT_KB = 8192       # close a log segment at this size ...
+LOG_SEGMENT_MINUTES = 60    # ... or after this long (and always at midnight)
+LOG_COMPRESSION = "gzip"    # finished segments: "gzip" or "zstd" (needs the zstandard package)
+LOG_DISK_BUDGET_MB = 2048   # oldest compressed segments are deleted above this
+LOG_INDEX_EVERY = 100       # rows between time -> offset index entries (utils/log_index.py)
 
 ### === Mode Manager Settings === ###
-DEFAULT_MODE = "on_farm"
-AVAILABLE_MODES = ["on_road", "on_farm", "puddling"]
+# One parameter table per drive mode, run by the shared pipeline in
+# control/on_road.py (control/mode_manager.py). Selected by the mode
+# switch (state.MODE_SELECT_PIN).
+#   max_rpm            throttle full scale
+#   long_press_rpm     driven wheel in single-wheel mode (None = throttle)
+#   single_low_rpm     other wheel in single-wheel mode
+#   long_press_time    s held before single-wheel mode
+#   double_press_gap   s between taps for a twirl
+#   twirl              (left, right) names in TWIRL_PROFILES
+#   rotary_allowed     rotary throttle active
+#   throttle_drive     straight driving follows the throttle
+#   throttle_deadzone  rpm below which straight driving stops
+DEFAULT_MODE = "on_road"
+MODE_TABLES = {
+    "on_road": {
+        "max_rpm": 1500, "long_press_rpm": None, "single_low_rpm": 100,
+        "long_press_time": 0.02, "double_press_gap": 0.20,
+        "twirl": ("on_road_left", "on_road_right"),
+        "rotary_allowed": True, "throttle_drive": True, "throttle_deadzone": 120,
+    },
+    "off_road": {
+        "max_rpm": 3000, "long_press_rpm": 2000, "single_low_rpm": 0,
+        "long_press_time": 0.2, "double_press_gap": 0.40,
+        "twirl": ("off_road_left", "off_road_right"),
+        "rotary_allowed": False, "throttle_drive": False, "throttle_deadzone": 120,
+    },
+}
 
 ### === Watchdog === ###
-WATCHDOG_INTERVAL = 5  # seconds
+WATCHDOG_INTERVAL = 5  # seconds a critical loop may stay hung before the hardware watchdog resets the board
+WATCHDOG_DEVICE = None  # "/dev/watchdog" to enable the hardware watchdog (bcm2835_wdt)
 
 
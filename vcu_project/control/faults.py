@@ -0,0 +1,152 @@
+# Motor controller faults
+# faults.py
+#
+# The 0x0CF11E0x feedback frame carries a 16-bit error word (data[6] =
+# ERR0 low byte, data[7] = ERR1 high byte). FaultMonitor.update() is
+# called by manual_decode with each word; it compares against the last
+# word per controller and only does work on a change:
+#   rising  = changed & word      faults that just appeared
+#   falling = changed & previous  faults that just cleared
+# Each edge is appended as a FaultEvent to that controller's ring
+# (FAULT_HISTORY entries). Active fault tuples and the worst severity are
+# decoded once per change from tables built at import, so the LCD, logger
+# and safety rules read ready-made values instead of re-decoding ints.
+import time
+from collections import deque
+
+import config
+import state
+from utils import blackbox
+from utils import diag
+
+# ---------------- Config ----------------
+FAULT_HISTORY = 32          # events kept per controller
+
+# Severity: what the VCU does about an active fault (safety.py rules)
+FAULT_NONE = 0
+FAULT_WARN = 1              # show and log only
+FAULT_DERATE = 2            # slow the wheels / disable the rotary
+FAULT_STOP = 3              # shut the drive down
+SEVERITY_NAMES = ("none", "warn", "derate", "stop")
+
+# bit -> (code shown on the LCD, description, severity); None = reserved
+FAULT_BITS = (
+    # ERR0
+    ("IDN", "Identification error", FAULT_STOP),
+    ("OV", "Over voltage", FAULT_DERATE),
+    ("LV", "Low voltage", FAULT_DERATE),
+    None,
+    ("STL", "Stall", FAULT_DERATE),
+    ("IVF", "Internal volts fault", FAULT_STOP),
+    ("OTC", "Controller over temperature", FAULT_DERATE),
+    ("THP", "Throttle error at power-up", FAULT_WARN),
+    # ERR1
+    None,
+    ("RST", "Internal reset", FAULT_WARN),
+    ("HTH", "Hall throttle open or short", FAULT_WARN),
+    ("ANG", "Angle sensor error", FAULT_STOP),
+    None,
+    None,
+    ("OTM", "Motor over temperature", FAULT_DERATE),
+    ("HAL", "Hall sensor error", FAULT_STOP),
+)
+
+DEVICES = {6: "LEFT", 4: "RIGHT", 5: "ROTRY"}
+WHEEL_DEVICES = (6, 4)
+ROTARY_DEVICE = 5
+
+
+def _build_byte_table(offset):
+    """For each byte value: (set bit numbers, codes, worst severity) of that byte."""
+    table = []
+    for value in range(256):
+        bits = tuple(offset + b for b in range(8) if value & (1 << b))
+        known = [FAULT_BITS[b] for b in bits if FAULT_BITS[b]]
+        codes = tuple(f[0] for f in known) + tuple(f"B{b}" for b in bits if not FAULT_BITS[b])
+        severity = max([f[2] for f in known], default=FAULT_WARN if bits else FAULT_NONE)
+        table.append((bits, codes, severity))
+    return tuple(table)
+
+
+LOW_TABLE = _build_byte_table(0)
+HIGH_TABLE = _build_byte_table(8)
+
+
+def decode(word):
+    """(bit numbers, codes, worst severity) for a 16-bit error word."""
+    lo = LOW_TABLE[word & 0xFF]
+    hi = HIGH_TABLE[(word >> 8) & 0xFF]
+    return lo[0] + hi[0], lo[1] + hi[1], max(lo[2], hi[2])
+
+
+def describe(bit):
+    fault = FAULT_BITS[bit]
+    return fault[1] if fault else f"Reserved bit {bit}"
+
+
+class FaultEvent:
+    __slots__ = ("time", "device", "bit", "rising")
+
+    def __init__(self, time, device, bit, rising):
+        self.time = time            # time.time() of the frame that showed the edge
+        self.device = device
+        self.bit = bit
+        self.rising = rising
+
+    def __repr__(self):
+        edge = "SET" if self.rising else "CLEAR"
+        return f"{DEVICES.get(self.device, self.device)} {edge} {describe(self.bit)}"
+
+
+class FaultMonitor:
+    def __init__(self, history=FAULT_HISTORY):
+        self.words = dict.fromkeys(DEVICES, 0)
+        self.active = {device: () for device in DEVICES}           # codes
+        self.severity = dict.fromkeys(DEVICES, FAULT_NONE)
+        self.rings = {device: deque(maxlen=history) for device in DEVICES}
+        self.events = 0
+
+    def update(self, device, word, now=None):
+        """New error word from `device`; returns True if any fault bit changed."""
+        previous = self.words.get(device)
+        if previous is None or word == previous:
+            return False
+        now = time.time() if now is None else now
+        changed = word ^ previous
+        ring = self.rings[device]
+        bits, codes, severity = decode(changed & word)
+        for bit in bits:
+            ring.append(FaultEvent(now, device, bit, True))
+            diag.warning("FAULT", "%s: %s", DEVICES[device], describe(bit), every=0)
+        if severity >= config.BLACKBOX_FAULT_LEVEL:
+            blackbox.trigger("fault", f"{DEVICES[device]} {' '.join(codes)}")
+        for bit in decode(changed & previous)[0]:
+            ring.append(FaultEvent(now, device, bit, False))
+            diag.info("FAULT", "%s: %s cleared", DEVICES[device], describe(bit), every=0)
+        self.events += bin(changed).count("1")
+
+        self.words[device] = word
+        _, self.active[device], self.severity[device] = decode(word)
+        self._publish()
+        return True
+
+    def _publish(self):
+        state.wheel_fault_level = max(self.severity[d] for d in WHEEL_DEVICES)
+        state.rotary_fault_level = self.severity[ROTARY_DEVICE]
+        state.motor_fault_events = self.events
+
+    def history(self, device=None):
+        """Fault events oldest first, for one controller or all of them."""
+        if device is not None:
+            return list(self.rings[device])
+        merged = [event for ring in self.rings.values() for event in ring]
+        merged.sort(key=lambda event: event.time)
+        return merged
+
+    def last_event(self, device):
+        ring = self.rings[device]
+        return ring[-1] if ring else None
+
+
+# The one monitor fed by manual_decode and read by the LCD / logger / safety
+monitor = FaultMonitor()
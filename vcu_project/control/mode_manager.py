@@ -1,55 +1,82 @@
 # Mode manager logic
 # mode_manager.py
-import time
-import RPi.GPIO as GPIO
-#from control.on_road import run_on_road_mode
-#from control.off_road import run_off_road_mode
-
-# GPIO pin for mode select switch
-MODE_SWITCH_PIN = 17  # Example GPIO pin number
-
-# Mode definitions
-MODE_ON_ROAD = 0
-MODE_OFF_ROAD = 1
-
-def setup_gpio():
-    """Setup GPIO mode input."""
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(MODE_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-
-def get_current_mode():
-    """
-    Read the mode from the switch.
-    Returns:
-        MODE_ON_ROAD or MODE_OFF_ROAD
-    """
-    # Assuming switch ON = OFF-ROAD, OFF = ON-ROAD (you can invert logic as needed)
-    if GPIO.input(MODE_SWITCH_PIN) == GPIO.LOW:		
-        return MODE_OFF_ROAD 
-    else:
-        return MODE_ON_ROAD
-	
-def main():
-    setup_gpio()
-
-    try:
-        while True:
-            mode = get_current_mode()
-
-            if mode == MODE_ON_ROAD:
-                print("Mode: ON-ROAD ? Disabling rotary motors.")
-                #run_on_road_mode()
-            
-            elif mode == MODE_OFF_ROAD:
-                print("Mode: OFF-ROAD ? Activating off-road logic.")
-                #run_off_road_mode()
-
-            time.sleep(0.1)
-
-    except KeyboardInterrupt:
-        print("Shutting down...")
-    finally:
-        GPIO.cleanup()
-
-if __name__ == "__main__":
-    main()
+#
+# Table-driven mode engine. Every drive mode is a parameter table in
+# config.MODE_TABLES, run by the one drive pipeline in control/on_road.py
+# on the shared GPIO setup (main.init_gpio) and MotorManager. Switching
+# modes swaps the active table; no other code path changes.
+import config
+import state
+from hal import GPIO
+from control import on_road
+from control import twirl
+from control.motor_manager import WHEEL_LIMIT_MAX
+from utils import diag
+
+REQUIRED_FIELDS = ("max_rpm", "long_press_rpm", "single_low_rpm", "long_press_time",
+                   "double_press_gap", "twirl", "rotary_allowed", "throttle_drive",
+                   "throttle_deadzone")
+
+
+class DriveMode:
+    """One mode's parameters, validated once and read as attributes by on_road."""
+
+    def __init__(self, name, table):
+        missing = [field for field in REQUIRED_FIELDS if field not in table]
+        if missing:
+            raise ValueError(f"Mode '{name}': missing {', '.join(missing)}")
+        self.name = name
+        self.max_rpm = table["max_rpm"]
+        self.long_press_rpm = table["long_press_rpm"]      # None = follow the throttle
+        self.single_low_rpm = table["single_low_rpm"]
+        self.long_press_time = table["long_press_time"]
+        self.double_press_gap = table["double_press_gap"]
+        self.twirl_left, self.twirl_right = table["twirl"]
+        self.rotary_allowed = table["rotary_allowed"]
+        self.throttle_drive = table["throttle_drive"]
+        self.throttle_deadzone = table["throttle_deadzone"]
+
+        # Wheel commands are clamped to max_rpm (MotorManager.set_wheel_limit),
+        # so nothing in the table may ask for more
+        if not 0 < self.max_rpm <= WHEEL_LIMIT_MAX:
+            raise ValueError(f"Mode '{name}': max_rpm {self.max_rpm} outside 1..{WHEEL_LIMIT_MAX}")
+        for field in ("long_press_rpm", "single_low_rpm"):
+            rpm = getattr(self, field)
+            if rpm is not None and not 0 <= rpm <= self.max_rpm:
+                raise ValueError(f"Mode '{name}': {field} {rpm} outside 0..{self.max_rpm}")
+        for profile in (self.twirl_left, self.twirl_right):
+            if profile not in config.TWIRL_PROFILES:
+                raise ValueError(f"Mode '{name}': unknown twirl profile '{profile}'")
+            try:
+                twirl.validate(profile, config.TWIRL_PROFILES[profile],
+                               min(self.max_rpm, config.TWIRL_MAX_RPM))
+            except ValueError as e:
+                raise ValueError(f"Mode '{name}': {e}") from None
+
+
+class ModeEngine:
+    def __init__(self, motor_manager, tables=None, default=None):
+        tables = config.MODE_TABLES if tables is None else tables
+        self.motor_manager = motor_manager
+        self.modes = {name: DriveMode(name, table) for name, table in tables.items()}
+        self.active = self.modes[default or config.DEFAULT_MODE]
+        state.drive_mode = self.active.name
+        motor_manager.set_wheel_limit(self.active.max_rpm)
+
+    def select(self, name):
+        """Make `name` the active mode (a table swap; takes effect next step)."""
+        mode = self.modes[name]
+        if mode is not self.active:
+            self.active = mode
+            state.drive_mode = name
+            self.motor_manager.set_wheel_limit(mode.max_rpm)
+            diag.info("MODE", "%s", name, every=0)
+
+    def read_selector(self):
+        """Mode select switch: LOW = off_road, HIGH (pulled up) = on_road."""
+        return "off_road" if GPIO.input(state.MODE_SELECT_PIN) == GPIO.LOW else "on_road"
+
+    def step(self):
+        """One control tick: follow the select switch, run the active table."""
+        self.select(self.read_selector())
+        on_road.on_road_mode_step(self.motor_manager, self.active)
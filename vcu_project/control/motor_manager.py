@@ -3,19 +3,26 @@
 import threading
 import time
 import can
-import subprocess
+import hal
 import csv
 import os
 import json
-from datetime import datetime
 
 import state  # your state module (must exist)
+from canbus import can_health
+from control.slew_limiter import SlewLimiter
+from control.wheel_sync import WheelSync
+from control.traction_control import TractionControl
+from control import faults
+from utils import diag
 
 # -------------------- Config --------------------
-UPDATE_RATE_HZ = 5
+UPDATE_RATE_HZ = 20       # TX rate; also the slew limiter's resolution
 TIMEOUT_SEC = 0.5  # If no update within 200ms -> send 0 rm
+SAFETY_SLOW_FACTOR = 0.5   # wheel command fraction while safety asks slow_wheel_rpm
 ROTARY_MAX_RPM = 1500
-WHEEL_MAX_RPM = 1500
+WHEEL_MAX_RPM = 1500      # wheel clamp until a drive mode sets its own (set_wheel_limit)
+WHEEL_LIMIT_MAX = 3000    # highest wheel clamp a mode may set
 
 CSV_FILE = "battery_data.csv"
 DBC_PATH = "Inverted_Protocol_DBC_File.dbc"
@@ -25,10 +32,13 @@ RESPONSE_TIMEOUT = 0.5  # seconds
 # Fields we want to collect before saving (non-exhaustive, extend if needed)
 # -------------------- BMS Decode --------------------
 
+# Called as listener(device_id, rpm) for every motor feedback frame decoded
+feedback_listeners = []
+
 # --------------- Utility: CAN bus setup (small helper) --------------
 def setup_can_bus(channel="can0"):
     try:
-        bus = can.interface.Bus(channel=channel, bustype="socketcan")
+        bus = hal.open_can_bus(channel)
         print("[CAN] Interface initialized:", channel)
         return bus
     except Exception as e:
@@ -37,11 +47,11 @@ def setup_can_bus(channel="can0"):
 
 def manual_decode(message):
     """
-    Decode BMS CAN message into a dictionary containing all battery variables.
-    Ensures all state fields exist.
+    Decode a BMS / motor controller CAN message into the state fields and
+    stamp its signal (state.stamp). Returns the signal name, or None for
+    IDs it does not know.
     """
-    # Initialize full decoded dictionary
-
+    signal = None
 
     data = message.data
     msg_id = message.arbitration_id
@@ -53,6 +63,7 @@ def manual_decode(message):
         state.max_cells = data[2]
         state.min_voltage = (int.from_bytes(data[3:5], 'big'))*0.001
         state.min_cells = data[5]
+        signal = "bms_cells"
 
         '''print("   Manually Decoded Max/Min Cell Voltage Data")
         print(f"    - Max Voltage      : {max_voltage} mV")
@@ -66,6 +77,7 @@ def manual_decode(message):
         current_raw = int.from_bytes(data[4:6], 'big')
         state.current = (current_raw - 30000) * 0.1
         state.soc = int.from_bytes(data[6:8], 'big') * 0.1
+        signal = "bms_pack"
 
         '''print("  ?? Manually Decoded SOC Data:")
         print(f"    - Battery Voltage: {battery_voltage:.1f} V")
@@ -77,6 +89,7 @@ def manual_decode(message):
         state.max_temp_cell = data[1]
         state.min_temp = data[2] - 40
         state.min_temp_cell = data[3]
+        signal = "bms_temp"
 
     elif message.arbitration_id in [0x12334001, 0x12334002]:
         state.charge_dis_status = data[0]
@@ -84,6 +97,7 @@ def manual_decode(message):
         state.dis_mos_status = data[2]
         state.bms_life = data[3]
         state.residual_capacity = int.from_bytes(data[4:8], 'big')
+        signal = "bms_status"
         
     elif 0x0CF11E04 <= msg_id <= 0x0CF11E06:
         device_id = msg_id - 0x0CF11E00
@@ -91,34 +105,46 @@ def manual_decode(message):
         current = (data[3] << 8 | data[2]) / 10
         voltage = (data[5] << 8 | data[4]) / 10
         error_code = (data[7] << 8) | data[6]
+        faults.monitor.update(device_id, error_code)
 
         if device_id == 4:
             state.device_4_rpm = rpm
             state.device_4_current = current
             state.device_4_voltage = voltage
             state.device_4_error = error_code
+            signal = "motor_right"
         elif device_id == 5:
             state.device_5_rpm = rpm
             state.device_5_current = current
             state.device_5_voltage = voltage
             state.device_5_error = error_code
+            signal = "motor_rotary"
         elif device_id == 6:
             state.device_6_rpm = rpm
             state.device_6_current = current
             state.device_6_voltage = voltage
             state.device_6_error = error_code
+            signal = "motor_left"
+
+        if signal:
+            state.stamp(signal)
+        for listener in feedback_listeners:
+            listener(device_id, rpm)
+        return signal
     # ------------------- Cell temps -------------------      
     
     else:
         pass
         #print("   Unknown response ID, cannot manually decode")
   
-    decoded_full=None
-    return decoded_full
+    if signal:
+        state.stamp(signal)
+    return signal
 
 # --------------- Helpers -----------------
 def get_timestamp():
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    """Wall-clock stamp in epoch ns; format with utils.clock.format_ns() for display."""
+    return time.time_ns()
 
 def format_can_data(data):
     """Return data as hex string. Accepts bytes or list."""
@@ -149,49 +175,16 @@ def build_can_data(rpm, direction, max_rpm):
         0x00, 0x00, 0x00, 0x00
     ])
     
-def reset_can_interface():
-    """Reset can0 interface safely (uses sudo ip link; requires permissions)."""
-    print("[CAN] Resetting can0 ...")
-    subprocess.run(["sudo", "ip", "link", "set", "can0", "down"], check=False)
-    time.sleep(0.3)
-    subprocess.run(
-        ["sudo", "ip", "link", "set", "can0", "up", "type", "can", "bitrate", "500000"],
-        capture_output=True, text=True)
-
-# ?? Global health flag + timestamp
-_can_down = False
-_last_reset_time = 0
-
 def safe_send(bus, msg):
-    """Send CAN frame safely, recover if buffer full or network down."""
-    global _can_down, _last_reset_time
+    """Send CAN frame; failures go to the CAN health monitor, which owns recovery."""
     try:
         bus.send(msg, timeout=0.01)
 
     except can.CanError as e:
-        err = str(e)
-        if any(x in err for x in ("No buffer space available", "Network is down")):
-            print(f"[CAN] Recoverable error: {err}")
-            _can_down = True   # ? mark unhealthy
-        else:
-            print(f"[CAN] send error: {err}")
+        can_health.on_send_error(e)
 
     except Exception as e:
-        print(f"[CAN] unexpected send error: {e}")
-
-
-# ?? Separate watchdog (run in its own thread at startup)
-def can_watchdog():
-    global _can_down, _last_reset_time
-    while True:
-        if _can_down:
-            now = time.time()
-            if now - _last_reset_time > 5.0:   # ? reset at most every 5 sec
-                print("[CAN] Resetting can0 ...")
-                reset_can_interface()
-                _last_reset_time = now
-                _can_down = False
-        time.sleep(1.0)
+        diag.error("CAN", "unexpected send error: %s", e)
 
 
 # --------------- CSV Saving --------------
@@ -211,6 +204,42 @@ class MotorManager:
         self.last_wheel_update = now
         self.last_rotary_update = now
 
+        # Active wheel profile: (TwirlProfile, direction, monotonic start) or None.
+        # _cmd_lock makes a caller's command and the TX loop's profile
+        # setpoint exclusive, so a stop is never overwritten by a twirl step.
+        self._profile = None
+        self._cmd_lock = threading.Lock()
+
+        # Wheel rpm clamp of the CAN frames; the active drive mode's max_rpm
+        self.wheel_limit = WHEEL_MAX_RPM
+
+        # Slew limiters: every command path is ramped here, at TX time
+        self.slew_left = SlewLimiter(state.WHEEL_ACCEL_RATE, state.WHEEL_DECEL_RATE, state.EMERGENCY_DECEL_RATE)
+        self.slew_right = SlewLimiter(state.WHEEL_ACCEL_RATE, state.WHEEL_DECEL_RATE, state.EMERGENCY_DECEL_RATE)
+        self.slew_rot = SlewLimiter(state.ROTARY_ACCEL_RATE, state.ROTARY_DECEL_RATE, state.EMERGENCY_DECEL_RATE)
+        self._emergency = False
+
+        # Last limited (rpm, dir), before wheel-sync trim
+        self.out_left = (0, 0)
+        self.out_right = (0, 0)
+        self.out_rot = (0, 0)
+
+        # Left/right sync, updated at the feedback frame rate
+        self.sync = WheelSync()
+        self.traction = TractionControl()
+        feedback_listeners.append(self._on_feedback)
+
+        # Set to send before the next TX tick (traction cut)
+        self._wake = threading.Event()
+
+        # utils.watchdog.Heartbeat, set by main once registered
+        self.heartbeat = None
+
+        # Safety actions (safety.SafetyEvaluator.tick); shutdown latches
+        self.safety_disable_rotary = False
+        self.safety_slow_wheels = False
+        self.safety_shutdown = False
+
         # Thread
         self._running = True
         self.thread = threading.Thread(target=self._loop, daemon=True)
@@ -218,17 +247,86 @@ class MotorManager:
 
     # ----------- API -----------
     def set_wheels(self, rpm_left, rpm_right, direction):
-        self.wheel_left = (rpm_left, direction)
-        self.wheel_right = (rpm_right, direction)
-        self.last_wheel_update = time.time()
+        """Direct wheel command (target; ramped by the TX loop); cancels any running profile."""
+        with self._cmd_lock:
+            self._profile = None
+            if rpm_left > 0 or rpm_right > 0:
+                self._emergency = False
+            self.wheel_left = (rpm_left, direction)
+            self.wheel_right = (rpm_right, direction)
+            self.last_wheel_update = time.time()
+
+    def set_wheel_limit(self, max_rpm):
+        """Clamp wheel commands to `max_rpm` (the drive mode's full scale)."""
+        if not 0 < max_rpm <= WHEEL_LIMIT_MAX:
+            raise ValueError(f"Wheel limit {max_rpm} outside 1..{WHEEL_LIMIT_MAX}")
+        self.wheel_limit = max_rpm
 
     def set_rotary(self, rpm, direction):
+        if rpm > 0:
+            self._emergency = False
         self.rotary = (rpm, direction)
         self.last_rotary_update = time.time()
 
-    def stop_all(self):
+    def stop_all(self, emergency=False):
+        """Ramp everything to zero; emergency=True uses the emergency decel rate."""
         self.set_wheels(0, 0, 0)
         self.set_rotary(0, 0)
+        if emergency:
+            self._emergency = True
+
+    def apply_safety(self, actions):
+        """Take this tick's safety actions; used by the TX loop before sending."""
+        self.safety_disable_rotary = actions["disable_rotary"]
+        self.safety_slow_wheels = actions["slow_wheel_rpm"]
+        if actions["shutdown_system"] and not self.safety_shutdown:
+            self.safety_shutdown = True
+            self._profile = None
+            diag.error("MotorManager", "safety shutdown: %s", actions["throw_error"], every=0)
+
+    def wheels_at_rest(self):
+        """True once the limited wheel output has reached 0 rpm."""
+        return self.out_left[0] == 0 and self.out_right[0] == 0
+
+    def start_profile(self, profile, direction):
+        """Run a precompiled wheel profile (control/twirl.py), sampled by the TX loop."""
+        with self._cmd_lock:
+            self._profile = (profile, direction, time.monotonic())
+
+    def profile_active(self):
+        return self._profile is not None
+
+    def _sample_profile(self):
+        """Update the wheel setpoints from the running profile, if any."""
+        if self._profile is None:
+            return
+        with self._cmd_lock:
+            active = self._profile
+            if active is None:
+                return              # cancelled by a command since the check
+            profile, direction, start = active
+            setpoint = profile.sample(time.monotonic() - start)
+            if setpoint is None:
+                # Finished: hold zero until the caller commands again
+                self._profile = None
+                setpoint = (0, 0)
+            self.wheel_left = (setpoint[0], direction)
+            self.wheel_right = (setpoint[1], direction)
+            self.last_wheel_update = time.time()
+
+    def _on_feedback(self, device, rpm):
+        now = time.monotonic()
+        self.sync.on_feedback(device, rpm, now, self.out_left[0], self.out_right[0])
+        cmd = self.out_left[0] if device == 6 else self.out_right[0]
+        if self.traction.on_feedback(device, rpm, now, cmd):
+            self._wake.set()
+
+    def _apply_trim(self, wl, wr):
+        """Subtract the wheel-sync trims (only while both wheels drive the same way)."""
+        if wl[1] != wr[1] or wl[1] not in (0x01, 0x02):
+            return wl, wr
+        return ((max(0, wl[0] - self.sync.trim_left), wl[1]),
+                (max(0, wr[0] - self.sync.trim_right), wr[1]))
 
     # ----------- Background thread -----------
     def _loop(self):
@@ -241,6 +339,10 @@ class MotorManager:
         id_rot = 0x0CF10000 | (0x05 << 8) | 0x1E
 
         while self._running:
+            wheel_limit = self.wheel_limit
+            if self.heartbeat:
+                self.heartbeat.beat()
+            self._sample_profile()
             now = time.time()
 
             # Wheels (timeout fallback)
@@ -250,15 +352,43 @@ class MotorManager:
             # Rotary (timeout fallback)
             rot = self.rotary if now - self.last_rotary_update <= TIMEOUT_SEC else (0, 0)
 
+            # Safety actions, applied to the targets so the ramps still hold
+            if self.safety_shutdown:
+                wl, wr, rot = (0, wl[1]), (0, wr[1]), (0, rot[1])
+            else:
+                if self.safety_slow_wheels:
+                    wl = (int(wl[0] * SAFETY_SLOW_FACTOR), wl[1])
+                    wr = (int(wr[0] * SAFETY_SLOW_FACTOR), wr[1])
+                if self.safety_disable_rotary:
+                    rot = (0, rot[1])
+
+            # Slew limiting; a stale command means the caller is gone, so
+            # ramp it down at the emergency rate.
+            mono = time.monotonic()
+            emergency = self._emergency or self.safety_shutdown
+            wheels_lost = now - self.last_wheel_update > TIMEOUT_SEC
+            rot_lost = now - self.last_rotary_update > TIMEOUT_SEC
+            wl = self.out_left = self.slew_left.update(wl[0], wl[1], mono, emergency or wheels_lost)
+            wr = self.out_right = self.slew_right.update(wr[0], wr[1], mono, emergency or wheels_lost)
+            rot = self.out_rot = self.slew_rot.update(rot[0], rot[1], mono, emergency or rot_lost)
+            # Closed loops need live feedback; without it run open loop
+            if not (state.is_fresh("motor_left") and state.is_fresh("motor_right")):
+                if self.sync.trim_left or self.sync.trim_right:
+                    self.sync.reset()
+                self.traction.reset()
+            wl, wr = self._apply_trim(wl, wr)
+            rpm_l, rpm_r = self.traction.limit(wl[0], wr[0])
+            wl, wr = (rpm_l, wl[1]), (rpm_r, wr[1])
+
             try:
                 # Build messages
                 msg_left = can.Message(
                     arbitration_id=id_left, is_extended_id=True,
-                    data=build_can_data(*wl, WHEEL_MAX_RPM)
+                    data=build_can_data(*wl, wheel_limit)
                 )
                 msg_right = can.Message(
                     arbitration_id=id_right, is_extended_id=True,
-                    data=build_can_data(*wr, WHEEL_MAX_RPM)
+                    data=build_can_data(*wr, wheel_limit)
                 )
                 msg_rot = can.Message(
                     arbitration_id=id_rot, is_extended_id=True,
@@ -271,19 +401,24 @@ class MotorManager:
                 safe_send(self.bus, msg_rot)
 
             except Exception as e:
-                print(f"[MotorManager] send failed: {e}")
+                diag.error("MotorManager", "send failed: %s", e)
 
             # Strict timing
             next_time += period
             sleep_time = next_time - time.time()
             if sleep_time > 0:
-                time.sleep(sleep_time)
+                # Woken early by a traction cut: send now, then resync
+                if self._wake.wait(sleep_time):
+                    self._wake.clear()
+                    next_time = time.time()
             else:
                 # If running late, resync immediately
                 next_time = time.time()
 
     def shutdown(self):
         self._running = False
+        if self._on_feedback in feedback_listeners:
+            feedback_listeners.remove(self._on_feedback)
         self.thread.join()
 
 # -------------------- BMS Manager --------------------
@@ -315,7 +450,7 @@ class BMSManager:
             # don't spam the console too much
             # print("[BMSManager] Request sent to BMS")
         except Exception as e:
-            print(f"[BMSManager] send_request error: {e}")
+            diag.error("BMSManager", "send_request error: %s", e)
 
     def _receive_response(self):
         """Receive and decode BMS response. Returns decoded dict (may be partial)."""
@@ -332,16 +467,16 @@ class BMSManager:
             if self.db:
                 try:
                     decoded = self.db.decode_message(msg.arbitration_id, msg.data)
-                    print("[BMSManager] Decoded via DBC:", decoded)
+                    diag.debug("BMSManager", "Decoded via DBC: %s", decoded)
                 except Exception as e:
-                    print("[BMSManager] DBC decode failed:", e)
+                    diag.debug("BMSManager", "DBC decode failed: %s", e)
                     decoded = manual_decode(msg)
             else:
                 decoded = manual_decode(msg)
 
             return decoded
         except Exception as e:
-            print("[BMSManager] receive error:", e)
+            diag.error("BMSManager", "receive error: %s", e)
             return None
 
     def _loop(self):
@@ -351,12 +486,12 @@ class BMSManager:
                 self._send_request()
                 time.sleep(0.01)
                 decoded = self._receive_response()
-                if decoded:
-                    # Update state variables safely (use state.lock if available)
+                if isinstance(decoded, dict):
+                    # DBC path; manual_decode stamps state itself
                     state.bms_last_update = time.time()
                     state.decoded_full = decoded
             except Exception as e:
-                print("[BMSManager] loop error:", e)
+                diag.error("BMSManager", "loop error: %s", e)
 
             time.sleep(self.poll_interval)
 
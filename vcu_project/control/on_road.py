@@ -1,23 +1,23 @@
 # control/on_road_mode.py
 # -*- coding: utf-8 -*-
+#
+# Drive pipeline shared by every mode: inputs are read once per tick, and
+# the mode-specific numbers (rpm limits, button timing, twirl profiles,
+# rotary) come from the active DriveMode table passed in by
+# control/mode_manager.py.
 
-import threading
 import state
 import time
-import can
-import RPi.GPIO as GPIO
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
+import hal
+from hal import GPIO
 #from canbus.can_utils import can_bus_correction
 import subprocess
 from control.motor_manager import MotorManager
+from control import twirl
+from utils import blackbox
+from utils import diag
 
-# Feedback assist
-RE_ALIGN_RPM_REDUCTION = 100   # how much to trim the faster motor
-FEEDBACK_TOLERANCE = 50        # acceptable RPM difference before correcting
-LOW_RPM_FEEDBACK_OFF = 300     # <--- ignore feedback below
+# Feedback assist: state.RE_ALIGN_RPM_REDUCTION etc., used by control/wheel_sync.py
 
 # ---------- GPIO ----------
 LEFT_BTN_PIN = 26
@@ -27,28 +27,47 @@ DIRECTION_BTN_PIN = 21
 ROTARY_SWITCH_PIN = 16
 SAFETY_PIN = 16
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setup([LEFT_BTN_PIN, RIGHT_BTN_PIN], GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(MODE_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(DIRECTION_BTN_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(ROTARY_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(SAFETY_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-
-# ---------- CAN ----------
-bus = can.interface.Bus(channel='can0', interface='socketcan')
-
-# ---------- STATE ----------
-
 # ---------- ADS1115 ----------
-i2c = busio.I2C(board.SCL, board.SDA)
-ads = ADS.ADS1115(i2c)
-throttle_channel = AnalogIn(ads, ADS.P0)
-rotary_throttle_channel = AnalogIn(ads, ADS.P1)
-
-def adc_to_rpm(value):
-    """Convert ADC throttle value to RPM (clamped)."""
-    rpm = int((value / 36535) * state.MAX_RPM_ON_ROAD)  # use ON_ROAD limit
-    return max(0, min(rpm, state.MAX_RPM_ON_ROAD))
+throttle_channel = None          # A0, opened by init()
+rotary_throttle_channel = None   # A1, opened by init()
+
+# ---------- TWIRL ----------
+twirl_profiles = {}              # compiled from config.TWIRL_PROFILES by init()
+
+def init():
+    """Open the throttle ADC channels and compile the twirl profiles (startup phase;
+    GPIO is set up by main.init_gpio). Invalid profiles raise here, before driving."""
+    global throttle_channel, rotary_throttle_channel, twirl_profiles
+    twirl_profiles = twirl.load_profiles()
+    throttle_channel = hal.analog_in(0)
+    rotary_throttle_channel = hal.analog_in(1)
+
+def read_adc(channel):
+    """Single conversion on the shared ADS1115 (also used by the ACS712)."""
+    with hal.adc_lock:
+        return channel.value
+
+def adc_to_rpm(value, max_rpm):
+    """Convert ADC throttle value to RPM (clamped to the mode's max_rpm)."""
+    rpm = int((value / 36535) * max_rpm)
+    return max(0, min(rpm, max_rpm))
+
+class Inputs:
+    """One tick's worth of operator inputs, read once and shared by all steps."""
+    __slots__ = ("left", "right", "direction", "rotary_switch", "throttle")
+
+def read_inputs():
+    inputs = Inputs()
+    inputs.left = GPIO.input(state.LEFT_BTN_PIN) == GPIO.HIGH
+    inputs.right = GPIO.input(state.RIGHT_BTN_PIN) == GPIO.HIGH
+    inputs.direction = GPIO.input(state.DIRECTION_BTN_PIN) == GPIO.HIGH
+    inputs.rotary_switch = GPIO.input(state.ROTARY_SWITCH_PIN) == GPIO.HIGH
+    try:
+        inputs.throttle = read_adc(throttle_channel)
+    except Exception as e:
+        diag.error("Drive", "Throttle read failed: %s", e)
+        inputs.throttle = None
+    return inputs
 
 def is_twirl_mode_enabled():
     """Check if mode switch is ON (Twirl enabled)."""
@@ -59,63 +78,35 @@ def toggle_direction():
     state.current_direction = (
         0x02 if state.current_direction == 0x01 else 0x01
     )
-    print(
-        "Direction set to",
-        "REVERSE" if state.current_direction == 0x02 else "FORWARD"
-    )
+    diag.info("Drive", "Direction set to %s",
+              "REVERSE" if state.current_direction == 0x02 else "FORWARD", every=0)
 
-def begin_twirl(left: bool):
-    """Start twirl sequence (LEFT or RIGHT)."""
+def begin_twirl(left: bool, motor_manager, params):
+    """Start twirl sequence (LEFT or RIGHT); the MotorManager TX loop plays the profile."""
     # if not is_twirl_mode_enabled():
     #     print("Twirl blocked: Mode switch is OFF")
     #     return
+    profile = twirl_profiles[params.twirl_left if left else params.twirl_right]
     state.mode = state.MODE_TWIRL_LEFT if left else state.MODE_TWIRL_RIGHT
     state.twirl_step = 1
     state.twirl_step_start = time.monotonic()
-    print(f"Twirl {'LEFT' if left else 'RIGHT'} started")
+    motor_manager.start_profile(profile, state.current_direction)
+    diag.info("Drive", "Twirl %s started", "LEFT" if left else "RIGHT", every=0)
 
 def execute_twirl(now, motor_manager):
-    """Run twirl sequence step-by-step."""
-    mode = state.mode
-    twirl_step = state.twirl_step
-    twirl_step_start = state.twirl_step_start
-    current_direction = state.current_direction
-
-    steps = state.L_STEPS if mode == state.MODE_TWIRL_LEFT else state.R_STEPS
-
-    if 1 <= twirl_step <= len(steps):
-        rpm_left, rpm_right = steps[twirl_step - 1]
-
-        # Apply motor command
-        motor_manager.set_wheels(rpm_left, rpm_right, current_direction)
-
-        if now - twirl_step_start > state.STEP_TIMES[twirl_step - 1]:
-            state.twirl_step += 1
-            state.twirl_step_start = now
-    else:
-        state.mode = state.MODE_IDLE
-        state.twirl_step = 0
-        print("Twirl completed")
-        safe_stop(motor_manager)
-        
-def apply_gradient(target, current, slew_rate):
-    if target > current + slew_rate:
-        return current + slew_rate
-    elif target < current - slew_rate:
-        return current - slew_rate
-    else:
-        return target
-
-def periodic_drive(now, motor_manager):
-    """Periodic drive loop for wheels updates motor_manager (does NOT send directly)."""
+    """Wait for the running twirl profile to finish, then stop."""
+    if motor_manager.profile_active():
+        return
 
-    # Persistent storage of last RPMs
-    if not hasattr(state, "last_left_rpm"):
-        state.last_left_rpm = 0
-    if not hasattr(state, "last_right_rpm"):
-        state.last_right_rpm = 0
+    state.mode = state.MODE_IDLE
+    state.twirl_step = 0
+    diag.info("Drive", "Twirl completed", every=0)
+    safe_stop(motor_manager)
 
-    RPM_SLEW_RATE = state.RPM_SLEW_RATE  # max RPM change per cycle
+def periodic_drive(now, motor_manager, params, base_rpm):
+    """Periodic drive loop for wheels updates motor_manager (does NOT send directly).
+    Targets go in unramped; MotorManager's slew limiters shape the ramp.
+    base_rpm is None if the throttle could not be read this tick."""
 
     # Ensure timely update
     if (now - state.last_send_time) < state.SEND_PERIOD:
@@ -123,24 +114,25 @@ def periodic_drive(now, motor_manager):
     state.last_send_time = now
 
     try:
-        throttle_value = throttle_channel.value
-        base_rpm = adc_to_rpm(throttle_value)
+        if base_rpm is None:
+            raise RuntimeError("no throttle reading")
 
         mode = state.mode
         current_direction = state.current_direction
+        single_rpm = base_rpm if params.long_press_rpm is None else params.long_press_rpm
 
         # ---------------- Mode Handling ----------------
         if mode == state.MODE_SINGLE_LEFT:
-            target_left = base_rpm
-            target_right = state.SINGLE_LEFT_LOW  
+            target_left = single_rpm
+            target_right = params.single_low_rpm
 
         elif mode == state.MODE_SINGLE_RIGHT:
-            target_left = state.SINGLE_RIGHT_LOW  
-            target_right = base_rpm
+            target_left = params.single_low_rpm
+            target_right = single_rpm
 
         else:
             # Dead zone check 
-            if base_rpm < 120:  # threshold
+            if not params.throttle_drive or base_rpm < params.throttle_deadzone:
                 motor_manager.set_wheels(0, 0, current_direction)
                 state.current_rpm = 0
                 state.last_left_rpm = 0
@@ -150,38 +142,22 @@ def periodic_drive(now, motor_manager):
             target_left = target_right = base_rpm
             state.current_rpm = base_rpm
 
-        # ---------------- Gradient Limiter ----------------
-        def apply_gradient(target, current, slew_rate):
-        
-            if target < current and (current - target) > (3 * slew_rate):
-                return max(target, current - (3 * slew_rate))  # faster decay
-            
-            if target > current + slew_rate:
-                return current + slew_rate
-            elif target < current - slew_rate:
-                return current - slew_rate
-            else:
-                return target
-
-        rpm_left = apply_gradient(target_left, state.last_left_rpm, RPM_SLEW_RATE)
-        rpm_right = apply_gradient(target_right, state.last_right_rpm, RPM_SLEW_RATE)
-
         # Apply motor command
-        motor_manager.set_wheels(rpm_left, rpm_right, current_direction)
+        motor_manager.set_wheels(target_left, target_right, current_direction)
 
         # Save for next cycle
-        state.last_left_rpm = rpm_left
-        state.last_right_rpm = rpm_right
+        state.last_left_rpm = target_left
+        state.last_right_rpm = target_right
 
     except Exception as e:
-        print(f"Throttle/feedback drive failed: {e}")
+        diag.error("Drive", "Throttle/feedback drive failed: %s", e)
         safe_stop(motor_manager)
 
-def handle_button_edges(now, motor_manager):
+def handle_button_edges(now, motor_manager, params, inputs):
     """Detect button presses and update mode safely with shared state."""
 
     # -------- LEFT BUTTON --------
-    left_now = GPIO.input(state.LEFT_BTN_PIN) == GPIO.HIGH
+    left_now = inputs.left
 
     left_pressed = state.left_pressed
     left_press_start = state.left_press_start
@@ -189,8 +165,8 @@ def handle_button_edges(now, motor_manager):
     mode = state.mode
 
     if left_now and not left_pressed:  # Rising edge
-        if (now - left_last_rise) <= state.DOUBLE_PRESS_GAP:
-            begin_twirl(left=True)
+        if (now - left_last_rise) <= params.double_press_gap:
+            begin_twirl(left=True, motor_manager=motor_manager, params=params)
         else:
             state.left_press_start = now
         state.left_last_rise = now
@@ -198,19 +174,19 @@ def handle_button_edges(now, motor_manager):
 
     if left_now and left_pressed:
         if mode in (state.MODE_IDLE, state.MODE_SINGLE_LEFT, state.MODE_SINGLE_RIGHT):
-            if (now - left_press_start) >= state.LONG_PRESS_TIME and mode != state.MODE_SINGLE_LEFT:
+            if (now - left_press_start) >= params.long_press_time and mode != state.MODE_SINGLE_LEFT:
                 state.mode = state.MODE_SINGLE_LEFT
-                print("Single LEFT started")
+                diag.info("Drive", "Single LEFT started", every=0)
 
     if not left_now and left_pressed:  # Release
         if mode == state.MODE_SINGLE_LEFT:
             #safe_stop(motor_manager)
             state.mode = state.MODE_IDLE
-            print("Single LEFT stopped")
+            diag.info("Drive", "Single LEFT stopped", every=0)
         state.left_pressed = False
 
     # -------- RIGHT BUTTON --------
-    right_now = GPIO.input(state.RIGHT_BTN_PIN) == GPIO.HIGH
+    right_now = inputs.right
 
     right_pressed = state.right_pressed
     right_press_start = state.right_press_start
@@ -218,8 +194,8 @@ def handle_button_edges(now, motor_manager):
     mode = state.mode
 
     if right_now and not right_pressed:
-        if (now - right_last_rise) <= state.DOUBLE_PRESS_GAP:
-            begin_twirl(left=False)
+        if (now - right_last_rise) <= params.double_press_gap:
+            begin_twirl(left=False, motor_manager=motor_manager, params=params)
         else:
             state.right_press_start = now
         state.right_last_rise = now
@@ -227,29 +203,29 @@ def handle_button_edges(now, motor_manager):
 
     if right_now and right_pressed:
         if mode in (state.MODE_IDLE, state.MODE_SINGLE_LEFT, state.MODE_SINGLE_RIGHT):
-            if (now - right_press_start) >= state.LONG_PRESS_TIME and mode != state.MODE_SINGLE_RIGHT:
+            if (now - right_press_start) >= params.long_press_time and mode != state.MODE_SINGLE_RIGHT:
                 state.mode = state.MODE_SINGLE_RIGHT
-                print("Single RIGHT started")
+                diag.info("Drive", "Single RIGHT started", every=0)
 
     if not right_now and right_pressed:  # Release
         if mode == state.MODE_SINGLE_RIGHT:
             #safe_stop(motor_manager)
             state.mode = state.MODE_IDLE
-            print("Single RIGHT stopped")
+            diag.info("Drive", "Single RIGHT stopped", every=0)
         state.right_pressed = False
 
-def rotary_motor_step(motor_manager):
+def rotary_motor_step(motor_manager, params, inputs):
     """Runs a single step of rotary motor logic (independent of drive motors)."""
  # ?? Protect shared state
-        # Stop rotary motor if switch is OFF
-    if GPIO.input(state.ROTARY_SWITCH_PIN) == GPIO.LOW:
+        # Stop rotary motor if switch is OFF or the mode has no rotary
+    if not params.rotary_allowed or not inputs.rotary_switch:
         rotary_motor_stop(motor_manager)
         state.rotary_current_rpm = 0
         return
 
     try:
-        throttle_value = rotary_throttle_channel.value
-        throttle_rpm = adc_to_rpm(throttle_value)
+        throttle_value = read_adc(rotary_throttle_channel)
+        throttle_rpm = adc_to_rpm(throttle_value, params.max_rpm)
         state.rotary_current_rpm = throttle_rpm
         if throttle_rpm > 80:  # Dead zone filter
             motor_manager.set_rotary(throttle_rpm, state.current_direction)
@@ -258,7 +234,7 @@ def rotary_motor_step(motor_manager):
             state.rotary_current_rpm = 0
 
     except Exception as e:
-        print(f"Rotary throttle read failed: {e}")
+        diag.error("Drive", "Rotary throttle read failed: %s", e)
         rotary_motor_stop(motor_manager)
 
 def rotary_motor_stop(motor_manager):
@@ -267,7 +243,7 @@ def rotary_motor_stop(motor_manager):
         motor_manager.set_rotary(0, 0x00)
         state.is_safe_stop = True
     except Exception as e:
-        print("Error setting rotary stop:", e)
+        diag.error("Drive", "Error setting rotary stop: %s", e)
 
 def run(motor_manager):
     """Run rotary + wheels at fixed RPM (test/demo)."""
@@ -276,41 +252,24 @@ def run(motor_manager):
         motor_manager.set_wheels(500, 500, state.current_direction)
         state.is_safe_stop = False
     except Exception as e:
-        print("Error running motors:", e)
+        diag.error("Drive", "Error running motors: %s", e)
 
 
-def safe_stop(motor_manager):
-    """Gradually stop rotary + wheels using gradient."""
+def safe_stop(motor_manager, emergency=False):
+    """Stop rotary + wheels; MotorManager ramps them down (emergency rate if asked)."""
 
     try:
-        RPM_SLEW_RATE = 250  # same as periodic_drive
-
-        def apply_gradient(target, current, slew_rate):
-            if target > current + slew_rate:
-                return current + slew_rate
-            elif target < current - slew_rate:
-                return current - slew_rate
-            else:
-                return target
-
-        # ---- Wheels ----
-        rpm_left = apply_gradient(0, state.last_left_rpm, RPM_SLEW_RATE)
-        rpm_right = apply_gradient(0, state.last_right_rpm, RPM_SLEW_RATE)
-        motor_manager.set_wheels(rpm_left, rpm_right, 0x00)
-
-        # ---- Rotary ----
-        rotary_rpm = apply_gradient(0, state.rotary_current_rpm, RPM_SLEW_RATE)
-        motor_manager.set_rotary(rotary_rpm, 0x00)
+        motor_manager.stop_all(emergency=emergency)
 
         # Save updated values
-        state.last_left_rpm = rpm_left
-        state.last_right_rpm = rpm_right
-        state.rotary_current_rpm = rotary_rpm
+        state.last_left_rpm = 0
+        state.last_right_rpm = 0
+        state.rotary_current_rpm = 0
         state.current_rpm = 0
         state.is_safe_stop = True
 
     except Exception as e:
-        print("Error during safe_stop:", e)
+        diag.error("Drive", "Error during safe_stop: %s", e)
 
 def wheel_break_stop(motor_manager):
     """Gradually stop both motors using gradient."""
@@ -322,137 +281,142 @@ def wheel_break_stop(motor_manager):
         state.is_safe_stop = True
 
     except Exception as e:
-        print("Error setting safe_stop:", e)
+        diag.error("Drive", "Error setting safe_stop: %s", e)
 
 
 def wheel_safe_stop(motor_manager):
-    """Gradually stop both motors using gradient."""
+    """Stop both wheels; MotorManager ramps them down."""
     try:
-        RPM_SLEW_RATE = 250  # same slew rate as periodic_drive
-
-        def apply_gradient(target, current, slew_rate):
-            if target > current + slew_rate:
-                return current + slew_rate
-            elif target < current - slew_rate:
-                return current - slew_rate
-            else:
-                return target
-
-        # Ramp both wheels toward 0
-        rpm_left = apply_gradient(0, state.last_left_rpm, RPM_SLEW_RATE)
-        rpm_right = apply_gradient(0, state.last_right_rpm, RPM_SLEW_RATE)
-
-        motor_manager.set_wheels(rpm_left, rpm_right, 0x00)
+        motor_manager.set_wheels(0, 0, 0x00)
 
         # Save new state
-        state.last_left_rpm = rpm_left
-        state.last_right_rpm = rpm_right
+        state.last_left_rpm = 0
+        state.last_right_rpm = 0
         state.is_safe_stop = True
 
     except Exception as e:
-        print("Error setting safe_stop:", e)
+        diag.error("Drive", "Error setting safe_stop: %s", e)
 
 
-def ramp_wheel_rpm(motor_manager, target_rpm, direction, step=50, delay=0.05):
+# ---------- Direction change (state machine) ----------
+DIR_IDLE = 0
+DIR_RAMP_DOWN = 1
+DIR_PAUSE = 2
+DIR_SWITCH = 3
+DIR_RAMP_UP = 4
+
+def request_direction_change(now):
     """
-    Smoothly ramp both wheels to the target RPM in the given direction.
-    Uses global state.current_rpm and state_lock for thread safety.
+    Direction button edge. Starts a reversal, or undoes one that has not
+    switched yet (second press during ramp-down/pause ramps back up in the
+    original direction). Edges inside DIRECTION_DEBOUNCE are ignored.
     """
-    rpm = state.current_rpm
-
-    while rpm != target_rpm:
-        if rpm < target_rpm:
-            rpm = min(rpm + step, target_rpm)
-        else:
-            rpm = max(rpm - step, target_rpm)
-
-        print("Ramping wheels to", rpm)
-        try:
-            motor_manager.set_wheels(rpm, rpm, direction)
-        except Exception as e:
-            print("Error setting wheels during ramp:", e)
-            break
+    if now - state.last_direction_toggle < state.DIRECTION_DEBOUNCE:
+        return
+    state.last_direction_toggle = now
 
-        state.current_rpm = rpm
-        time.sleep(delay)
+    phase = state.dir_change_phase
+    if phase == DIR_IDLE:
+        if state.mode in (state.MODE_TWIRL_LEFT, state.MODE_TWIRL_RIGHT):
+            state.mode = state.MODE_IDLE
+            diag.info("Drive", "Twirl cancelled by direction change", every=0)
+        diag.info("Drive", "Ramping down before direction change...", every=0)
+        phase = DIR_RAMP_DOWN
+    elif phase in (DIR_RAMP_DOWN, DIR_PAUSE):
+        diag.info("Drive", "Direction change cancelled", every=0)
+        phase = DIR_RAMP_UP
+    else:
+        diag.info("Drive", "Ramping down before direction change...", every=0)
+        phase = DIR_RAMP_DOWN
+    state.dir_change_phase = phase
 
-def toggle_direction(motor_manager, desired_rpm=0, step=100, delay=0.05, safety_pause=0.2):
+def advance_direction_change(now, motor_manager, target_rpm):
     """
-    Smoothly change wheel direction without jerks.
-    Runs in a separate thread to avoid blocking the main loop.
+    One control-tick step of an active reversal:
+    ramp-down -> pause -> switch -> ramp-up (to the live throttle target).
+    The ramps themselves are MotorManager's slew limiters; this only
+    sequences the targets. Returns True while the reversal owns the wheels.
     """
+    phase = state.dir_change_phase
+    if phase == DIR_IDLE:
+        return False
 
-    def _toggle():
-        # --- Ramp down first ---
+    rpm = 0
+    if phase == DIR_RAMP_DOWN:
+        if motor_manager.wheels_at_rest():
+            phase = DIR_PAUSE
+            state.dir_change_pause_end = now + state.DIRECTION_PAUSE
 
-        current_dir = state.current_direction
-        rpm = state.current_rpm
+    elif phase == DIR_PAUSE:
+        if now >= state.dir_change_pause_end:
+            phase = DIR_SWITCH
 
-        print("Ramping down before direction change...")
-        ramp_wheel_rpm(motor_manager, 0, current_dir, step=step, delay=delay)
-        time.sleep(safety_pause)
+    if phase == DIR_SWITCH:
+        toggle_direction()
+        phase = DIR_RAMP_UP
 
-        # --- Switch direction ---
-        state.current_direction = 0x02 if state.current_direction == 0x01 else 0x01
-        new_dir = state.current_direction
-        print("Direction set to", "REVERSE" if new_dir == 0x02 else "FORWARD")
+    elif phase == DIR_RAMP_UP:
+        # Hand the target back; the limiter ramps up from wherever it is
+        rpm = target_rpm
+        phase = DIR_IDLE
 
-        # --- Ramp back up ---
-        if desired_rpm > 0:
-            print(f"Ramping up to {desired_rpm} rpm in new direction...")
-            ramp_wheel_rpm(motor_manager, desired_rpm, new_dir, step=step, delay=delay)
+    try:
+        motor_manager.set_wheels(rpm, rpm, state.current_direction)
+    except Exception as e:
+        diag.error("Drive", "Error setting wheels during direction change: %s", e)
+        phase = DIR_IDLE
 
-    threading.Thread(target=_toggle, daemon=True).start()
+    state.dir_change_phase = phase
+    state.current_rpm = int(rpm)
+    state.last_left_rpm = int(rpm)
+    state.last_right_rpm = int(rpm)
+    return True
 
-def on_road_mode_step(motor_manager):
+def on_road_mode_step(motor_manager, params):
 
     """
-    Runs a single non-blocking step of On-Road logic.
-    Should be called repeatedly from main().
+    Runs a single non-blocking step of the drive logic with the mode table
+    `params` (a mode_manager.DriveMode). Called repeatedly by ModeEngine.step().
     """
     now = time.monotonic()
+    inputs = read_inputs()
 
     # ---------- Handle Button Presses ----------
-    handle_button_edges(now, motor_manager)
+    handle_button_edges(now, motor_manager, params, inputs)
 
     # ---------- DUAL BUTTON SAFETY ----------
-    left_b = GPIO.input(state.LEFT_BTN_PIN) == GPIO.HIGH
-    right_b = GPIO.input(state.RIGHT_BTN_PIN) == GPIO.HIGH
-
-    if left_b and right_b:
-        safe_stop(motor_manager)
+    dual = inputs.left and inputs.right
+    if dual and not state.dual_button_last_state:
+        blackbox.trigger("dual_button")
+    state.dual_button_last_state = dual
+    if dual:
+        safe_stop(motor_manager, emergency=True)
         state.mode = state.MODE_IDLE
+        state.dir_change_phase = DIR_IDLE
         return
                     
     # ---------- Direction Button Handling ----------
 
     last_dir_btn_state = state.direction_btn_last_state
 
-    # ---------- Read throttle ----------
-    try:
-        throttle_value = throttle_channel.value
-        base_rpm = adc_to_rpm(throttle_value)
-    except Exception as e:
-        print(f"Throttle read failed: {e}")
-        base_rpm = 0
-
-    #state.current_rpm = base_rpm
-    current_rpm = base_rpm
+    # ---------- Throttle ----------
+    base_rpm = None if inputs.throttle is None else adc_to_rpm(inputs.throttle, params.max_rpm)
+    current_rpm = base_rpm or 0
 
     # ---------- Read direction button ----------
-    direction_now = GPIO.input(state.DIRECTION_BTN_PIN) == GPIO.HIGH
+    direction_now = inputs.direction
 
     # ---------- Detect change ----------
     if direction_now != last_dir_btn_state:
-        toggle_direction(
-            motor_manager,
-            desired_rpm=current_rpm,
-            step=70,
-            delay=0.03,
-            safety_pause=0.3,
-        )
+        request_direction_change(now)
     # ---------- Update last state ----------
     state.direction_btn_last_state = direction_now
+
+    # ---------- Direction reversal owns the wheels ----------
+    if advance_direction_change(now, motor_manager, current_rpm):
+        rotary_motor_step(motor_manager, params, inputs)
+        return
+
     # ---------- Twirl Mode Execution ----------
     current_mode = state.mode
 
@@ -463,9 +427,5 @@ def on_road_mode_step(motor_manager):
 
         #motor_manager.set_wheels(100, 120, 0x01)
 
-        periodic_drive(now, motor_manager)
-        rotary_motor_step(motor_manager)
-
-    # Small loop delay
-    time.sleep(0.01)
-
+        periodic_drive(now, motor_manager, params, base_rpm)
+        rotary_motor_step(motor_manager, params, inputs)
@@ -0,0 +1,55 @@
+# slew_limiter.py
+# Rate limiter for motor commands, in RPM per second against monotonic time.
+#
+# One instance per motor lives inside MotorManager, so every command path
+# (throttle, twirl, safe stop, direction change) gets the same ramps no
+# matter how often its caller runs.
+
+
+class SlewLimiter:
+    """
+    Limits how fast the commanded (rpm, direction) may change.
+
+    accel      rpm/s when speeding up
+    decel      rpm/s when slowing down
+    emergency  rpm/s when slowing down with emergency=True
+
+    A direction change is never passed through while the motor is turning:
+    the output first ramps to 0 in the old direction, then switches.
+    """
+
+    def __init__(self, accel, decel, emergency):
+        self.accel = float(accel)
+        self.decel = float(decel)
+        self.emergency = float(emergency)
+        self.rpm = 0.0
+        self.direction = 0
+        self._last = None
+
+    def reset(self, rpm=0, direction=0):
+        self.rpm = float(rpm)
+        self.direction = direction
+        self._last = None
+
+    def update(self, target_rpm, direction, now, emergency=False):
+        """Advance to monotonic time `now`; returns the limited (rpm, direction)."""
+        dt = 0.0 if self._last is None else max(0.0, now - self._last)
+        self._last = now
+
+        if direction != self.direction:
+            if self.rpm > 0:
+                target_rpm = 0          # finish stopping in the old direction first
+            else:
+                self.direction = direction
+
+        rpm = self.rpm
+        if target_rpm > rpm:
+            rpm = min(float(target_rpm), rpm + self.accel * dt)
+        elif target_rpm < rpm:
+            rate = self.emergency if emergency else self.decel
+            rpm = max(float(target_rpm), rpm - rate * dt)
+        self.rpm = rpm
+
+        if rpm == 0 and direction != self.direction:
+            self.direction = direction
+        return int(round(rpm)), self.direction
@@ -1 +1,132 @@
 # Traction control logic
+#
+# Slip is estimated per drive wheel on every feedback frame (device 6 =
+# left, device 4 = right) from
+#   - feedback running above the limited command by SLIP_RPM_MARGIN, and
+#   - feedback acceleration beyond SLIP_ACCEL_FACTOR x the wheel slew rate
+#     (a gripping wheel cannot spin up faster than it is commanded to).
+# A wheel commanded down (throttle release, reversal ramp and pause) coasts
+# behind its command, so the margin test only runs once the command has
+# been steady or rising for SLIP_SETTLE_S, outside a direction change;
+# while the command is falling or zero the wheel is not slipping.
+# A detection cuts that wheel's command factor at once; MotorManager is
+# woken to send the reduced command inside the same feedback period. The
+# factor recovers at SLIP_RECOVERY_RATE per second once the wheel grips.
+#
+# The command is also capped at the motor rpm for config.MAX_SAFE_SPEED.
+# All per-frame state lives in fixed-size lists allocated here, so
+# on_feedback does no allocation beyond Python floats.
+import math
+
+import config
+import state
+
+LEFT_DEVICE = 6
+RIGHT_DEVICE = 4
+HISTORY = 4             # feedback frames spanned by the acceleration estimate
+SLIP_MIN_RPM = 100      # below this, feedback noise dominates
+DIR_IDLE = 0            # state.dir_change_phase when no reversal runs (control/on_road.py)
+
+
+def safe_speed_rpm(kmh=None):
+    """Motor rpm at `kmh` (default config.MAX_SAFE_SPEED)."""
+    kmh = config.MAX_SAFE_SPEED if kmh is None else kmh
+    wheel_rpm = kmh * 1000.0 / 60.0 / (math.pi * config.WHEEL_DIAMETER_M)
+    return wheel_rpm * config.WHEEL_GEAR_RATIO
+
+
+class TractionControl:
+    def __init__(self, enabled=None, accel_limit=None):
+        self.enabled = config.TRACTION_CONTROL_ENABLED if enabled is None else enabled
+        if accel_limit is None:
+            accel_limit = state.WHEEL_ACCEL_RATE * config.SLIP_ACCEL_FACTOR
+        self.accel_limit = accel_limit
+        self.max_rpm = safe_speed_rpm()
+
+        # Per-wheel slots: 0 = left, 1 = right
+        self._slot = {LEFT_DEVICE: 0, RIGHT_DEVICE: 1}
+        self._rpm = [[0.0] * HISTORY, [0.0] * HISTORY]     # feedback ring
+        self._t = [[0.0] * HISTORY, [0.0] * HISTORY]       # arrival times
+        self._n = [0, 0]                                    # frames seen
+        self._last = [None, None]                          # last factor update
+        self._cmd = [0, 0]                                  # command at the last frame
+        self._fell = [None, None]                          # when the command last fell
+        self.factor = [1.0, 1.0]
+        self.slipping = [False, False]
+        self.accel = [0.0, 0.0]
+        self.events = 0
+
+    def on_feedback(self, device, rpm, now, cmd):
+        """
+        Feedback frame for `device` against its limited command `cmd`.
+        Returns True when slip starts on that wheel (caller should send
+        the reduced command now rather than at the next TX tick).
+        """
+        slot = self._slot.get(device)
+        if slot is None or not self.enabled:
+            return False
+
+        ring_rpm = self._rpm[slot]
+        ring_t = self._t[slot]
+        n = self._n[slot]
+        i = n % HISTORY
+        ring_rpm[i] = rpm
+        ring_t[i] = now
+        self._n[slot] = n + 1
+
+        # Acceleration over the ring (oldest -> newest)
+        accel = 0.0
+        if n + 1 >= HISTORY:
+            j = (n + 1) % HISTORY
+            span = now - ring_t[j]
+            if span > 0:
+                accel = (rpm - ring_rpm[j]) / span
+        self.accel[slot] = accel
+
+        # Command falling (or held off by a reversal): feedback lags behind it
+        prev = self._cmd[slot]
+        self._cmd[slot] = cmd
+        falling = cmd == 0 or cmd < prev
+        if falling or state.dir_change_phase != DIR_IDLE:
+            self._fell[slot] = now
+        fell = self._fell[slot]
+        settled = fell is None or now - fell >= config.SLIP_SETTLE_S
+
+        slip = not falling and rpm >= SLIP_MIN_RPM and (
+            (settled and rpm - cmd > config.SLIP_RPM_MARGIN) or accel > self.accel_limit)
+
+        # Factor: cut immediately on onset, recover linearly while gripping
+        last = self._last[slot]
+        self._last[slot] = now
+        onset = slip and not self.slipping[slot]
+        if onset:
+            self.factor[slot] = max(config.SLIP_MIN_FACTOR,
+                                    self.factor[slot] - config.SLIP_TORQUE_CUT)
+            self.events += 1
+        elif not slip and last is not None and self.factor[slot] < 1.0:
+            self.factor[slot] = min(1.0, self.factor[slot] + config.SLIP_RECOVERY_RATE * (now - last))
+        self.slipping[slot] = slip
+
+        state.wheel_slip_detected = self.slipping[0] or self.slipping[1]
+        state.traction_factor_left = self.factor[0]
+        state.traction_factor_right = self.factor[1]
+        state.wheel_slip_events = self.events
+        return onset
+
+    def reset(self):
+        """Back to full commands (feedback lost: nothing to estimate slip from)."""
+        if self.factor[0] != 1.0 or self.factor[1] != 1.0 or self.slipping[0] or self.slipping[1]:
+            self.factor[0] = self.factor[1] = 1.0
+            self.slipping[0] = self.slipping[1] = False
+            self._n[0] = self._n[1] = 0
+            self._last[0] = self._last[1] = None
+            state.wheel_slip_detected = False
+            state.traction_factor_left = state.traction_factor_right = 1.0
+
+    def limit(self, left, right):
+        """Apply the per-wheel factors and the safe-speed cap to two rpm commands."""
+        if not self.enabled:
+            return left, right
+        cap = self.max_rpm
+        return (int(min(left * self.factor[0], cap)),
+                int(min(right * self.factor[1], cap)))
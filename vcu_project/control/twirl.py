@@ -1 +1,91 @@
+# twirl.py
+# Twirl profiles: validated once, precompiled into time-indexed setpoint tables.
+#
+# A profile is a list of steps (duration s, left rpm, right rpm). Each step
+# is entered through a linear ramp of `ramp` seconds from the previous
+# step's setpoint, so the wheels never jump between steps. The compiled
+# table holds one (left, right) pair every TABLE_DT seconds; sampling is a
+# single index lookup, so the motor TX loop can read it at its own rate.
+import config
 
+TABLE_DT = 0.01          # seconds per table entry (100 Hz)
+MAX_PROFILE_TIME = 120   # seconds, guards against typos in durations
+
+
+class TwirlProfile:
+    def __init__(self, name, steps, ramp=0.0, dt=TABLE_DT):
+        validate(name, {"steps": steps, "ramp": ramp})
+        self.name = name
+        self.steps = [tuple(step) for step in steps]
+        self.ramp = float(ramp)
+        self.dt = dt
+        self.duration = sum(step[0] for step in self.steps)
+        self.left, self.right = self._compile()
+
+    def _compile(self):
+        """Expand the steps into per-dt (left, right) setpoints."""
+        n = int(round(self.duration / self.dt))
+        left = [0] * n
+        right = [0] * n
+
+        prev_l, prev_r = self.steps[0][1], self.steps[0][2]
+        t_start = 0.0
+        for duration, rpm_l, rpm_r in self.steps:
+            ramp = min(self.ramp, duration)
+            first = int(round(t_start / self.dt))
+            last = min(int(round((t_start + duration) / self.dt)), n)
+            for i in range(first, last):
+                t = i * self.dt - t_start
+                if ramp > 0 and t < ramp:
+                    k = t / ramp
+                    left[i] = int(round(prev_l + (rpm_l - prev_l) * k))
+                    right[i] = int(round(prev_r + (rpm_r - prev_r) * k))
+                else:
+                    left[i] = rpm_l
+                    right[i] = rpm_r
+            prev_l, prev_r = rpm_l, rpm_r
+            t_start += duration
+        return left, right
+
+    def sample(self, t):
+        """(left, right) setpoint at t seconds into the profile, None once finished."""
+        i = int(t / self.dt)
+        if i < 0:
+            i = 0
+        if i >= len(self.left):
+            return None
+        return self.left[i], self.right[i]
+
+
+def validate(name, spec, max_rpm=None):
+    """Raise ValueError describing the first problem in a profile spec."""
+    max_rpm = config.TWIRL_MAX_RPM if max_rpm is None else max_rpm
+    steps = spec.get("steps")
+    if not steps:
+        raise ValueError(f"Twirl profile '{name}': no steps")
+
+    total = 0.0
+    for i, step in enumerate(steps):
+        if len(step) != 3:
+            raise ValueError(f"Twirl profile '{name}' step {i}: expected (duration, left_rpm, right_rpm)")
+        duration, rpm_l, rpm_r = step
+        if duration <= 0:
+            raise ValueError(f"Twirl profile '{name}' step {i}: duration must be > 0")
+        for rpm in (rpm_l, rpm_r):
+            if not 0 <= rpm <= max_rpm:
+                raise ValueError(f"Twirl profile '{name}' step {i}: rpm {rpm} outside 0..{max_rpm}")
+        total += duration
+
+    if total > MAX_PROFILE_TIME:
+        raise ValueError(f"Twirl profile '{name}': {total:.1f}s exceeds {MAX_PROFILE_TIME}s")
+    if spec.get("ramp", 0.0) < 0:
+        raise ValueError(f"Twirl profile '{name}': ramp must be >= 0")
+
+
+def load_profiles(specs=None):
+    """Validate and compile every profile in config.TWIRL_PROFILES (or `specs`)."""
+    specs = config.TWIRL_PROFILES if specs is None else specs
+    profiles = {}
+    for name, spec in specs.items():
+        profiles[name] = TwirlProfile(name, spec["steps"], spec.get("ramp", 0.0))
+    return profiles
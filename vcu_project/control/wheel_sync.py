@@ -0,0 +1,101 @@
+# wheel_sync.py
+# Left/right wheel synchronisation from controller feedback (PI, anti-windup).
+#
+# The controller holds the *requested* differential: the error is
+#     (fb_left - fb_right) - (cmd_left - cmd_right)
+# so straight driving (equal commands) and single-wheel / twirl moves
+# (unequal commands) are treated the same. The correction only ever trims
+# the motor that is running fast, never raises one above its command, and
+# is bounded by state.RE_ALIGN_RPM_REDUCTION.
+import state
+
+# ---------------- Config ----------------
+KP = 0.3                 # trim rpm per rpm of differential error
+KI = 3.0                 # trim rpm per (rpm * s)
+FEEDBACK_MAX_AGE = 0.1   # s; the other wheel's frame must be this fresh
+MAX_DT = 0.2             # s; longer gaps do not integrate (stalled feedback)
+
+LEFT_DEVICE = 6
+RIGHT_DEVICE = 4
+
+
+class WheelSync:
+    def __init__(self, kp=KP, ki=KI,
+                 tolerance=None, max_trim=None, low_rpm_off=None):
+        self.kp = kp
+        self.ki = ki
+        self.tolerance = state.FEEDBACK_TOLERANCE if tolerance is None else tolerance
+        self.max_trim = state.RE_ALIGN_RPM_REDUCTION if max_trim is None else max_trim
+        self.low_rpm_off = state.LOW_RPM_FEEDBACK_OFF if low_rpm_off is None else low_rpm_off
+
+        self.integral = 0.0
+        self.error = 0.0
+        self.trim_left = 0
+        self.trim_right = 0
+        self.updates = 0
+
+        # Latest feedback per side: rpm, monotonic arrival time
+        self._fb = {LEFT_DEVICE: (0, None), RIGHT_DEVICE: (0, None)}
+        self._last_update = None
+
+    def reset(self):
+        self.integral = 0.0
+        self.error = 0.0
+        self.trim_left = 0
+        self.trim_right = 0
+        self._last_update = None
+
+    def on_feedback(self, device, rpm, now, cmd_left, cmd_right):
+        """
+        Feedback frame from `device` at monotonic time `now`. Runs one
+        controller update when the other wheel's latest frame is fresh, so
+        the loop rate follows the feedback rate.
+        """
+        if device not in self._fb:
+            return
+        self._fb[device] = (rpm, now)
+        other = RIGHT_DEVICE if device == LEFT_DEVICE else LEFT_DEVICE
+        other_t = self._fb[other][1]
+        if other_t is None or now - other_t > FEEDBACK_MAX_AGE:
+            return
+        self.update(self._fb[LEFT_DEVICE][0], self._fb[RIGHT_DEVICE][0],
+                    cmd_left, cmd_right, now)
+
+    def update(self, fb_left, fb_right, cmd_left, cmd_right, now):
+        """One PI step; returns (trim_left, trim_right) to subtract from the commands."""
+        dt = 0.0 if self._last_update is None else now - self._last_update
+        self._last_update = now
+        self.updates += 1
+
+        # Bypass at low speed: feedback there is noisy and trims would
+        # stall the slow wheel.
+        if min(cmd_left, cmd_right) < self.low_rpm_off:
+            self.reset()
+            self._last_update = now
+            return self._publish()
+
+        error = (fb_left - fb_right) - (cmd_left - cmd_right)
+        self.error = error
+        if abs(error) <= self.tolerance:
+            error = 0.0
+
+        out = self.kp * error + self.integral
+        if dt <= MAX_DT:
+            candidate = self.integral + self.ki * error * dt
+            # Anti-windup: only integrate while the output is not pinned in
+            # the direction the error is pushing it.
+            if abs(out) < self.max_trim or (out > 0) != (error > 0):
+                self.integral = max(-self.max_trim, min(candidate, self.max_trim))
+            out = self.kp * error + self.integral
+        out = max(-self.max_trim, min(out, self.max_trim))
+
+        # out > 0: left runs fast relative to the request -> trim left
+        self.trim_left = int(round(out)) if out > 0 else 0
+        self.trim_right = int(round(-out)) if out < 0 else 0
+        return self._publish()
+
+    def _publish(self):
+        state.wheel_sync_error = self.error
+        state.wheel_sync_trim_left = self.trim_left
+        state.wheel_sync_trim_right = self.trim_right
+        return self.trim_left, self.trim_right
@@ -1,7 +1,7 @@
 # lcd_display.py
 import threading
 import time
-from RPLCD.i2c import CharLCD
+import hal
 import state
 
 state.stopwatch_start = time.time()
@@ -15,7 +15,7 @@ def update_stopwatch():
 class LCDDisplay(threading.Thread):
     def __init__(self, address=0x27, port=1, cols=16, rows=4):
         super().__init__(daemon=True)
-        self.lcd = CharLCD(
+        self.lcd = hal.open_lcd(
             i2c_expander='PCF8574',
             address=address,
             port=port,
@@ -1,13 +1,31 @@
 import time
 import threading
-from RPLCD.i2c import CharLCD
+import hal
 import state
-import RPi.GPIO as GPIO
+from hal import GPIO
+from control import faults
+
+
+def fmt(name, spec):
+    """Fresh value of state field `name` formatted with `spec`; dashes when stale."""
+    value = state.fresh_value(name)
+    if value is None:
+        width = int(spec.lstrip("0").split(".")[0] or 2)
+        return "-" * width
+    return format(value, spec)
+
+
+def active_faults():
+    """(left, right, rotary) active fault codes from faults.monitor; () for a stale controller."""
+    active = faults.monitor.active
+    return tuple(active[device] if state.is_fresh(f"device_{device}_error") else ()
+                 for device in (6, 4, 5))
+
 
 class LCDManager:
     def __init__(self, address=0x27, port=1, cols=16, rows=4, page_time=5, request_pin=18):
         # --- LCD setup ---
-        self.lcd = CharLCD(
+        self.lcd = hal.open_lcd(
             i2c_expander='PCF8574',
             address=address,
             port=port,
@@ -21,6 +39,7 @@ class LCDManager:
         self.pages = [self.page_main, self.page_main_2]
         self.thread = None
         self.page_time = page_time
+        self.heartbeat = None   # utils.watchdog.Heartbeat, set by main
 
     def clear(self):
         self.lcd.clear()
@@ -40,22 +59,26 @@ class LCDManager:
 
     # --- Pages ---
     def page_main(self):
-        self.show_message(0, f"L:{state.device_6_rpm:4} c:{state.device_6_current:4}")
-        self.show_message(1, f"R:{state.device_4_rpm:4} C:{state.device_4_current:3}")
-        self.show_message(2, f"Rot:{state.device_5_rpm:4} C:{state.device_5_current:3}")
-        self.show_message(3, f"T:{state.device_6_current + state.device_4_current + state.device_5_current:4.1f} SOC:{state.soc:3}")
+        self.show_message(0, f"L:{fmt('device_6_rpm', '4')} c:{fmt('device_6_current', '4')}")
+        self.show_message(1, f"R:{fmt('device_4_rpm', '4')} C:{fmt('device_4_current', '3')}")
+        self.show_message(2, f"Rot:{fmt('device_5_rpm', '4')} C:{fmt('device_5_current', '3')}")
+        currents = [state.fresh_value(f"device_{n}_current") for n in (6, 4, 5)]
+        currents = [c for c in currents if c is not None]
+        total = f"{sum(currents):4.1f}" if currents else "----"
+        soc = fmt("soc", "3.0f")
+        self.show_message(3, f"T:{total} SOC:{soc}")
 
     def page_main_2(self):
         self.show_message(0, f"Power:{state.power:6.1f}")
         self.show_message(1, f"TotEng:{state.total_energy:6.1f}")
-        self.show_message(2, f"Rot:{state.device_5_rpm:4} C:{state.device_5_current:3}")
+        self.show_message(2, f"Rot:{fmt('device_5_rpm', '4')} C:{fmt('device_5_current', '3')}")
         self.show_message(3, f"T:{state.hours:02}:{state.mins:02}:{state.secs:02}")
 
     def page_error(self):
         self.show_message(0, "**** ERROR *****")
-        self.show_message(1, f"LEFT :{state.device_6_error:02}")
-        self.show_message(2, f"RIGHT:{state.device_4_error:02}")
-        self.show_message(3, f"ROTRY:{state.device_5_error:02}")
+        for line, codes in enumerate(active_faults(), start=1):
+            name = faults.DEVICES[(6, 4, 5)[line - 1]]
+            self.show_message(line, f"{name:5}:{' '.join(codes) or 'OK'}"[:16])
 
     def on_request(self, channel):
         """Called when the request button is pressed."""
@@ -85,15 +108,15 @@ class LCDManager:
         last_page_change = time.time()
 
         while self.running:
+            if self.heartbeat:
+                self.heartbeat.beat()
             # Update stopwatch
             elapsed = int(time.time() - state.stopwatch_start)
             state.hours, rem = divmod(elapsed, 3600)
             state.mins, state.secs = divmod(rem, 60)
 
-            # Show error if any device has an error
-            if (state.device_4_error != 0 or 
-                state.device_5_error != 0 or 
-                state.device_6_error != 0):
+            # Show error if any controller has an active fault (a stale one is not shown)
+            if any(active_faults()):
                 self.page_error()
 
             else:
@@ -1,6 +1,6 @@
 # st7920_driver.py
-import RPi.GPIO as GPIO
-import spidev
+import hal
+from hal import GPIO
 import time
 from copy import deepcopy
 
@@ -22,8 +22,7 @@ class ST7920:
         GPIO.setup(self.CS_PIN, GPIO.OUT)
 
         # SPI setup
-        self.spi = spidev.SpiDev()
-        self.spi.open(spi_bus, spi_dev)
+        self.spi = hal.open_spi(spi_bus, spi_dev)
         self.spi.max_speed_hz = 1800000
 
         # Framebuffer
@@ -1,21 +1,20 @@
-import spidev
-import RPi.GPIO as GPIO
+import hal
+from hal import GPIO
 from copy import deepcopy
 
 # GPIO pins
 RST_PIN = 25
 CS_PIN  = 8  # GPIO8 (CE0)
 
-GPIO.setmode(GPIO.BCM)
-GPIO.setwarnings(False)
-GPIO.setup(RST_PIN, GPIO.OUT)
-GPIO.setup(CS_PIN, GPIO.OUT)
-
 class ST7920:
     def __init__(self):
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        GPIO.setup(RST_PIN, GPIO.OUT)
+        GPIO.setup(CS_PIN, GPIO.OUT)
+
         # SPI setup
-        self.spi = spidev.SpiDev()
-        self.spi.open(0, 1)  # SPI0 CE0
+        self.spi = hal.open_spi(0, 1)  # SPI0 CE0
         self.spi.max_speed_hz = 1800000
         self.spi.cshigh = False  # normal CS
         
@@ -1,5 +1,5 @@
-import RPi.GPIO as GPIO
-import spidev
+import hal
+from hal import GPIO
 import time
 from copy import deepcopy
 
@@ -7,18 +7,20 @@ from copy import deepcopy
 RST_PIN = 17  # Reset
 CS_PIN  = 27  # Chip Select
 
-# ---------- GPIO SETUP ----------
-GPIO.setwarnings(False)
-GPIO.setmode(GPIO.BCM)
-GPIO.cleanup()
-GPIO.setup(RST_PIN, GPIO.OUT)
-GPIO.setup(CS_PIN, GPIO.OUT)
+spi = None
 
-# ---------- SPI SETUP ----------
-spi = spidev.SpiDev()
-spi.open(0, 1)      # SPI0, CE0
-spi.max_speed_hz = 1800000
-#spi.cshigh = True    # Inverted CS
+# ---------- GPIO / SPI SETUP ----------
+def lcd_open():
+    """Claim the pins and open SPI (done by lcd_init, never at import)."""
+    global spi
+    GPIO.setwarnings(False)
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(RST_PIN, GPIO.OUT)
+    GPIO.setup(CS_PIN, GPIO.OUT)
+
+    spi = hal.open_spi(0, 1)      # SPI0, CE0
+    spi.max_speed_hz = 1800000
+    #spi.cshigh = True    # Inverted CS
 
 # ---------- LCD FUNCTIONS ----------
 def lcd_reset():
@@ -44,6 +46,8 @@ def lcd_data(dat):
 
 # ---------- INITIALIZE LCD ----------
 def lcd_init():
+    if spi is None:
+        lcd_open()
     lcd_reset()
     lcd_command(0x30)  # basic instruction set
     lcd_command(0x30)
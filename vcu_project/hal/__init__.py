@@ -0,0 +1,101 @@
+# hal/__init__.py
+# Hardware abstraction layer: real Raspberry Pi devices or simulated ones.
+#
+# The backend is chosen once at startup, either explicitly with select()
+# or on first use from the VCU_HAL environment variable (falls back to
+# config.HAL_BACKEND):
+#     VCU_HAL=sim python main.py
+#
+# Modules import the proxies from here instead of the device libraries:
+#     from hal import GPIO                 # drop-in for RPi.GPIO
+#     channel = hal.analog_in(0)           # ADS1115 A0 (.value / .voltage)
+#     bus = hal.open_can_bus("can0")       # python-can Bus
+#     lcd = hal.open_lcd(address=0x27)     # RPLCD CharLCD or null display
+import os
+import threading
+
+import config
+
+BACKENDS = ("real", "sim")
+
+_backend = None
+_select_lock = threading.Lock()
+
+# The ADS1115 is shared by the throttles and the ACS712 current sensor.
+# Hold this for every single-shot conversion (config write + read).
+adc_lock = threading.Lock()
+
+
+def select(name=None):
+    """Choose the backend ("real" or "sim"). Must run before any device is opened."""
+    global _backend
+    name = name or os.environ.get("VCU_HAL") or config.HAL_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HAL backend '{name}', expected one of {BACKENDS}")
+
+    with _select_lock:
+        if _backend is not None:
+            if _backend.NAME != name:
+                raise RuntimeError(f"HAL backend already set to '{_backend.NAME}'")
+            return _backend
+        if name == "sim":
+            from hal import sim as module
+        else:
+            from hal import real as module
+        _backend = module.Backend()
+        print(f"[HAL] {name} backend selected")
+        return _backend
+
+
+def backend():
+    """Active backend, selecting the default on first use."""
+    return _backend if _backend is not None else select()
+
+
+def is_simulated():
+    return backend().NAME == "sim"
+
+
+class _GPIOProxy:
+    """Forwards RPi.GPIO-style calls and constants to the active backend."""
+
+    def __getattr__(self, name):
+        return getattr(backend().gpio, name)
+
+
+GPIO = _GPIOProxy()
+
+
+def adc():
+    """Shared ADC device (ADS1115 or simulated); has .gain and .data_rate."""
+    return backend().adc()
+
+
+def analog_in(pin):
+    """Analog input channel on the shared ADC, with .value and .voltage."""
+    return backend().analog_in(pin)
+
+
+def open_can_bus(channel=None):
+    """python-can Bus on `channel` (config.CAN_CHANNEL by default)."""
+    return backend().open_can_bus(channel or config.CAN_CHANNEL)
+
+
+def can_link(channel=None):
+    """Interface status: {"operstate": "up"/"down"/..., "rx_errors", "tx_errors", "tx_dropped"}."""
+    return backend().can_link(channel or config.CAN_CHANNEL)
+
+
+def restart_can(channel=None):
+    """Take the interface down and up again (bitrate / restart-ms from config)."""
+    return backend().restart_can(channel or config.CAN_CHANNEL)
+
+
+def open_lcd(**kwargs):
+    """Character LCD (RPLCD CharLCD keyword arguments)."""
+    return backend().open_lcd(**kwargs)
+
+
+def open_spi(bus, device):
+    """spidev.SpiDev() already opened on (bus, device)."""
+    return backend().open_spi(bus, device)
@@ -0,0 +1,72 @@
+# hal/real.py
+# Raspberry Pi backend: RPi.GPIO, ADS1115 over I2C, socketcan, RPLCD, spidev.
+# Device libraries are imported here only, so off-target code never needs them.
+import os
+import threading
+import subprocess
+
+import config
+
+
+class Backend:
+    NAME = "real"
+
+    def __init__(self):
+        import RPi.GPIO as GPIO
+        self.gpio = GPIO
+        self._ads = None
+        self._ads_lock = threading.Lock()
+
+    # ----------- ADC -----------
+    def adc(self):
+        with self._ads_lock:
+            if self._ads is None:
+                import board
+                import busio
+                import adafruit_ads1x15.ads1115 as ADS
+                i2c = busio.I2C(board.SCL, board.SDA)
+                self._ads = ADS.ADS1115(i2c)
+            return self._ads
+
+    def analog_in(self, pin):
+        from adafruit_ads1x15.analog_in import AnalogIn
+        return AnalogIn(self.adc(), pin)
+
+    # ----------- CAN -----------
+    def open_can_bus(self, channel):
+        import can
+        return can.interface.Bus(channel=channel, interface=config.CAN_BUSTYPE)
+
+    def can_link(self, channel):
+        base = f"/sys/class/net/{channel}"
+        link = {"operstate": "missing", "rx_errors": 0, "tx_errors": 0, "tx_dropped": 0}
+        try:
+            with open(f"{base}/operstate") as f:
+                link["operstate"] = f.read().strip()
+            for name in ("rx_errors", "tx_errors", "tx_dropped"):
+                with open(f"{base}/statistics/{name}") as f:
+                    link[name] = int(f.read())
+        except OSError:
+            pass
+        return link
+
+    def restart_can(self, channel):
+        # Interface configuration needs netlink + CAP_NET_ADMIN; ip is the
+        # privileged helper the image already allows through sudo.
+        subprocess.run(["sudo", "ip", "link", "set", channel, "down"], check=False)
+        result = subprocess.run(
+            ["sudo", "ip", "link", "set", channel, "up", "type", "can",
+             "bitrate", str(config.CAN_BITRATE), "restart-ms", str(config.CAN_RESTART_MS)],
+            capture_output=True, text=True)
+        return result.returncode == 0
+
+    # ----------- Display -----------
+    def open_lcd(self, **kwargs):
+        from RPLCD.i2c import CharLCD
+        return CharLCD(**kwargs)
+
+    def open_spi(self, bus, device):
+        import spidev
+        spi = spidev.SpiDev()
+        spi.open(bus, device)
+        return spi
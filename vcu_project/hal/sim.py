@@ -0,0 +1,349 @@
+# hal/sim.py
+# Simulated backend: scripted GPIO edges, waveform-driven ADC, python-can
+# virtual (or vcan) bus, null LCD/SPI and a simple motor controller plant.
+#
+# Inputs are functions of time since the sim epoch, so the same scenario
+# always drives the stack the same way. A scenario can be given as a dict
+# or as a JSON file via VCU_SIM_SCENARIO:
+#     {
+#       "gpio": {"26": [[2.0, 1], [2.5, 0]]},            # pin: [[t, level], ...]
+#       "adc":  {"0": {"type": "ramp", "v0": 0.0, "v1": 3.0, "t0": 1.0, "t1": 5.0}}
+#     }
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+VOLTS_PER_COUNT = 4.096 / 32768   # ADS1115 at gain 1
+
+# Command / feedback frame layout of the motor controllers
+CMD_ID_BASE = 0x0CF10000
+FEEDBACK_ID_BASE = 0x0CF11E00
+MOTOR_DEVICES = (4, 5, 6)
+
+
+# ---------------- Waveforms (volts vs. seconds) ----------------
+def constant(v=0.0):
+    return lambda t: v
+
+
+def ramp(v0, v1, t0, t1):
+    span = max(t1 - t0, 1e-9)
+
+    def wave(t):
+        if t <= t0:
+            return v0
+        if t >= t1:
+            return v1
+        return v0 + (v1 - v0) * (t - t0) / span
+    return wave
+
+
+def sine(offset, amplitude, period):
+    return lambda t: offset + amplitude * math.sin(2 * math.pi * t / period)
+
+
+def steps(points, initial=0.0):
+    """Piecewise constant: [(t, v), ...] sorted by t."""
+    times = [p[0] for p in points]
+    values = [p[1] for p in points]
+
+    def wave(t):
+        i = bisect.bisect_right(times, t)
+        return values[i - 1] if i else initial
+    return wave
+
+
+WAVEFORMS = {"constant": constant, "ramp": ramp, "sine": sine, "steps": steps}
+
+
+def waveform_from_spec(spec):
+    """{"type": "ramp", "v0": ..} -> callable; plain numbers are constants."""
+    if isinstance(spec, (int, float)):
+        return constant(float(spec))
+    spec = dict(spec)
+    kind = spec.pop("type")
+    if kind not in WAVEFORMS:
+        raise ValueError(f"Unknown waveform type '{kind}'")
+    return WAVEFORMS[kind](**spec)
+
+
+# ---------------- GPIO ----------------
+class SimGPIO:
+    """RPi.GPIO look-alike. Input levels come from scripted edges."""
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._mode = None
+        self._default = {}      # pin -> level from pull resistor
+        self._outputs = {}      # pin -> last written level
+        self._edges = {}        # pin -> (times, levels)
+
+    def setmode(self, mode):
+        self._mode = mode
+
+    def getmode(self):
+        return self._mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pins, direction, pull_up_down=PUD_OFF, initial=None):
+        if isinstance(pins, int):
+            pins = [pins]
+        for pin in pins:
+            if direction == self.OUT:
+                self._outputs[pin] = self.LOW if initial is None else initial
+            else:
+                self._default[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def input(self, pin):
+        if pin in self._outputs:
+            return self._outputs[pin]
+        edges = self._edges.get(pin)
+        if edges:
+            i = bisect.bisect_right(edges[0], self._clock())
+            if i:
+                return edges[1][i - 1]
+        return self._default.get(pin, self.LOW)
+
+    def output(self, pin, level):
+        self._outputs[pin] = int(bool(level))
+
+    def cleanup(self, *args):
+        self._outputs.clear()
+
+    # ----------- Scripting -----------
+    def script(self, pin, edges):
+        """Replace the input script for `pin` with [(t, level), ...]."""
+        edges = sorted((float(t), int(level)) for t, level in edges)
+        self._edges[pin] = ([e[0] for e in edges], [e[1] for e in edges])
+
+    def set_input(self, pin, level):
+        """Hold `pin` at `level` from now on (drops any script)."""
+        self._edges.pop(pin, None)
+        self._default[pin] = int(level)
+
+
+# ---------------- ADC ----------------
+class SimADC:
+    def __init__(self):
+        self.gain = 1
+        self.data_rate = 860
+        self.waveforms = {}     # pin -> callable(t) -> volts
+
+
+class SimAnalogIn:
+    def __init__(self, adc, pin, clock):
+        self._adc = adc
+        self._pin = pin
+        self._clock = clock
+
+    @property
+    def voltage(self):
+        wave = self._adc.waveforms.get(self._pin)
+        return wave(self._clock()) if wave else 0.0
+
+    @property
+    def value(self):
+        counts = int(self.voltage / VOLTS_PER_COUNT)
+        return max(-32768, min(counts, 32767))
+
+
+# ---------------- Display ----------------
+class NullLCD:
+    """Accepts the RPLCD CharLCD calls the display modules use, draws nothing."""
+
+    def __init__(self, **kwargs):
+        self.cursor_pos = (0, 0)
+        self.display_enabled = True
+        self.lines = {}
+
+    def clear(self):
+        self.lines.clear()
+
+    def write_string(self, text):
+        self.lines[self.cursor_pos[0]] = text
+
+    def close(self, clear=False):
+        pass
+
+
+class NullSPI:
+    def __init__(self):
+        self.max_speed_hz = 0
+        self.cshigh = False
+        self.mode = 0
+
+    def open(self, bus, device):
+        pass
+
+    def xfer2(self, data):
+        return [0] * len(data)
+
+    def writebytes(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+# ---------------- Motor controller plant ----------------
+class SimMotorPlant:
+    """
+    First-order model of the three motor controllers. Listens for command
+    frames on the bus and answers with feedback frames (same layout as the
+    real controllers, decoded by manual_decode). `gains` lets a test model
+    mismatched left/right wheels.
+    """
+
+    def __init__(self, bus=None, tau=0.3, feedback_hz=50, gains=None):
+        self.bus = bus
+        self.tau = tau
+        self.period = 1.0 / feedback_hz
+        self.gains = {dev: 1.0 for dev in MOTOR_DEVICES}
+        self.gains.update(gains or {})
+        self.command = {dev: 0 for dev in MOTOR_DEVICES}
+        self.rpm = {dev: 0.0 for dev in MOTOR_DEVICES}
+        self.running = False
+        self.thread = None
+
+    def on_command(self, device, rpm, direction):
+        self.command[device] = rpm if direction in (0x01, 0x02) else 0
+
+    def step(self, dt):
+        """Advance the model by dt seconds."""
+        alpha = min(dt / self.tau, 1.0) if self.tau > 0 else 1.0
+        for dev in MOTOR_DEVICES:
+            target = self.command[dev] * self.gains[dev]
+            self.rpm[dev] += (target - self.rpm[dev]) * alpha
+
+    def feedback_frame(self, device):
+        import can
+        rpm = max(0, min(int(round(self.rpm[device])), 0xFFFF))
+        current = int(abs(self.rpm[device]) * 0.02 * 10)    # 0.1 A units
+        voltage = 480                                        # 48.0 V
+        data = bytes([rpm & 0xFF, rpm >> 8, current & 0xFF, (current >> 8) & 0xFF,
+                      voltage & 0xFF, voltage >> 8, 0x00, 0x00])
+        return can.Message(arbitration_id=FEEDBACK_ID_BASE + device,
+                           is_extended_id=True, data=data)
+
+    def _handle(self, msg):
+        dev = (msg.arbitration_id >> 8) & 0xFF
+        if (msg.arbitration_id & 0xFFFF00FF) == (CMD_ID_BASE | 0x1E) and dev in MOTOR_DEVICES:
+            data = msg.data
+            self.on_command(dev, data[0] | (data[1] << 8), data[3])
+
+    def run(self):
+        last = time.monotonic()
+        next_time = last
+        while self.running:
+            msg = self.bus.recv(timeout=0)
+            while msg is not None:
+                self._handle(msg)
+                msg = self.bus.recv(timeout=0)
+
+            now = time.monotonic()
+            self.step(now - last)
+            last = now
+            for dev in MOTOR_DEVICES:
+                self.bus.send(self.feedback_frame(dev))
+
+            next_time += self.period
+            time.sleep(max(0.0, next_time - time.monotonic()))
+
+    def start(self):
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+
+# ---------------- Backend ----------------
+class Backend:
+    NAME = "sim"
+
+    def __init__(self, scenario=None):
+        self.epoch = time.monotonic()
+        self.gpio = SimGPIO(self.clock)
+        self._adc = SimADC()
+        self.plant = None
+        # Tests flip operstate to model a downed interface
+        self.can_link_state = {"operstate": "up", "rx_errors": 0, "tx_errors": 0, "tx_dropped": 0}
+
+        if scenario is None and os.environ.get("VCU_SIM_SCENARIO"):
+            with open(os.environ["VCU_SIM_SCENARIO"]) as f:
+                scenario = json.load(f)
+        if scenario:
+            self.load_scenario(scenario)
+
+    def clock(self):
+        """Seconds since the sim epoch (scenario time)."""
+        return time.monotonic() - self.epoch
+
+    def restart_clock(self):
+        self.epoch = time.monotonic()
+
+    def load_scenario(self, scenario):
+        for pin, edges in scenario.get("gpio", {}).items():
+            self.gpio.script(int(pin), edges)
+        for pin, spec in scenario.get("adc", {}).items():
+            self._adc.waveforms[int(pin)] = waveform_from_spec(spec)
+
+    # ----------- ADC -----------
+    def adc(self):
+        return self._adc
+
+    def analog_in(self, pin):
+        return SimAnalogIn(self._adc, pin, self.clock)
+
+    # ----------- CAN -----------
+    def open_can_bus(self, channel):
+        """
+        In-process python-can virtual bus by default; set VCU_SIM_CAN to a
+        vcan interface (e.g. "vcan0") to go through the kernel instead.
+        """
+        import can
+        vcan = os.environ.get("VCU_SIM_CAN")
+        if vcan:
+            return can.interface.Bus(channel=vcan, interface="socketcan")
+        return can.interface.Bus(channel=f"vcu_sim_{channel}", interface="virtual")
+
+    def can_link(self, channel):
+        return dict(self.can_link_state)
+
+    def restart_can(self, channel):
+        self.can_link_state["operstate"] = "up"
+        return True
+
+    def start_motor_plant(self, channel="can0", **kwargs):
+        """Attach a SimMotorPlant to the sim bus so feedback frames flow."""
+        if self.plant is None:
+            self.plant = SimMotorPlant(self.open_can_bus(channel), **kwargs)
+            self.plant.start()
+        return self.plant
+
+    # ----------- Display -----------
+    def open_lcd(self, **kwargs):
+        return NullLCD(**kwargs)
+
+    def open_spi(self, bus, device):
+        return NullSPI()
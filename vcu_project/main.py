@@ -1,43 +1,65 @@
 # -*- coding: utf-8 -*-
+import sys
 import time
 import threading
-import RPi.GPIO as GPIO
+import hal
+import startup
+from hal import GPIO
 #import utils.logger   # <-- your new logging module
 from utils import logger
 from utils import machine_stats
-import can
+from utils import watchdog as wd
+from utils.blackbox import BlackBox
+import config
 import state
 
 
-from canbus.can_reader import setup_can_bus
 from canbus.can_bus_active import check_can0
+from canbus.can_health import CanHealthMonitor
+from canbus.can_recorder import CanRecorder
 from control.motor_manager import MotorManager, BMSManager
 #from utils.update_sheet import update_sheet
-from control.on_road import on_road_mode_step
+from control import on_road
+from control.mode_manager import ModeEngine
+from safety.safety import SafetyEvaluator
+from sensors.Current_sensor_acs import ACS712Monitor
+from sensors.temperature_sensor import TemperatureMonitor, SimulatedTemperatureBackend
 from display.lcd_display import LCDDisplay
+from display.lcd_display_th import LCDManager
 from control.motor_manager import manual_decode
 #from control.motor_manager import MotorManager
 
-# -------------------- LCD SETUP --------------------
-
-lcd = LCDDisplay()
-lcd.start()
-lcd.add_task(lcd.display_orbit_pt_pro)
-time.sleep(1.0)
-# from control.off_road import off_road_mode_step
-
-bus = can.interface.Bus(channel="can0", bustype="socketcan")
-motor_manager = MotorManager(bus)
-bms_manager = BMSManager(bus)
-# Pass it to on_road
-on_road_mode_step(motor_manager)
+# -------------------- DEVICES --------------------
+# Created by the startup phases below, never at import time.
+lcd = None
+lcd_manager = None
+bus = None
+motor_manager = None
+bms_manager = None
+mode_engine = None
+can_monitor = None
+can_recorder = None
+black_box = None
+safety = None
+watchdog = None
+hb_control = None
+hb_logger = None
+hb_bms = None
+current_sensor = None
+temperature_monitor = None
 
 # -------------------- CONSTANTS --------------------
 MODE_ON_ROAD = 1
 MODE_OFF_ROAD = 0
 MODE_SWITCH_PIN = 20
 
-# -------------------- GPIO SETUP -------------------
+# -------------------- STARTUP PHASES ---------------
+@startup.phase("hal")
+def init_hal():
+    """Pick the hardware backend. "--sim" (or VCU_HAL=sim) runs off-target."""
+    hal.select("sim" if "--sim" in sys.argv else None)
+
+@startup.phase("gpio", after=("hal",))
 def init_gpio():
     GPIO.setmode(GPIO.BCM)
     GPIO.setup([state.LEFT_BTN_PIN, state.RIGHT_BTN_PIN], GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
@@ -45,8 +67,100 @@ def init_gpio():
     GPIO.setup(state.DIRECTION_BTN_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
     GPIO.setup(state.ROTARY_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
     GPIO.setup(state.SAFETY_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+    GPIO.setup(state.MODE_SELECT_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
     print("[INFO] GPIO initialized.")
 
+@startup.phase("lcd", after=("hal",))
+def init_lcd():
+    global lcd, lcd_manager
+    lcd = LCDDisplay()
+    lcd.start()
+    lcd.add_task(lcd.display_orbit_pt_pro)
+    time.sleep(1.0)
+    lcd_manager = LCDManager()
+
+@startup.phase("can", after=("hal",))
+def init_can():
+    global bus
+    bus = hal.open_can_bus("can0")
+    if hal.is_simulated():
+        hal.backend().start_motor_plant("can0")
+
+@startup.phase("managers", after=("can",))
+def init_managers():
+    global motor_manager, bms_manager
+    motor_manager = MotorManager(bus)
+    bms_manager = BMSManager(bus)
+
+@startup.phase("can_health", after=("managers",))
+def init_can_health():
+    global can_monitor
+    can_monitor = CanHealthMonitor("can0")
+    can_monitor.add_listener(swap_bus)
+
+@startup.phase("can_recorder", after=("can_health",))
+def init_can_recorder():
+    global can_recorder
+    if config.CAN_RECORD_ENABLED:
+        can_recorder = CanRecorder("can0")
+        can_monitor.add_listener(can_recorder.set_bus)
+
+@startup.phase("blackbox", after=("can_recorder",))
+def init_blackbox():
+    global black_box
+    if config.BLACKBOX_ENABLED:
+        black_box = BlackBox()
+        if can_recorder:
+            can_recorder.add_tap(black_box.frames.put)
+        else:
+            print("[BlackBox] CAN recorder disabled: captures hold no raw frames")
+
+def swap_bus(new_bus):
+    """CAN monitor re-opened the bus: hand the new one to every user of the old."""
+    global bus
+    old, bus = bus, new_bus
+    motor_manager.bus = new_bus
+    bms_manager.bus = new_bus
+    try:
+        old.shutdown()
+    except Exception as e:
+        print(f"[CAN] old bus shutdown: {e}")
+
+@startup.phase("logger", after=("gpio",))
+def init_logger():
+    logger.init()
+
+@startup.phase("modes", after=("gpio", "managers"))
+def init_modes():
+    global mode_engine
+    on_road.init()
+    mode_engine = ModeEngine(motor_manager)
+    mode_engine.step()
+
+@startup.phase("safety", after=("managers",))
+def init_safety():
+    global safety
+    safety = SafetyEvaluator()
+    safety.tick(motor_manager)
+
+@startup.phase("sensors", after=("hal",))
+def init_sensors():
+    global current_sensor, temperature_monitor
+    current_sensor = ACS712Monitor()
+    temperature_monitor = TemperatureMonitor(SimulatedTemperatureBackend() if hal.is_simulated() else None)
+
+@startup.phase("watchdog", after=("lcd", "managers"))
+def init_watchdog():
+    """Heartbeat deadlines: detection is within deadline + wd.CHECK_PERIOD,
+    well inside MotorManager's 0.5 s command timeout for the drive loops."""
+    global watchdog, hb_control, hb_logger, hb_bms
+    watchdog = wd.Watchdog(motor_manager)
+    hb_control = watchdog.register("control", 0.2, wd.RESPONSE_RESET)
+    motor_manager.heartbeat = watchdog.register("motor_tx", 0.2, wd.RESPONSE_RESET)
+    hb_bms = watchdog.register("bms", 1.5, wd.RESPONSE_STOP)     # recv may block 0.5 s
+    hb_logger = watchdog.register("logger", 1.0, wd.RESPONSE_LOG)
+    lcd_manager.heartbeat = watchdog.register("lcd", 2.0, wd.RESPONSE_LOG)
+
 def get_current_mode():
     """Read the mode from the switch."""
     return MODE_OFF_ROAD if GPIO.input(MODE_SWITCH_PIN) == GPIO.HIGH else MODE_ON_ROAD
@@ -103,6 +217,9 @@ def machine_control_loop(bus):
     last_lcd_update = 0
 
     while True:
+        hb_control.beat()
+        # Safety first: its actions reach MotorManager before this tick's commands
+        safety.tick(motor_manager)
         mode = get_current_mode()
 
         if mode != MODE_ON_ROAD:
@@ -110,7 +227,7 @@ def machine_control_loop(bus):
                 #lcd.add_task(lcd.display_on_road_mode)
                 last_mode = 1
 
-            on_road_mode_step(motor_manager)
+            mode_engine.step()
 
             now = time.time()
             if now - last_lcd_update >= 1.0:
@@ -128,13 +245,14 @@ def machine_control_loop(bus):
         time.sleep(0.05)
 
 def logging_loop():
-    """Thread 2: Handles periodic logging (3 readings/sec)."""
-    log_interval = 1 / 10  # 3 readings per second => 0.333 sec
+    """Thread 2: Samples state for the logger at config.LOG_SAMPLE_HZ."""
+    log_interval = 1 / config.LOG_SAMPLE_HZ
     while True:
         start_time = time.time()
+        hb_logger.beat()
 
         # Log latest state + GPIO
-        logger.log_data(state, GPIO)
+        logger.log_data(state)
 
         # Sleep the remaining time to maintain fixed interval
         elapsed = time.time() - start_time
@@ -149,6 +267,7 @@ def can_reader_loop(bus, bms_manager):
 
     while True:
         start_time = time.time()
+        hb_bms.beat()
         try:
             # Send polling request to BMS
             bms_manager._send_request()
@@ -179,6 +298,17 @@ def start_threads(bus):
     t3 = threading.Thread(target=can_reader_loop, args=(bus, bms_manager), daemon=True)
 
     #t4 = threading.Thread(target=lcd_display_loop, daemon=True)
+
+    # ACS712 calibrates its zero offset first, before the motors are driven
+    current_sensor.start()
+    temperature_monitor.start()
+    watchdog.start()
+    can_monitor.start()
+    if can_recorder:
+        can_recorder.start()
+    if black_box:
+        black_box.start()
+
     # Start threads
     t1.start()
     t2.start()
@@ -193,16 +323,12 @@ def start_threads(bus):
     t1.join()
     # logging thread runs in background, no join
     
-from display.lcd_display_th import LCDManager
-lcd_manager = LCDManager()
-            
 def main():
-    bus = setup_can_bus()
+    startup.run()
     '''if not bus:
         check_can0()
         return'''
     lcd_manager.start()
-    init_gpio()
     start_threads(bus)
     
 
@@ -1,65 +1,213 @@
 # safety.py
+#
+# Safety rules, compiled once into a flat list of predicates over a state
+# snapshot. SafetyEvaluator.tick() runs them every control tick and hands
+# the resulting actions to MotorManager before the next frames go out;
+# safety_checks() keeps the old dict-in / dict-out interface.
+#
+# Fields with a receive timestamp (state.FIELD_SIGNAL) read as their rule
+# default once stale, so a rule never acts on a value the VCU stopped
+# receiving. A rule can ask about freshness itself with a "<signal>_fresh"
+# field, e.g. "bms_pack_fresh".
+import time
 
-def safety_checks(state):
-    """
-    Runs all safety-related checks based on the current system state.
-    Args:
-        state (dict): Current system status data from sensors, BMS, and user inputs.
-    Returns:
-        dict: Actions or flags indicating required safety interventions.
-    """
+import state
+from control import faults
+
+# ---------------- Config ----------------
+TICK_BUDGET = 0.0005        # s; evaluations slower than this count as overruns
 
-    actions = {
-        "disable_rotary": False,
-        "disconnect_machine": False,
-        "throw_error": None,
-        "slow_wheel_rpm": False,
-        "enable_traction_control": False,
-        "switch_off_cooling_fans": False,
-        "shutdown_system": False
-    }
+ACTIONS = {
+    "disable_rotary": False,
+    "disconnect_machine": False,
+    "throw_error": None,
+    "slow_wheel_rpm": False,
+    "enable_traction_control": False,
+    "switch_off_cooling_fans": False,
+    "shutdown_system": False
+}
 
+# (name, {field: default}, predicate over the snapshot, actions set, error message)
+RULES = [
     # 1. SOC check: Disable rotary if SOC < 5%
-    if state.get("soc", 100) < 5:
-        actions["disable_rotary"] = True
+    ("low_soc", {"soc": 100},
+     lambda s: s["soc"] < 5,
+     {"disable_rotary": True}, None),
 
     # 2. Disconnect if only one battery is connected
-    if state.get("battery_count", 2) == 1:
-        actions["disconnect_machine"] = True
+    ("single_battery", {"battery_count": 2},
+     lambda s: s["battery_count"] == 1,
+     {"disconnect_machine": True}, None),
 
     # 3. Throw error if battery set-A is connected with set-B
-    if state.get("battery_set_a") and state.get("battery_set_b"):
-        actions["throw_error"] = "Battery set-A and set-B connected together!"
+    ("mixed_battery_sets", {"battery_set_a": False, "battery_set_b": False},
+     lambda s: bool(s["battery_set_a"] and s["battery_set_b"]),
+     {}, "Battery set-A and set-B connected together!"),
 
     # 4. Slow wheel RPM if rotary power is high
-    if state.get("rotary_power", 0) > state.get("rotary_power_limit", 1000):
-        actions["slow_wheel_rpm"] = True
+    ("rotary_overpower", {"rotary_power": 0, "rotary_power_limit": 1000},
+     lambda s: s["rotary_power"] > s["rotary_power_limit"],
+     {"slow_wheel_rpm": True}, None),
 
-    # 5. Auto-disable rotary in On-road mode
-    if state.get("mode") == "on-road":
-        actions["disable_rotary"] = True
+    # 5. Rotary per drive mode: the mode table's rotary_allowed
+    #    (config.MODE_TABLES, applied by control/on_road.py), not a rule here
 
     # 6. Enable traction control to avoid tyre slippage
-    if state.get("wheel_slip_detected", False):
-        actions["enable_traction_control"] = True
+    ("wheel_slip", {"wheel_slip_detected": False},
+     lambda s: bool(s["wheel_slip_detected"]),
+     {"enable_traction_control": True}, None),
 
     # 7. Switch off cooling fans if motor temperature is safe
-    if state.get("motor_temp", 0) < state.get("cooling_temp_threshold", 60):
-        actions["switch_off_cooling_fans"] = True
+    ("motor_cool", {"motor_temp": 0, "cooling_temp_threshold": 60},
+     lambda s: s["motor_temp"] < s["cooling_temp_threshold"],
+     {"switch_off_cooling_fans": True}, None),
 
     # 8. Water sensors: shut off if submerged beyond limits
-    if state.get("water_depth", 0) > state.get("max_water_depth", 0.5):
-        actions["shutdown_system"] = True
-        actions["throw_error"] = "Water level exceeded safety limit!"
+    ("water_depth", {"water_depth": 0, "max_water_depth": 0.5},
+     lambda s: s["water_depth"] > s["max_water_depth"],
+     {"shutdown_system": True}, "Water level exceeded safety limit!"),
 
     # 9. Auto shutoff on toppling or accidents
-    if state.get("tilt_angle", 0) > state.get("max_tilt_angle", 30):
-        actions["shutdown_system"] = True
-        actions["throw_error"] = "Topple detected!"
+    ("topple", {"tilt_angle": 0, "max_tilt_angle": 30},
+     lambda s: s["tilt_angle"] > s["max_tilt_angle"],
+     {"shutdown_system": True}, "Topple detected!"),
+
+    ("jerk", {"jerk_detected": False},
+     lambda s: bool(s["jerk_detected"]),
+     {"shutdown_system": True}, "Severe jerk/impact detected!"),
+
+    # 11. Motor controller faults (decoded and edge-tracked by control/faults.py)
+    ("wheel_fault_derate", {"wheel_fault_level": 0},
+     lambda s: s["wheel_fault_level"] == faults.FAULT_DERATE,
+     {"slow_wheel_rpm": True}, "Wheel controller fault"),
+
+    ("wheel_fault_stop", {"wheel_fault_level": 0},
+     lambda s: s["wheel_fault_level"] >= faults.FAULT_STOP,
+     {"shutdown_system": True}, "Wheel controller critical fault!"),
+
+    ("rotary_fault", {"rotary_fault_level": 0},
+     lambda s: s["rotary_fault_level"] >= faults.FAULT_DERATE,
+     {"disable_rotary": True}, "Rotary controller fault"),
+
+    # 12. BMS silent: SOC / pack limits above cannot be trusted
+    ("bms_stale", {"bms_pack_fresh": True},
+     lambda s: not s["bms_pack_fresh"],
+     {}, "BMS data stale"),
+
+    # 13. Wheels commanded but no motor feedback: drive slowly
+    ("motor_feedback_lost", {"last_left_rpm": 0, "last_right_rpm": 0,
+                             "motor_left_fresh": True, "motor_right_fresh": True},
+     lambda s: (s["last_left_rpm"] > 0 or s["last_right_rpm"] > 0)
+               and not (s["motor_left_fresh"] and s["motor_right_fresh"]),
+     {"slow_wheel_rpm": True}, "Motor feedback lost"),
+]
+
+FRESH_SUFFIX = "_fresh"
+
+
+class SafetyEvaluator:
+    def __init__(self, rules=RULES, budget=TICK_BUDGET):
+        self.budget = budget
+        self.names = [rule[0] for rule in rules]
 
-    if state.get("jerk_detected", False):
-        actions["shutdown_system"] = True
-        actions["throw_error"] = "Severe jerk/impact detected!"
+        # Every field any rule reads, with its default; the snapshot dict
+        # is allocated once and refreshed in place.
+        self._fields = []
+        defaults = {}
+        for _, fields, _, _, _ in rules:
+            for field, default in fields.items():
+                if field not in defaults:
+                    defaults[field] = default
+                    if field.endswith(FRESH_SUFFIX):
+                        signal, fresh = field[:-len(FRESH_SUFFIX)], True
+                    else:
+                        signal, fresh = state.FIELD_SIGNAL.get(field), False
+                    self._fields.append((field, default, signal, fresh))
+        self.snapshot = dict(defaults)
 
-    return actions
+        # Flat rule list: (index, predicate, action items, error)
+        self._rules = [(i, pred, tuple(actions.items()), error)
+                       for i, (_, _, pred, actions, error) in enumerate(rules)]
 
+        self.actions = dict(ACTIONS)
+        self.hits = [0] * len(rules)
+        self.ticks = 0
+        self.overruns = 0
+        self.last_time = 0.0
+        self.max_time = 0.0
+
+    def take_snapshot(self, source=state):
+        """
+        Copy the fields the rules need from `source`. None and stale
+        values read as the rule default; "<signal>_fresh" fields are
+        state.is_fresh(signal).
+        """
+        snap = self.snapshot
+        is_fresh = state.is_fresh
+        for field, default, signal, fresh in self._fields:
+            if fresh:
+                snap[field] = is_fresh(signal)
+                continue
+            value = getattr(source, field, default)
+            if value is None or (signal is not None and not is_fresh(signal)):
+                value = default
+            snap[field] = value
+        return snap
+
+    def evaluate(self, snap):
+        """Run every rule over `snap`; returns the (reused) actions dict."""
+        actions = self.actions
+        actions.update(ACTIONS)
+        hits = self.hits
+        for i, pred, items, error in self._rules:
+            if pred(snap):
+                hits[i] += 1
+                for key, value in items:
+                    actions[key] = value
+                if error:
+                    actions["throw_error"] = error
+        return actions
+
+    def tick(self, motor_manager=None):
+        """Snapshot state, evaluate, and apply the actions to MotorManager."""
+        start = time.perf_counter()
+        actions = self.evaluate(self.take_snapshot())
+        if motor_manager is not None:
+            motor_manager.apply_safety(actions)
+        elapsed = time.perf_counter() - start
+
+        self.ticks += 1
+        self.last_time = elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        if elapsed > self.budget:
+            self.overruns += 1
+
+        state.safety_error = actions["throw_error"]
+        state.safety_eval_time = elapsed
+        state.safety_eval_max = self.max_time
+        state.safety_overruns = self.overruns
+        return actions
+
+    def hit_counts(self):
+        return dict(zip(self.names, self.hits))
+
+
+_compat = None
+
+def safety_checks(state):
+    """
+    Runs all safety-related checks based on the current system state.
+    Args:
+        state (dict): Current system status data from sensors, BMS, and user inputs.
+    Returns:
+        dict: Actions or flags indicating required safety interventions.
+    """
+    global _compat
+    if _compat is None:
+        _compat = SafetyEvaluator()
+    snap = _compat.snapshot
+    for field, default, _, _ in _compat._fields:
+        value = state.get(field, default)
+        snap[field] = default if value is None else value
+    return dict(_compat.evaluate(snap))
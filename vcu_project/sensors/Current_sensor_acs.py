@@ -1,27 +1,161 @@
+# -*- coding: utf-8 -*-
+# Current_sensor_acs.py
+# ACS712 current acquisition on the ADS1115 (burst oversampling, mean/RMS/peak)
 import time
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
+import threading
+import numpy as np
 
-# I2C bus
-i2c = busio.I2C(board.SCL, board.SDA)
+import hal
+import state
+from utils import diag
 
-# Create ADS1115 object
-ads = ADS.ADS1115(i2c)
-ads.gain = 1   # 4.096V range (suitable for ACS712 output 0-5V, though 5V will clip slightly)
+# ---------------- Config ----------------
+ADC_PIN = 2                 # ADS1115 input A2 (ADS.P2)
+ADC_GAIN = 1                # +/-4.096 V range (ACS712 output 0-5 V clips slightly above ~4.1 V)
+ADC_DATA_RATE = 860         # fastest ADS1115 rate, ~1.2 ms per conversion
+VOLTS_PER_COUNT = 4.096 / 32768
 
-# Use channel 0 (A0)
-chan = AnalogIn(ads, ADS.P2)
+BURST_SAMPLES = 32          # conversions per window
+WINDOW_PERIOD = 0.1         # seconds between windows (10 Hz)
+CALIBRATION_BURSTS = 10     # windows averaged for the zero-current offset
 
 # ACS712 parameters
-VCC = 5.0                # sensor powered from 5V
-OFFSET = VCC / 2         # ~2.5V at 0A
-SENSITIVITY = 0.100      # 100 mV/A (for ACS712 20A version)
+VCC = 5.0                   # sensor powered from 5V
+OFFSET = VCC / 2            # ~2.5V at 0A (nominal, replaced by calibration)
+OFFSET_TOLERANCE = 0.25     # volts; calibration outside this is rejected
+SENSITIVITY = 0.100         # 100 mV/A (for ACS712 20A version)
 # For 5A ? 0.185, for 30A ? 0.066
 
-while True:
-    voltage = chan.voltage
-    current = (voltage - OFFSET) / SENSITIVITY
-    print(f"Voltage: {voltage:.3f} V, Current: {current:.3f} A")
-    time.sleep(0.5)
+SPIKE_THRESHOLD_A = 15.0    # window peak above this counts as a load spike
+
+
+class ACS712Monitor:
+    """
+    Oversamples the ACS712 channel in bursts and publishes per-window
+    mean / RMS / peak current to state.acs_current_*.
+
+    The ADS1115 is shared with the throttle inputs through the HAL, and
+    hal.adc_lock is held per conversion only, so a burst never stalls a
+    throttle read for long.
+    """
+
+    def __init__(self, pin=ADC_PIN, burst_samples=BURST_SAMPLES, period=WINDOW_PERIOD):
+        self.ads = None
+        self.lock = hal.adc_lock
+        self.pin = pin
+        self.period = period
+        self.channel = None
+
+        # Preallocated burst buffers (reused every window)
+        self._raw = np.zeros(burst_samples, dtype=np.float64)
+        self._amps = np.zeros(burst_samples, dtype=np.float64)
+
+        self.offset = OFFSET
+        self.running = False
+        self.thread = None
+
+    # ----------- Setup -----------
+    def _open(self):
+        self.ads = hal.adc()
+        with self.lock:
+            self.ads.gain = ADC_GAIN
+            self.ads.data_rate = ADC_DATA_RATE
+        self.channel = hal.analog_in(self.pin)
+
+    # ----------- Acquisition -----------
+    def _burst(self):
+        """Fill the raw buffer with one burst of conversions."""
+        raw = self._raw
+        chan = self.channel
+        lock = self.lock
+        for i in range(raw.shape[0]):
+            with lock:
+                raw[i] = chan.value
+        return raw
+
+    def _window(self):
+        """One burst -> (mean, rms, peak) in amps, vectorized."""
+        amps = self._amps
+        np.multiply(self._burst(), VOLTS_PER_COUNT, out=amps)
+        np.subtract(amps, self.offset, out=amps)
+        np.divide(amps, SENSITIVITY, out=amps)
+
+        mean = float(amps.mean())
+        rms = float(np.sqrt(np.dot(amps, amps) / amps.shape[0]))
+        peak = float(np.abs(amps).max())
+        return mean, rms, peak
+
+    def calibrate(self, bursts=CALIBRATION_BURSTS):
+        """
+        Measure the zero-current offset. Call with no load on the sensor
+        (at startup, before the motors are enabled).
+        """
+        volts = 0.0
+        for _ in range(bursts):
+            volts += float(self._burst().mean()) * VOLTS_PER_COUNT
+        volts /= bursts
+
+        if abs(volts - OFFSET) <= OFFSET_TOLERANCE:
+            self.offset = volts
+            print(f"[ACS712] Zero offset calibrated: {volts:.4f} V")
+        else:
+            self.offset = OFFSET
+            print(f"[ACS712] Offset {volts:.3f} V out of range, using {OFFSET:.3f} V")
+        state.acs_offset_v = self.offset
+        return self.offset
+
+    # ----------- Thread loop -----------
+    def run(self):
+        try:
+            self._open()
+            self.calibrate()
+        except Exception as e:
+            print(f"[ACS712] init failed: {e}")
+            self.running = False
+            return
+
+        next_time = time.monotonic()
+        while self.running:
+            try:
+                mean, rms, peak = self._window()
+                state.acs_current_mean = mean
+                state.acs_current_rms = rms
+                state.acs_current_peak = peak
+                state.acs_last_update = time.time()
+                state.stamp("acs")
+                if peak > SPIKE_THRESHOLD_A:
+                    state.acs_spike_count += 1
+            except Exception as e:
+                diag.error("ACS712", "read failed: %s", e)
+
+            next_time += self.period
+            sleep_time = next_time - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_time = time.monotonic()
+
+    def start(self):
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+
+if __name__ == "__main__":
+    monitor = ACS712Monitor()
+    monitor.start()
+    try:
+        while True:
+            time.sleep(0.5)
+            print(f"Mean: {state.acs_current_mean:.3f} A, "
+                  f"RMS: {state.acs_current_rms:.3f} A, "
+                  f"Peak: {state.acs_current_peak:.3f} A")
+    except KeyboardInterrupt:
+        monitor.stop()
@@ -1 +1,187 @@
 # Reads temperature sensor data
+# temperature_sensor.py
+# Background polling of the temperature probes feeding state.temp_sesnor_1..3
+import glob
+import math
+import os
+import time
+import threading
+
+import state
+from utils import diag
+
+# ---------------- Config ----------------
+W1_DEVICES_DIR = "/sys/bus/w1/devices"
+SENSOR_IDS = []              # DS18B20 ids ("28-xxxxxxxxxxxx") for sensor 1..3, [] = auto-detect
+SENSOR_COUNT = 3
+POLL_INTERVAL = 1.0          # seconds between polls of each sensor
+READ_TIMEOUT = 1.5           # seconds before a read is abandoned (DS18B20 conversion ~0.75 s)
+STALE_AFTER = 5.0            # seconds without a good reading -> stale
+
+
+# ---------------- Backends ----------------
+class DS18B20Backend:
+    """1-wire DS18B20 probes through the kernel w1-therm driver."""
+
+    def __init__(self, sensor_ids=None, devices_dir=W1_DEVICES_DIR):
+        ids = list(sensor_ids or SENSOR_IDS)
+        if not ids:
+            ids = sorted(os.path.basename(p) for p in glob.glob(os.path.join(devices_dir, "28-*")))
+        self.devices_dir = devices_dir
+        self.sensor_ids = ids[:SENSOR_COUNT]
+
+    def read(self, index):
+        """Blocking read of sensor `index`, degrees C (raises on CRC/IO error)."""
+        path = os.path.join(self.devices_dir, self.sensor_ids[index], "w1_slave")
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+        if len(lines) < 2 or not lines[0].strip().endswith("YES"):
+            raise IOError(f"CRC check failed on {self.sensor_ids[index]}")
+        pos = lines[1].find("t=")
+        if pos < 0:
+            raise IOError(f"No reading from {self.sensor_ids[index]}")
+        return int(lines[1][pos + 2:]) / 1000.0
+
+    def count(self):
+        return len(self.sensor_ids)
+
+
+class SimulatedTemperatureBackend:
+    """
+    Off-target backend: slow sine wave around a base temperature per sensor.
+    `delays` (seconds) and `failing` (indexes) let tests exercise the
+    timeout and staleness paths.
+    """
+
+    def __init__(self, base=(35.0, 40.0, 45.0), amplitude=2.0, period=60.0,
+                 delays=None, failing=()):
+        self.base = tuple(base)
+        self.amplitude = amplitude
+        self.period = period
+        self.delays = dict(delays or {})
+        self.failing = set(failing)
+        self._t0 = time.monotonic()
+
+    def read(self, index):
+        delay = self.delays.get(index, 0.0)
+        if delay:
+            time.sleep(delay)
+        if index in self.failing:
+            raise IOError(f"simulated failure on sensor {index + 1}")
+        t = time.monotonic() - self._t0
+        return self.base[index] + self.amplitude * math.sin(2 * math.pi * t / self.period)
+
+    def count(self):
+        return len(self.base)
+
+
+# ---------------- Monitor ----------------
+class TemperatureMonitor:
+    """
+    Each sensor is read by its own daemon thread on a fixed schedule; a
+    supervisor thread enforces per-sensor read timeouts, so a hung probe
+    only ever makes its own value stale. Publishes for sensor N (1-based):
+        state.temp_sesnor_N        last good value (C) or None
+        state.temp_sesnor_N_ts     time.time() of that value
+        state.temp_sesnor_N_stale  True when older than STALE_AFTER
+    Readers only ever see plain attribute reads, nothing blocks them.
+    """
+
+    def __init__(self, backend=None, poll_interval=POLL_INTERVAL,
+                 read_timeout=READ_TIMEOUT, stale_after=STALE_AFTER):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self.read_timeout = read_timeout
+        self.stale_after = stale_after
+
+        self.running = False
+        self.thread = None
+        self.readers = []
+
+        self.timeouts = [0] * SENSOR_COUNT
+        self.errors = [0] * SENSOR_COUNT
+        self._read_started = [None] * SENSOR_COUNT   # monotonic, None when idle
+        self._timed_out = [False] * SENSOR_COUNT
+        self._last_good = [None] * SENSOR_COUNT      # monotonic
+
+    # ----------- Per-sensor reader -----------
+    def _reader(self, index):
+        n = index + 1
+        next_time = time.monotonic()
+        while self.running:
+            self._read_started[index] = time.monotonic()
+            try:
+                value = self.backend.read(index)
+            except Exception as e:
+                value = None
+                self.errors[index] += 1
+                diag.error("Temp", "sensor %d read failed: %s", n, e)
+            finished = time.monotonic()
+            self._read_started[index] = None
+
+            if value is not None and not self._timed_out[index]:
+                setattr(state, f"temp_sesnor_{n}", value)
+                setattr(state, f"temp_sesnor_{n}_ts", time.time())
+                setattr(state, f"temp_sesnor_{n}_stale", False)
+                state.stamp(f"temp_{n}")
+                self._last_good[index] = finished
+            self._timed_out[index] = False
+
+            next_time = max(next_time + self.poll_interval, finished)
+            time.sleep(max(0.0, next_time - time.monotonic()))
+
+    # ----------- Supervisor -----------
+    def _supervise(self, count):
+        while self.running:
+            now = time.monotonic()
+            for index in range(count):
+                started = self._read_started[index]
+                if (started is not None and not self._timed_out[index]
+                        and now - started > self.read_timeout):
+                    # Late result will be discarded when the read finally returns
+                    self._timed_out[index] = True
+                    self.timeouts[index] += 1
+                    diag.warning("Temp", "sensor %d timed out after %ss", index + 1, self.read_timeout)
+
+                last = self._last_good[index]
+                stale = last is None or (now - last) > self.stale_after
+                setattr(state, f"temp_sesnor_{index + 1}_stale", stale)
+            time.sleep(0.1)
+
+    def run(self):
+        if self.backend is None:
+            self.backend = DS18B20Backend()
+        count = min(self.backend.count(), SENSOR_COUNT)
+        if count < SENSOR_COUNT:
+            print(f"[Temp] {count} of {SENSOR_COUNT} sensors found")
+
+        self.readers = [threading.Thread(target=self._reader, args=(i,), daemon=True)
+                        for i in range(count)]
+        for t in self.readers:
+            t.start()
+        self._supervise(count)
+
+    def start(self):
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop polling. A reader stuck in a hung read is left behind (daemon)."""
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+
+if __name__ == "__main__":
+    monitor = TemperatureMonitor(SimulatedTemperatureBackend(delays={2: 3.0}))
+    monitor.start()
+    try:
+        while True:
+            time.sleep(1.0)
+            print([(getattr(state, f"temp_sesnor_{n}"), getattr(state, f"temp_sesnor_{n}_stale"))
+                   for n in (1, 2, 3)])
+    except KeyboardInterrupt:
+        monitor.stop()
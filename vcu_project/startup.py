@@ -0,0 +1,70 @@
+# startup.py ? explicit, ordered hardware initialisation
+#
+# Modules must not open devices, buses, files or threads at import time.
+# Each init step registers here as a named phase with the phases it
+# depends on; run() executes them in dependency order and reports how
+# long each one took.
+#
+#     @startup.phase("can", after=("hal",))
+#     def init_can():
+#         ...
+import time
+
+_phases = {}    # name -> (func, after)
+_order = []     # registration order, used to break ties
+timings = []    # [(name, seconds)] of the last run()
+
+
+def phase(name, after=()):
+    """Decorator: register `func` as startup phase `name`, run after `after`."""
+    def register(func):
+        if name in _phases:
+            raise ValueError(f"Startup phase '{name}' registered twice")
+        _phases[name] = (func, tuple(after))
+        _order.append(name)
+        return func
+    return register
+
+
+def resolve(names=None):
+    """Dependency order (depth-first, registration order between independent phases)."""
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name, chain):
+        if name in done:
+            return
+        if name not in _phases:
+            raise KeyError(f"Unknown startup phase '{name}' (needed by {chain or 'caller'})")
+        if name in visiting:
+            raise ValueError(f"Startup phase cycle: {' -> '.join(chain + [name])}")
+        visiting.add(name)
+        for dep in _phases[name][1]:
+            visit(dep, chain + [name])
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(name)
+
+    for name in (names or _order):
+        visit(name, [])
+    return ordered
+
+
+def run(names=None):
+    """Run the phases (all, or `names` plus their dependencies) and print the timing breakdown."""
+    timings.clear()
+    total_start = time.perf_counter()
+    for name in resolve(names):
+        start = time.perf_counter()
+        _phases[name][0]()
+        timings.append((name, time.perf_counter() - start))
+    total = time.perf_counter() - total_start
+    report(total)
+    return timings
+
+
+def report(total=None):
+    total = sum(t for _, t in timings) if total is None else total
+    print("[STARTUP] phase timing:")
+    for name, seconds in timings:
+        print(f"[STARTUP]   {name:<16}{seconds * 1000:9.1f} ms")
+    print(f"[STARTUP]   {'total':<16}{total * 1000:9.1f} ms")
@@ -1,7 +1,7 @@
 
 # state.py ? shared global state for all modules
 import threading
-import RPi.GPIO as GPIO
+import time
 state_lock = threading.Lock()
 
 SEND_CAN_ID = 0x12300140
@@ -11,29 +11,19 @@ rotary_current_rpm = 0
 current_direction = 0x01 # 0x01 = forward, 0x02 = reverse
 
 TURN_RPM=300
-MAX_RPM_ON_ROAD = 1500
-LONG_PRESS_RPM_ON_ROAD = 300
-
-MAX_RPM_OFF_ROAD = 1500
 ROTARY_MAX_RPM = 1000
-LONG_PRESS_RPM_OFF_ROAD = 300
+# Per-mode rpm limits and button timing: config.MODE_TABLES
+drive_mode = None          # name of the active mode table (mode_manager.ModeEngine)
 
-LONG_PRESS_TIME = 0.02     # seconds to consider as long press
-DOUBLE_PRESS_GAP = 0.20    # max time between taps for double press
 SEND_PERIOD = 0.1          # periodic CAN refresh (10 Hz)
 
-RPM_SLEW_RATE = 150
-# Twirl pattern (both motors)
-STEP_TIMES = [2.50, 8.50, 2.50]
-L_STEPS = [(300, 300), (300, 100), (300, 300)]
-R_STEPS = [(300, 300), (100, 300), (300, 300)]
-
-#STEP_TIMES = [3.0, 8, 0.2, 0.2, 0.2]
-#L_STEPS = [(300, 300), (300, 100), (0, 0), (0, 0), (0, 0)]
-#R_STEPS = [(300, 300), (100, 300), (0, 0), (0, 0), (0, 0)]
-
-SINGLE_RIGHT_LOW =100
-SINGLE_LEFT_LOW =100
+# Slew limits (rpm/s), applied by MotorManager to every motor command
+WHEEL_ACCEL_RATE = 1500      # was 150 rpm per 0.1 s drive period
+WHEEL_DECEL_RATE = 2500      # was 250 rpm per safe_stop call
+ROTARY_ACCEL_RATE = 1500
+ROTARY_DECEL_RATE = 2500
+EMERGENCY_DECEL_RATE = 6000  # dual-button stop, lost command stream
+# Twirl pattern (both motors): see config.TWIRL_PROFILES
 
 # Motor feedback
 feedbackRPM_Left = 0
@@ -46,13 +36,8 @@ MODE_SWITCH_PIN = 20
 DIRECTION_BTN_PIN = 21
 ROTARY_SWITCH_PIN = 16
 SAFETY_PIN = 16
-
-GPIO.setmode(GPIO.BCM)
-GPIO.setup([LEFT_BTN_PIN, RIGHT_BTN_PIN], GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(MODE_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(DIRECTION_BTN_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(ROTARY_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
-GPIO.setup(SAFETY_PIN, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+MODE_SELECT_PIN = 17       # on/off-road switch, pulled up: LOW = off_road
+# (pins are configured by main.init_gpio during startup)
 
 # Mode tracking
 MODE_IDLE = 0
@@ -66,13 +51,69 @@ mode = MODE_IDLE
 RE_ALIGN_RPM_REDUCTION = 100   # how much to trim the faster motor
 FEEDBACK_TOLERANCE = 50        # acceptable RPM difference before correcting
 LOW_RPM_FEEDBACK_OFF = 300     # <--- ignore feedback below
+wheel_sync_error = 0.0         # (fbL - fbR) - (cmdL - cmdR), rpm
+wheel_sync_trim_left = 0       # rpm taken off the left command
+wheel_sync_trim_right = 0
+
+# Traction control (control/traction_control.py, per feedback frame)
+wheel_slip_detected = False
+wheel_slip_events = 0
+
+# Safety rule engine (safety/safety.py, every control tick)
+safety_error = None
+safety_eval_time = 0.0         # s, last tick
+safety_eval_max = 0.0
+safety_overruns = 0            # ticks over safety.TICK_BUDGET
+
+# Loop watchdog (utils/watchdog.py)
+watchdog_misses = 0
+watchdog_max_latency = 0.0     # s from a missed deadline to its detection
+watchdog_last_check = 0.0
+
+# CAN health (canbus/can_health.py)
+can_state = "error-active"     # error-active / error-warning / error-passive / bus-off / down
+can_tec = 0                    # controller error counters
+can_rec = 0
+can_down = False               # inside an outage
+can_outages = 0
+can_last_outage = 0.0          # s
+can_outage_total = 0.0
+can_tx_overflows = 0           # frames not sent: TX queue full (no ACK / bus saturated)
+can_link = {}                  # last interface status read
+can_record_frames = 0          # raw frames written by canbus/can_recorder.py
+can_record_dropped = 0         # frames lost because the recorder's writer fell behind
+
+# Black box (utils/blackbox.py)
+blackbox_dumps = 0             # captures written
+blackbox_last = ""             # path stem of the last capture
+
+# Log archive (utils/log_archive.py)
+log_disk_bytes = 0
+log_compress_ratio = 0.0       # raw / compressed, all segments so far
+log_compress_mbps = 0.0        # raw MB compressed per second of archiver time
+
+# Logger queue / writer (utils/logger.py)
+log_queue_depth = 0
+log_rows_queued = 0
+log_rows_dropped = 0           # lost to config.LOG_QUEUE_POLICY
+log_flush_latency = 0.0        # s from queueing the oldest row of a flush to the flush
+log_fsync_latency = 0.0        # s from queueing the oldest row of an fsync to the fsync
+traction_factor_left = 1.0     # fraction of the command passed through
+traction_factor_right = 1.0
 
 # Button states
 direction_btn_last_state = False  # Was LOW
+dual_button_last_state = False    # both buttons held on the last step
 #current_direction = 0x01  # 0x01 = forward, 0x02 = reverse
 last_direction_toggle = 0.0
 DIRECTION_DEBOUNCE = 0.3  # seconds
 
+# Direction reversal (advanced by on_road.advance_direction_change each tick;
+# ramp rates are the WHEEL_* slew limits above)
+DIRECTION_PAUSE = 0.3       # seconds stopped before switching
+dir_change_phase = 0        # on_road.DIR_IDLE
+dir_change_pause_end = 0.0
+
 left_pressed = False
 right_pressed = False
 left_press_start = 0.0
@@ -116,6 +157,30 @@ device_6_current = None
 device_6_voltage = None
 device_6_error = None
 
+# Controller faults, decoded by control/faults.py (history in faults.monitor)
+wheel_fault_level = 0       # worst severity over left/right (faults.FAULT_*)
+rotary_fault_level = 0
+motor_fault_events = 0      # fault edges seen since start
+
+# ACS712 current sensor (sensors/Current_sensor_acs.py)
+acs_current_mean = 0.0   # A, window mean
+acs_current_rms = 0.0    # A, window RMS
+acs_current_peak = 0.0   # A, window |peak|
+acs_offset_v = 2.5       # V, calibrated zero-current offset
+acs_spike_count = 0
+acs_last_update = None
+
+# Temperature probes (sensors/temperature_sensor.py)
+temp_sesnor_1 = None
+temp_sesnor_2 = None
+temp_sesnor_3 = None
+temp_sesnor_1_ts = None
+temp_sesnor_2_ts = None
+temp_sesnor_3_ts = None
+temp_sesnor_1_stale = True
+temp_sesnor_2_stale = True
+temp_sesnor_3_stale = True
+
 #----------------------------------------------------------
 #Battery data 
 # Variables for real-time usage
@@ -174,3 +239,65 @@ trip_runtime = 0.0      # hours (accumulated time machine was running)
 Last_trip_power = 0.0
 Last_trip_total_energy = 0.0  # Wh
 Last_trip_trip_runtime = 0.0  # hours
+
+#------------------------------------
+# Signal freshness
+# Decoders call stamp(signal) when a frame / reading arrives; consumers ask
+# is_fresh(name) or age(name) with a field name or a signal name instead
+# of doing their own time arithmetic. A signal never received is stale.
+SIGNAL_TTL = {              # seconds a value stays valid
+    "motor_left": 1.0,      # device 6 feedback
+    "motor_right": 1.0,     # device 4 feedback
+    "motor_rotary": 1.0,    # device 5 feedback
+    "bms_cells": 3.0,
+    "bms_pack": 3.0,
+    "bms_temp": 5.0,
+    "bms_status": 5.0,
+    "bms1": 3.0,            # logger BMS listener, pack 1 (0746D608)
+    "bms2": 3.0,            # logger BMS listener, pack 2 (0746CD62)
+    "acs": 0.5,
+    "temp_1": 5.0,
+    "temp_2": 5.0,
+    "temp_3": 5.0,
+}
+
+SIGNAL_FIELDS = {
+    "motor_left": ("device_6_rpm", "device_6_current", "device_6_voltage", "device_6_error"),
+    "motor_right": ("device_4_rpm", "device_4_current", "device_4_voltage", "device_4_error"),
+    "motor_rotary": ("device_5_rpm", "device_5_current", "device_5_voltage", "device_5_error"),
+    "bms_cells": ("max_voltage", "max_cells", "min_voltage", "min_cells"),
+    "bms_pack": ("battery_voltage", "current", "soc"),
+    "bms_temp": ("max_temp", "max_temp_cell", "min_temp", "min_temp_cell"),
+    "bms_status": ("charge_dis_status", "charge_mos_status", "dis_mos_status", "bms_life",
+                   "residual_capacity"),
+    "acs": ("acs_current_mean", "acs_current_rms", "acs_current_peak"),
+    "temp_1": ("temp_sesnor_1",),
+    "temp_2": ("temp_sesnor_2",),
+    "temp_3": ("temp_sesnor_3",),
+}
+FIELD_SIGNAL = {field: signal for signal, fields in SIGNAL_FIELDS.items() for field in fields}
+
+signal_ts = dict.fromkeys(SIGNAL_TTL)   # signal -> time.monotonic() of last receive
+bms_last_update = None                  # time.time() of the last BMS frame (any bms_* signal)
+
+_monotonic = time.monotonic
+
+def stamp(signal):
+    signal_ts[signal] = _monotonic()
+    if signal.startswith("bms"):
+        global bms_last_update
+        bms_last_update = time.time()
+
+def age(name):
+    """Seconds since `name` (field or signal) was received; inf if never."""
+    ts = signal_ts[FIELD_SIGNAL.get(name, name)]
+    return float("inf") if ts is None else _monotonic() - ts
+
+def is_fresh(name):
+    signal = FIELD_SIGNAL.get(name, name)
+    ts = signal_ts[signal]
+    return ts is not None and _monotonic() - ts <= SIGNAL_TTL[signal]
+
+def fresh_value(name, default=None):
+    """Value of field `name` if fresh, else `default`."""
+    return globals().get(name, default) if is_fresh(name) else default
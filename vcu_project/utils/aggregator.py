@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# aggregator.py
+# Sliding-window statistics for the logger.
+#
+# Samples of N fields go into a preallocated (window x N) numpy array used
+# as a ring; reduce() computes every statistic for every field in one
+# vectorized pass over it. Missing samples are NaN and are ignored by
+# mean / min / max (a field with no valid sample in the window gives NaN);
+# "last" is the newest sample as it was taken, NaN included.
+import numpy as np
+
+STATS = ("mean", "min", "max", "last")
+
+
+class WindowAggregator:
+    def __init__(self, n_fields, window, stats=STATS):
+        unknown = [stat for stat in stats if stat not in STATS]
+        if unknown:
+            raise ValueError(f"Unknown statistic(s): {', '.join(unknown)}")
+        self.stats = tuple(stats)
+        self.size = max(1, int(window))
+        self.window = np.full((self.size, n_fields), np.nan)
+        self.out = np.empty((len(self.stats), n_fields))
+        self.count = 0              # samples ever added
+
+    def add(self, values):
+        """One sample per field (floats, NaN = missing)."""
+        self.window[self.count % self.size] = values
+        self.count += 1
+
+    def reduce(self):
+        """(len(stats) x N) array of the statistics over the filled window."""
+        w = self.window if self.count >= self.size else self.window[:self.count]
+        valid = ~np.isnan(w)
+        n = valid.sum(axis=0)
+        empty = n == 0
+        out = self.out
+        for i, stat in enumerate(self.stats):
+            if stat == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    np.divide(np.where(valid, w, 0.0).sum(axis=0), n, out=out[i])
+            elif stat == "min":
+                np.where(valid, w, np.inf).min(axis=0, out=out[i])
+                out[i][empty] = np.nan
+            elif stat == "max":
+                np.where(valid, w, -np.inf).max(axis=0, out=out[i])
+                out[i][empty] = np.nan
+            else:
+                out[i] = self.window[(self.count - 1) % self.size]
+        return out
+
+    def reset(self):
+        self.window.fill(np.nan)
+        self.count = 0
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+# binlog.py
+# Fixed-record binary telemetry log (the .vbl files next to the daily CSVs).
+#
+# File layout (little-endian):
+#   MAGIC (8 bytes) | header length (u32) | header (JSON, utf-8) | records
+# The header describes every field: name, struct type, scale and an
+# optional display format ("time_ns" = epoch nanoseconds, "time" = epoch
+# seconds, "faults" = controller error word), plus a "clock" pair
+# (utils/clock.py reference()) taken when the file was created. A record is one kind byte followed by the fields packed
+# with no padding, so every record has the same size and record i starts
+# at data_offset + i * record_size.
+#
+# Every SYNC_EVERY data records a sync record of the same size is written
+# (kind SYNC, SYNC_MAGIC, running record count, a fresh monotonic / realtime
+# clock pair, so wall-clock steps can be followed) and the file is flushed, so
+# a file cut by a power loss is readable up to its last whole record; a
+# writer re-opening it drops the partial record before appending.
+#
+# Values are stored as round(value / scale); a missing value ("" / None /
+# NaN) is stored as the type's sentinel (NaN for floats, the most negative
+# value for signed ints, the largest value for unsigned ones); values out of
+# a field's range are clamped.
+#
+# Reader: BinaryLog memory-maps a file and exposes the records as a numpy
+# structured array without copying; column() applies the scales.
+#   python -m utils.binlog info    logs/2025-01-01_data.vbl
+#   python -m utils.binlog convert logs/2025-01-01_data.vbl [out.csv]
+import csv
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from datetime import datetime
+
+from utils import clock
+
+MAGIC = b"VCUBLOG1"
+SYNC_MAGIC = b"SYNC"
+SYNC_EVERY = 50             # data records between sync records (5 s at 10 rows/s)
+
+KIND_DATA = 0
+KIND_SYNC = 0xA5
+
+# struct type -> (numpy dtype, missing sentinel, lowest and highest value stored)
+TYPES = {
+    "b": ("<i1", -0x80, -0x7F, 0x7F),
+    "B": ("<u1", 0xFF, 0, 0xFE),
+    "h": ("<i2", -0x8000, -0x7FFF, 0x7FFF),
+    "H": ("<u2", 0xFFFF, 0, 0xFFFE),
+    "i": ("<i4", -0x80000000, -0x7FFFFFFF, 0x7FFFFFFF),
+    "I": ("<u4", 0xFFFFFFFF, 0, 0xFFFFFFFE),
+    "q": ("<i8", -0x8000000000000000, -0x7FFFFFFFFFFFFFFF, 0x7FFFFFFFFFFFFFFF),
+    "f": ("<f4", float("nan"), None, None),
+    "d": ("<f8", float("nan"), None, None),
+}
+
+_HEAD = struct.Struct("<8sI")
+_SYNC = struct.Struct("<B4sIqq")    # kind, SYNC_MAGIC, records before this one, clock pair
+
+
+def format_value(fmt, value):
+    """CSV text for a decoded value, shared by the live CSV writer and convert()."""
+    if value is None or value == "" or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if fmt == "time_ns":
+        return clock.format_ns(value)
+    if fmt == "time":
+        return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    if fmt == "faults":
+        from control import faults
+        return " ".join(faults.decode(int(value))[1])
+    return value
+
+
+def read_header(path):
+    """(header dict, offset of the first record) of a binary log."""
+    with open(path, "rb") as f:
+        magic, header_len = _HEAD.unpack(f.read(_HEAD.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a VCU binary log")
+        return json.loads(f.read(header_len)), _HEAD.size + header_len
+
+
+# ---------------- Writer ----------------
+def record_struct(fields):
+    """Record layout of `fields`; ValueError if a type is unsupported or it cannot hold a sync record."""
+    for name, kind, _, _ in fields:
+        if kind not in TYPES:
+            raise ValueError(f"Field '{name}': unsupported type '{kind}'")
+    record = struct.Struct("<B" + "".join(f[1] for f in fields))
+    if record.size < _SYNC.size:
+        raise ValueError(f"Record of {record.size} bytes too small to hold a sync marker ({_SYNC.size})")
+    return record
+
+
+class BinaryLogWriter:
+    def __init__(self, path, fields, sync_every=SYNC_EVERY):
+        """`fields`: [(name, struct type, scale, fmt or None), ...] in row order."""
+        self.path = path
+        self.fields = fields
+        self.sync_every = sync_every
+        self.record = record_struct(fields)
+        self._sync_pad = bytes(self.record.size - _SYNC.size)
+        self._encoders = [self._encoder(kind, scale) for _, kind, scale, _ in fields]
+        # Fast path for rows with no missing values: scale, then round the int fields
+        self._scaled = [(i, 1.0 / scale) for i, (_, _, scale, _) in enumerate(fields) if scale != 1]
+        self._ints = [i for i, (_, kind, _, _) in enumerate(fields) if kind not in "fd"]
+
+        self.header = {
+            "fields": [{"name": n, "type": k, "scale": s, "format": fmt}
+                       for n, k, s, fmt in fields],
+            "record_size": self.record.size,
+            "sync_every": sync_every,
+            "clock": clock.reference(),
+        }
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.count = self._open_existing()
+        else:
+            header = json.dumps(self.header).encode()
+            self.f = open(path, "ab")
+            self.f.write(_HEAD.pack(MAGIC, len(header)) + header)
+            self.count = 0
+        self._since_sync = 0
+
+    def _open_existing(self):
+        """Append to a file with the same layout; returns its record count."""
+        header, offset = read_header(self.path)
+        if header["fields"] != self.header["fields"]:
+            raise ValueError(f"{self.path}: written with a different field layout")
+        size = os.path.getsize(self.path)
+        count, partial = divmod(size - offset, self.record.size)
+        self.f = open(self.path, "r+b")
+        if partial:
+            self.f.truncate(size - partial)
+        self.f.seek(0, os.SEEK_END)
+        return count
+
+    @staticmethod
+    def _encoder(kind, scale):
+        _, missing, lo, hi = TYPES[kind]
+        if kind in "fd":
+            def encode(value):
+                if value is None or value == "":
+                    return missing
+                return float(value) / scale
+        else:
+            def encode(value):
+                if value is None or value == "":
+                    return missing
+                value = float(value)
+                if value != value:
+                    return missing
+                return min(hi, max(lo, int(round(value / scale))))   # clamp, never the sentinel
+        return encode
+
+    def encode(self, row):
+        """Packed record for one row."""
+        try:
+            values = list(row)
+            for i, inv in self._scaled:
+                values[i] *= inv
+            for i in self._ints:
+                values[i] = round(values[i])
+            return self.record.pack(KIND_DATA, *values)
+        except (TypeError, ValueError, struct.error):
+            # Missing ("" / None / NaN) or out-of-range values: per-field encoders
+            # (a fast-path value that lands on a sentinel is not caught; the
+            # ranges in the logger's layout keep real values clear of them)
+            return self.record.pack(KIND_DATA, *[enc(v) for enc, v in zip(self._encoders, row)])
+
+    def write(self, row):
+        self.f.write(self.encode(row))
+        self.count += 1
+        self._since_sync += 1
+        if self._since_sync >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Write a sync record and push the buffered records to the file."""
+        ref = clock.reference()
+        self.f.write(_SYNC.pack(KIND_SYNC, SYNC_MAGIC, self.count,
+                                ref["monotonic_ns"], ref["realtime_ns"]) + self._sync_pad)
+        self.f.flush()
+        self._since_sync = 0
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        if self._since_sync:
+            self.sync()
+        self.f.close()
+
+
+# ---------------- Reader ----------------
+def _cleanup(fd):
+    """Drop the binary float noise from a decoded value (int fields back to int)."""
+    kind, scale = fd["type"], fd["scale"]
+    if fd["format"] == "time":
+        return float
+    if kind == "q":
+        return int
+    if kind == "f":
+        return lambda v: float(f"{v:.7g}")
+    if kind == "d":
+        return float
+    if scale == 1:
+        return int
+    digits = max(0, -math.floor(math.log10(scale)))
+    return lambda v: round(v, digits)
+
+
+class BinaryLog:
+    def __init__(self, path):
+        import numpy as np
+        self.path = path
+        self.header, self.data_offset = read_header(path)
+        self.fields = self.header["fields"]
+        self.record_size = self.header["record_size"]
+        self.dtype = np.dtype([("kind", "u1")] +
+                              [(fd["name"], TYPES[fd["type"]][0]) for fd in self.fields])
+        if self.dtype.itemsize != self.record_size:
+            raise ValueError(f"{path}: header record size {self.record_size} != fields {self.dtype.itemsize}")
+
+        self._file = open(path, "rb")
+        size = os.path.getsize(path)
+        self.n_records = (size - self.data_offset) // self.record_size   # trailing partial record ignored
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        # Zero-copy view of every record (data and sync)
+        self.records = np.frombuffer(self._mm, dtype=self.dtype, count=self.n_records,
+                                     offset=self.data_offset) if self.n_records else \
+            np.zeros(0, dtype=self.dtype)
+        self._data = None
+
+    @property
+    def data(self):
+        """Data records only (a copy: sync records are dropped)."""
+        if self._data is None:
+            self._data = self.records[self.records["kind"] == KIND_DATA]
+        return self._data
+
+    def clock_refs(self):
+        """
+        [(data records before it, clock pair), ...]: the header's pair, then
+        the pair of every sync record, oldest first.
+        """
+        import numpy as np
+        refs = []
+        if "clock" in self.header:
+            refs.append((0, self.header["clock"]))
+        for i in np.flatnonzero(self.records["kind"] == KIND_SYNC).tolist():
+            offset = self.data_offset + i * self.record_size
+            _, magic, count, mono, wall = _SYNC.unpack_from(self._mm, offset)
+            if magic == SYNC_MAGIC and wall:        # files from before the clock pair have 0
+                refs.append((count, {"monotonic_ns": mono, "realtime_ns": wall}))
+        return refs
+
+    def column(self, name):
+        """Field values as float64 with the scale applied; missing -> NaN."""
+        import numpy as np
+        fd = next(fd for fd in self.fields if fd["name"] == name)
+        raw = self.data[name]
+        values = raw.astype(np.float64)
+        if fd["type"] not in "fd":
+            values[raw == TYPES[fd["type"]][1]] = np.nan
+        values *= fd["scale"]
+        return values
+
+    def _exact(self, fd, start, stop):
+        """64-bit int field as Python ints (float64 would round nanosecond stamps)."""
+        missing = TYPES["q"][1]
+        return [math.nan if v == missing else v * fd["scale"]
+                for v in self.data[fd["name"]][start:stop].tolist()]
+
+    def rows(self, start=0, stop=None):
+        """Decoded rows (list per record) in the CSV column order; data records [start:stop]."""
+        columns = [self._exact(fd, start, stop) if fd["type"] == "q"
+                   else self.column(fd["name"])[start:stop].tolist()
+                   for fd in self.fields]
+        cleanups = [_cleanup(fd) for fd in self.fields]
+        fmts = [fd["format"] for fd in self.fields]
+        for i in range(len(columns[0]) if columns else 0):
+            row = []
+            for col, cleanup, fmt in zip(columns, cleanups, fmts):
+                value = col[i]
+                if value == value:
+                    value = cleanup(value)
+                row.append(format_value(fmt, value))
+            yield row
+
+    def to_csv(self, out_path):
+        """Write the log in the logger's CSV layout (same header row)."""
+        with open(out_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([fd["name"] for fd in self.fields])
+            writer.writerows(self.rows())
+        return len(self.data)
+
+    def close(self):
+        self.records = None
+        self._data = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ("info", "convert"):
+        print("usage: python -m utils.binlog info|convert FILE.vbl [OUT.csv]")
+        return 2
+    log = BinaryLog(argv[1])
+    try:
+        if argv[0] == "info":
+            data = log.data
+            print(f"{argv[1]}: {len(data)} rows, {log.n_records - len(data)} sync, "
+                  f"{log.record_size} B/record, {len(log.fields)} fields")
+            if len(data):
+                first, last = data[0][log.fields[0]["name"]], data[-1][log.fields[0]["name"]]
+                fmt = log.fields[0]["format"]
+                print(f"  {format_value(fmt, first)} .. {format_value(fmt, last)}")
+            refs = log.clock_refs()
+            if refs:
+                ref = refs[-1][1]
+                print(f"  clock: monotonic {ref['monotonic_ns']} ns = "
+                      f"{clock.format_ns(ref['realtime_ns'], 6)} ({len(refs)} reference(s))")
+        else:
+            out = argv[2] if len(argv) > 2 else os.path.splitext(argv[1])[0] + ".csv"
+            print(f"{out}: {log.to_csv(out)} rows")
+    finally:
+        log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# blackbox.py
+# Pre-trigger capture of state snapshots and raw CAN frames.
+#
+# The averaged logger rows (10 Hz) smooth away the second before a fault.
+# The black box keeps the last BLACKBOX_PRE_S + BLACKBOX_POST_S seconds at
+# full rate in rings that are allocated once at start:
+#   times    int64 ring of time.monotonic_ns() sample stamps
+#   values   float32 ring, one row of config.BLACKBOX_FIELDS (state) per
+#            sample, taken BLACKBOX_HZ times a second by the sampler thread
+#   frames   FrameRing (canbus/can_recorder.py) fed every received frame
+#            by the CanRecorder's receive thread (CanRecorder.add_tap)
+#
+# trigger(reason) is cheap and callable from any thread: it marks a capture
+# pending. Once BLACKBOX_POST_S has passed the sampler copies the rings
+# (one frozen copy, so memory doubles only while it is written) and hands
+# the copy to the dump thread; sampling and the live logs carry on.
+# Triggers arriving while a capture is pending join it; the same reason is
+# ignored for BLACKBOX_HOLDOFF_S after it fired.
+#
+# A capture is three files in BLACKBOX_DIR, stem bb_<YYYYmmdd_HHMMSS_mmm>_<reason>:
+#   .vbl   state samples (utils/binlog.py: Timestamp, Monotonic_ns, fields)
+#   .vcr   raw frames in the trigger window (can_recorder format)
+#   .json  reasons, details, trigger times, counts
+# Only the newest BLACKBOX_FILES captures are kept.
+import json
+import math
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+import config
+import state
+from canbus.can_recorder import CLOCK, MAGIC, FrameRing
+from utils import binlog
+from utils import clock
+from utils import diag
+
+# ---------------- Config ----------------
+FRAME_DTYPE = np.dtype([("timestamp", "<f8"), ("arbitration_id", "<u4"), ("dlc", "u1"),
+                        ("flags", "u1"), ("data", "S8")])     # FRAME as a numpy record
+CAPTURE_EXT = (".vbl", ".vcr", ".json")
+
+# The running black box, so trigger sites need no reference to it
+box = None
+
+
+def trigger(reason, detail=""):
+    """Ask for a capture; a no-op when the black box is not running."""
+    if box is not None:
+        box.trigger(reason, detail)
+
+
+class BlackBox:
+    def __init__(self, directory=None, fields=None, pre_s=None, post_s=None, hz=None, can_fps=None):
+        self.directory = directory or config.BLACKBOX_DIR
+        self.fields = tuple(fields or config.BLACKBOX_FIELDS)
+        self.pre_s = config.BLACKBOX_PRE_S if pre_s is None else pre_s
+        self.post_s = config.BLACKBOX_POST_S if post_s is None else post_s
+        self.hz = hz or config.BLACKBOX_HZ
+        can_fps = can_fps or config.BLACKBOX_CAN_FPS
+        window = self.pre_s + self.post_s
+
+        # Capture .vbl layout, checked here so a bad field list fails at startup
+        self.layout = [("Timestamp", "q", 1, "time_ns"), ("Monotonic_ns", "q", 1, None)]
+        self.layout += [(name, "f", 1, None) for name in self.fields]
+        binlog.record_struct(self.layout)
+
+        self.size = max(1, math.ceil(window * self.hz))
+        self.times = np.zeros(self.size, dtype=np.int64)
+        self.values = np.full((self.size, len(self.fields)), np.nan, dtype=np.float32)
+        self.frames = FrameRing(max(1, math.ceil(window * can_fps)))
+        self.count = 0              # samples ever taken
+        self.memory_bytes = self.times.nbytes + self.values.nbytes + len(self.frames.buf)
+
+        self.pending = None         # capture waiting for its post-trigger window
+        self.last_fired = {}        # reason -> time.monotonic() it last fired
+        self.dumps = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=1)
+
+        self.running = False
+        self.thread = None
+        self.dump_thread = None
+
+    # ----------- Triggers -----------
+    def trigger(self, reason, detail=""):
+        if reason not in config.BLACKBOX_TRIGGERS:
+            return
+        now = time.monotonic()
+        with self._lock:
+            pending = self.pending
+            if pending is not None:
+                if reason not in pending["reasons"]:
+                    pending["reasons"].append(reason)
+                    pending["details"].append(str(detail))
+                    self.last_fired[reason] = now
+                return
+            last = self.last_fired.get(reason)
+            if last is not None and now - last < config.BLACKBOX_HOLDOFF_S:
+                return
+            self.last_fired[reason] = now
+            ref = clock.reference()
+            self.pending = {
+                "reasons": [reason],
+                "details": [str(detail)],
+                "monotonic_ns": ref["monotonic_ns"],
+                "realtime_ns": ref["realtime_ns"],
+                "due": now + self.post_s,
+            }
+        diag.warning("BlackBox", "Triggered: %s %s", reason, detail, every=0)
+
+    # ----------- Sampling -----------
+    def sample(self, now_ns):
+        i = self.count % self.size
+        self.times[i] = now_ns
+        row = [getattr(state, name, None) for name in self.fields]
+        try:
+            self.values[i] = row
+        except (TypeError, ValueError):
+            # None / text values: NaN for just those fields
+            self.values[i] = [_number(v) for v in row]
+        self.count += 1
+
+    def _freeze(self, pending):
+        """Chronological copy of the rings; live sampling goes on in the originals."""
+        n = min(self.count, self.size)
+        order = (np.arange(n) + (self.count - n)) % self.size
+        return {
+            "pending": pending,
+            "clock": clock.reference(),
+            "times": self.times[order],
+            "values": self.values[order],
+            "frames": self.frames.snapshot(),
+        }
+
+    def run(self):
+        period = 1.0 / self.hz
+        next_tick = time.monotonic()
+        while self.running:
+            self.sample(time.monotonic_ns())
+
+            pending = self.pending
+            if pending is not None and time.monotonic() >= pending["due"]:
+                with self._lock:
+                    self.pending = None
+                try:
+                    self._queue.put_nowait(self._freeze(pending))
+                except queue.Full:
+                    diag.warning("BlackBox", "Capture dropped (%s): previous one still being written",
+                                 "+".join(pending["reasons"]), every=0)
+
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()    # fell behind: drop the missed ticks
+
+    # ----------- Files -----------
+    def _dump(self, capture):
+        pending, ref = capture["pending"], capture["clock"]
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = clock.format_ns(pending["realtime_ns"], 3, "%Y%m%d_%H%M%S").replace(".", "_")
+        stem = os.path.join(self.directory, f"bb_{stamp}_{'+'.join(pending['reasons'])}")
+        t0 = time.monotonic()
+
+        # State samples
+        writer = binlog.BinaryLogWriter(stem + ".vbl", self.layout)
+        try:
+            offset = ref["realtime_ns"] - ref["monotonic_ns"]
+            for mono, row in zip(capture["times"].tolist(), capture["values"].tolist()):
+                writer.write([mono + offset, mono] + row)
+        finally:
+            writer.close()
+
+        # Raw frames in the trigger window (kernel wall-clock receive times)
+        frames = np.frombuffer(capture["frames"], dtype=FRAME_DTYPE)
+        wall = pending["realtime_ns"] / clock.NS
+        keep = frames[(frames["timestamp"] >= wall - self.pre_s) &
+                      (frames["timestamp"] <= wall + self.post_s)]
+        with open(stem + ".vcr", "wb") as f:
+            f.write(MAGIC + CLOCK.pack(ref["monotonic_ns"], ref["realtime_ns"]))
+            f.write(keep.tobytes())
+
+        meta = {
+            "reasons": pending["reasons"],
+            "details": pending["details"],
+            "trigger_realtime_ns": pending["realtime_ns"],
+            "trigger_monotonic_ns": pending["monotonic_ns"],
+            "trigger_time": clock.format_ns(pending["realtime_ns"]),
+            "pre_s": self.pre_s,
+            "post_s": self.post_s,
+            "hz": self.hz,
+            "samples": len(capture["times"]),
+            "frames": len(keep),
+            "frames_dropped": self.frames.dropped,
+            "clock": ref,
+        }
+        with open(stem + ".json", "w") as f:
+            json.dump(meta, f, indent=1)
+
+        self.dumps += 1
+        state.blackbox_dumps = self.dumps
+        state.blackbox_last = stem
+        diag.info("BlackBox", "Wrote %s: %d samples, %d frames in %.2fs", os.path.basename(stem),
+                  meta["samples"], meta["frames"], time.monotonic() - t0, every=0)
+        self._prune()
+
+    def _prune(self):
+        stems = sorted({name.rsplit(".", 1)[0] for name in os.listdir(self.directory)
+                        if name.startswith("bb_") and name.endswith(CAPTURE_EXT)})
+        for stem in stems[:-config.BLACKBOX_FILES] if config.BLACKBOX_FILES > 0 else ():
+            for ext in CAPTURE_EXT:
+                try:
+                    os.remove(os.path.join(self.directory, stem + ext))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    diag.error("BlackBox", "could not remove %s: %s", stem + ext, e)
+
+    def _dumper(self):
+        while True:
+            capture = self._queue.get()
+            if capture is None:
+                return
+            try:
+                self._dump(capture)
+            except (OSError, ValueError) as e:
+                diag.error("BlackBox", "dump failed: %s", e, every=0)
+
+    def start(self):
+        global box
+        box = self
+        if not self.thread:
+            print(f"[BlackBox] {self.size} samples x {len(self.fields)} fields at {self.hz} Hz, "
+                  f"{self.frames.capacity} frames: {self.memory_bytes / 1024:.0f} KiB")
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.dump_thread = threading.Thread(target=self._dumper, daemon=True)
+            self.thread.start()
+            self.dump_thread.start()
+
+    def stop(self):
+        global box
+        box = None
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self._queue.put(None)
+            self.dump_thread.join()
+            self.thread = self.dump_thread = None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
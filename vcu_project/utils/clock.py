@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# clock.py
+# Timestamps for the hot paths.
+#
+# Hot paths take integer nanosecond stamps and never format them:
+#   time.monotonic_ns()   intervals and ordering (steady from boot)
+#   time.time_ns()        wall time
+# Text is made only when a stamp is exported or displayed (format_ns()).
+#
+# The Pi has no RTC, so its wall clock starts wherever it stopped and steps
+# when NTP syncs; the monotonic clock does not. reference() samples both
+# clocks as one pair. Stored in a log header (and refreshed in every binary
+# sync record) it lets offline tools turn a monotonic stamp into wall time
+# with to_wall_ns(), across wall-clock steps.
+import time
+from datetime import datetime
+
+NS = 1_000_000_000
+
+
+def reference():
+    """{"monotonic_ns", "realtime_ns"} sampled together (monotonic read on both sides)."""
+    before = time.monotonic_ns()
+    wall = time.time_ns()
+    after = time.monotonic_ns()
+    return {"monotonic_ns": (before + after) // 2, "realtime_ns": wall}
+
+
+def to_wall_ns(monotonic_ns, ref):
+    """Wall time (epoch ns) of a monotonic stamp, given a reference() pair."""
+    return ref["realtime_ns"] + int(monotonic_ns) - ref["monotonic_ns"]
+
+
+def format_ns(ns, digits=3, fmt="%Y-%m-%d %H:%M:%S"):
+    """Local-time text for an epoch-ns stamp with `digits` of fractional seconds."""
+    seconds, frac = divmod(int(ns), NS)
+    text = datetime.fromtimestamp(seconds).strftime(fmt)
+    if digits <= 0:
+        return text
+    return f"{text}.{frac:09d}"[:len(text) + 1 + digits]
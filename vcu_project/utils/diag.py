@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# diag.py
+# Leveled, rate-limited diagnostics off the hot paths.
+#
+#   from utils import diag
+#   diag.error("Drive", "Throttle/feedback drive failed: %s", e)
+#   -> "[Drive] Throttle/feedback drive failed: ..."
+#
+# A call below the level (config.LOG_LEVEL: DEBUG, INFO, WARNING, ERROR,
+# CRITICAL) returns after one comparison. Each call site (code object +
+# line) emits at most once per config.DIAG_RATE_S (every=... per call, 0 =
+# no limit); the calls dropped meanwhile are counted and reported with the
+# site's next message. What passes is queued with its arguments unformatted
+# and a handler thread formats and writes it to stdout, one write + flush
+# per batch, so the calling thread never blocks on the console or journald.
+# The queue holds config.DIAG_QUEUE messages; past that the oldest are
+# dropped and counted in `dropped`.
+import atexit
+import sys
+import threading
+import time
+from collections import deque
+
+import config
+
+# ---------------- Config ----------------
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+CRITICAL = 50
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR, "CRITICAL": CRITICAL}
+
+level = LEVELS.get(str(config.LOG_LEVEL).upper(), INFO)
+rate_s = config.DIAG_RATE_S
+
+_queue = deque(maxlen=config.DIAG_QUEUE)
+_sites = {}                 # (code, line) -> [next emit time.monotonic(), calls suppressed since]
+_wake = threading.Event()
+_write_lock = threading.Lock()
+_thread = None
+_monotonic = time.monotonic
+
+emitted = 0                 # messages queued
+suppressed = 0              # calls dropped by the rate limit
+dropped = 0                 # messages lost to a full queue
+
+
+def set_level(name):
+    """Change the level at run time ("DEBUG" ... "CRITICAL")."""
+    global level
+    level = LEVELS[name.upper()]
+
+
+def enabled(lvl):
+    """True if a message at `lvl` would be emitted (to skip building costly arguments)."""
+    return lvl >= level
+
+
+# ---------------- Emitting ----------------
+def _emit(lvl, tag, msg, args, every):
+    global emitted, suppressed, dropped
+    frame = sys._getframe(2)
+    every = rate_s if every is None else every
+    skipped = 0
+    if every > 0:
+        key = (frame.f_code, frame.f_lineno)
+        now = _monotonic()
+        site = _sites.get(key)
+        if site is not None and now < site[0]:
+            site[1] += 1
+            suppressed += 1
+            return
+        if site is not None:
+            skipped = site[1]
+        _sites[key] = [now + every, 0]
+    if len(_queue) == _queue.maxlen:
+        dropped += 1
+    _queue.append((lvl, tag, msg, args, skipped))
+    emitted += 1
+    if _thread is None:
+        _start()
+    _wake.set()
+
+
+def debug(tag, msg, *args, every=None):
+    if DEBUG >= level:
+        _emit(DEBUG, tag, msg, args, every)
+
+
+def info(tag, msg, *args, every=None):
+    if INFO >= level:
+        _emit(INFO, tag, msg, args, every)
+
+
+def warning(tag, msg, *args, every=None):
+    if WARNING >= level:
+        _emit(WARNING, tag, msg, args, every)
+
+
+def error(tag, msg, *args, every=None):
+    if ERROR >= level:
+        _emit(ERROR, tag, msg, args, every)
+
+
+def critical(tag, msg, *args, every=None):
+    if CRITICAL >= level:
+        _emit(CRITICAL, tag, msg, args, every)
+
+
+# ---------------- Handler thread ----------------
+def _format(lvl, tag, msg, args, skipped):
+    try:
+        text = msg % args if args else msg
+    except (TypeError, ValueError) as e:
+        text = f"{msg!r} % {args!r} ({e})"
+    if skipped:
+        text += f" (+{skipped} suppressed)"
+    return f"[{tag}] {text}\n"
+
+
+def flush():
+    """Write everything queued (handler thread, and at exit)."""
+    with _write_lock:
+        lines = []
+        while _queue:
+            lines.append(_format(*_queue.popleft()))
+        if lines:
+            try:
+                sys.stdout.write("".join(lines))
+                sys.stdout.flush()
+            except (OSError, ValueError):
+                pass                    # console gone (closed pipe / stdout)
+
+
+def _handler():
+    while True:
+        _wake.wait()
+        _wake.clear()
+        flush()
+
+
+def _start():
+    global _thread
+    with _write_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_handler, name="diag", daemon=True)
+            _thread.start()
+            atexit.register(flush)
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+# log_analytics.py
+# Batch analytics over a directory tree of telemetry logs (one sub-directory
+# per vehicle works: trips and days are kept per directory).
+#
+# Every data segment (the names utils/log_query.py reads: .csv, .csv.gz,
+# .csv.zst, .vbl) is reduced to a small summary in a worker process of a
+# concurrent.futures process pool:
+#   trips     runs of rows with no gap over TRIP_GAP_S: start, end, rows,
+#             pack energy (BMS1 + BMS2 voltage x current integrated over
+#             time, discharge positive), mean / max commanded RPM
+#   rpm       histograms of CurrentRPM and |FeedbackRPM_Left / _Right|
+#   buttons   presses (rising edges at the log rate) of Left, Right,
+#             Direction and of Left + Right together (dual-button stop)
+#   bms       per pack current: samples, sum, sum of squares, min, max and
+#             a histogram (percentiles)
+# Summaries add up, so the parent merges them (joining trips cut by a
+# segment boundary) and writes compact CSV tables to the output directory:
+#   trips.csv  days.csv  rpm_histogram.csv  bms_current.csv
+#
+# Summaries are cached in <out>/analytics_cache.json keyed by the file's
+# BLAKE2 hash; size + mtime map a path to its hash, so unchanged files are
+# not even re-read. A re-run only processes new or changed files.
+#
+#   python -m utils.log_analytics LOG_DIR [--out DIR] [--workers N] [--no-cache]
+#
+# Segments are read with utils/log_query.read_arrays().
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from utils import clock
+from utils import log_query
+
+# ---------------- Config ----------------
+CACHE_NAME = "analytics_cache.json"
+CACHE_VERSION = 1           # bump when the summary changes
+HASH_CHUNK = 1024 * 1024
+TRIP_GAP_S = 120            # a longer gap between rows ends a trip (VCU off)
+RPM_EDGES = np.arange(0, 3100, 100)         # last bin also holds everything above
+CURRENT_EDGES = np.arange(-400, 401, 1)     # A; out-of-range values go to the end bins
+RPM_COLUMNS = ("CurrentRPM", "FeedbackRPM_Left", "FeedbackRPM_Right")
+BUTTONS = {"left": ("LeftBtn",), "right": ("RightBtn",), "direction": ("DirectionBtn",),
+           "dual": ("LeftBtn", "RightBtn")}
+PACKS = {"BMS1": ("BMS1_BatteryVoltage", "BMS1_Current"),
+         "BMS2": ("BMS2_BatteryVoltage", "BMS2_Current")}
+COLUMNS = ["Timestamp", *RPM_COLUMNS, "LeftBtn", "RightBtn", "DirectionBtn",
+           *[name for pair in PACKS.values() for name in pair]]
+
+
+# ---------------- Per file (worker) ----------------
+def file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                return h.hexdigest()
+            h.update(chunk)
+
+
+def load(path):
+    """{column: numpy array} of a whole segment (Timestamp int64 epoch ns, others float64)."""
+    _, cols = log_query.read_arrays(path, 0, 2 ** 63 - 1, COLUMNS)
+    return cols
+
+
+def _column(cols, name, n):
+    values = cols.get(name)
+    if values is None or values.dtype == object:
+        return np.full(n, np.nan)
+    return values.astype(np.float64, copy=False)
+
+
+def _histogram(values, edges):
+    values = values[~np.isnan(values)]
+    return np.histogram(np.clip(values, edges[0], edges[-1] - 1e-9), bins=edges)[0].tolist()
+
+
+def summarize(path):
+    """Summary of one segment (plain JSON types)."""
+    cols = load(path)
+    ts = cols["Timestamp"]
+    n = len(ts)
+    summary = {"rows": n, "start": None, "end": None, "trips": [],
+               "rpm": {}, "buttons": {}, "bms": {}}
+    if n == 0:
+        return summary
+    summary["start"], summary["end"] = int(ts[0]), int(ts[-1])
+
+    step = np.diff(ts)
+    gap = step > TRIP_GAP_S * clock.NS
+    dt = np.where(gap, 0, step) / clock.NS                  # s to the next row, 0 across a gap
+    power = np.zeros(n)
+    for volts, amps in PACKS.values():
+        p = _column(cols, volts, n) * _column(cols, amps, n)
+        power += np.nan_to_num(p)
+    energy = np.append(-power[:-1] * dt / 3600.0, 0.0)     # Wh drawn until the next row
+
+    rpm = _column(cols, "CurrentRPM", n)
+    starts = np.concatenate(([0], np.flatnonzero(gap) + 1))
+    ends = np.append(starts[1:], n)
+    for a, b in zip(starts.tolist(), ends.tolist()):
+        r = rpm[a:b]
+        valid = r[~np.isnan(r)]
+        summary["trips"].append({
+            "start": int(ts[a]), "end": int(ts[b - 1]), "rows": b - a,
+            "energy_wh": float(energy[a:b - 1].sum()),
+            "rpm_sum": float(valid.sum()), "rpm_n": int(len(valid)),
+            "rpm_max": float(valid.max()) if len(valid) else None,
+        })
+
+    for name in RPM_COLUMNS:
+        summary["rpm"][name] = _histogram(np.abs(_column(cols, name, n)), RPM_EDGES)
+
+    pressed = {name: _column(cols, name, n) >= 0.5 for name in ("LeftBtn", "RightBtn", "DirectionBtn")}
+    for button, names in BUTTONS.items():
+        down = np.logical_and.reduce([pressed[name] for name in names])
+        summary["buttons"][button] = int((down[1:] & ~down[:-1] & ~gap).sum())
+
+    for pack, (_, amps) in PACKS.items():
+        current = _column(cols, amps, n)
+        current = current[~np.isnan(current)]
+        summary["bms"][pack] = {
+            "n": int(len(current)), "sum": float(current.sum()),
+            "sumsq": float((current * current).sum()),
+            "min": float(current.min()) if len(current) else None,
+            "max": float(current.max()) if len(current) else None,
+            "hist": _histogram(current, CURRENT_EDGES),
+        }
+    return summary
+
+
+# ---------------- Merge ----------------
+def _day(ns):
+    return datetime.fromtimestamp(ns // clock.NS).date().isoformat()
+
+
+def _percentile(hist, edges, q, lo, hi):
+    """q-quantile from a histogram, interpolated inside its bin and kept within [lo, hi]."""
+    total = sum(hist)
+    if not total:
+        return None
+    cum = np.cumsum(hist)
+    target = q * total
+    index = int(np.searchsorted(cum, target))
+    before = cum[index - 1] if index else 0
+    value = edges[index] + (target - before) / hist[index] * (edges[index + 1] - edges[index])
+    return float(min(max(value, lo), hi))
+
+
+def merge(results):
+    """Tables from [(source, path, summary), ...]: {table name: (headers, rows)}."""
+    trips = []
+    days = {}
+    rpm = np.zeros((len(RPM_COLUMNS), len(RPM_EDGES) - 1), dtype=np.int64)
+    bms = {pack: {"n": 0, "sum": 0.0, "sumsq": 0.0, "min": None, "max": None,
+                  "hist": np.zeros(len(CURRENT_EDGES) - 1, dtype=np.int64)} for pack in PACKS}
+
+    last_trip = {}
+    for source, _, summary in sorted(results, key=lambda r: (r[0], r[2]["start"] or 0)):
+        if not summary["rows"]:
+            continue
+        day = days.setdefault((source, _day(summary["start"])), {
+            "files": 0, "rows": 0, "trips": 0, "energy_wh": 0.0,
+            **{button: 0 for button in BUTTONS}})
+        day["files"] += 1
+        day["rows"] += summary["rows"]
+        for button, count in summary["buttons"].items():
+            day[button] += count
+
+        for trip in summary["trips"]:
+            day["energy_wh"] += trip["energy_wh"]
+            prev = last_trip.get(source)
+            if prev and trip["start"] - prev["end"] <= TRIP_GAP_S * clock.NS:
+                prev["end"] = trip["end"]
+                prev["rows"] += trip["rows"]
+                prev["energy_wh"] += trip["energy_wh"]
+                prev["rpm_sum"] += trip["rpm_sum"]
+                prev["rpm_n"] += trip["rpm_n"]
+                if trip["rpm_max"] is not None:
+                    prev["rpm_max"] = max(prev["rpm_max"] or 0.0, trip["rpm_max"])
+            else:
+                trip = dict(trip, source=source)
+                trips.append(trip)
+                last_trip[source] = trip
+                day["trips"] += 1
+
+        for i, name in enumerate(RPM_COLUMNS):
+            rpm[i] += summary["rpm"].get(name, 0)
+        for pack, stats in summary["bms"].items():
+            total = bms[pack]
+            for key in ("n", "sum", "sumsq"):
+                total[key] += stats[key]
+            for key, pick in (("min", min), ("max", max)):
+                if stats[key] is not None:
+                    total[key] = stats[key] if total[key] is None else pick(total[key], stats[key])
+            total["hist"] += stats["hist"]
+
+    tables = {}
+    tables["trips"] = (
+        ["source", "start", "end", "duration_s", "rows", "energy_wh", "mean_rpm", "max_rpm"],
+        [[t["source"], clock.format_ns(t["start"], 0), clock.format_ns(t["end"], 0),
+          round((t["end"] - t["start"]) / clock.NS), t["rows"], round(t["energy_wh"], 2),
+          round(t["rpm_sum"] / t["rpm_n"], 1) if t["rpm_n"] else "", t["rpm_max"] or ""]
+         for t in trips])
+    tables["days"] = (
+        ["source", "date", "files", "rows", "trips", "energy_wh",
+         *[f"{button}_presses" for button in BUTTONS]],
+        [[source, date, d["files"], d["rows"], d["trips"], round(d["energy_wh"], 2),
+          *[d[button] for button in BUTTONS]] for (source, date), d in sorted(days.items())])
+    tables["rpm_histogram"] = (
+        ["rpm_from", "rpm_to", *RPM_COLUMNS],
+        [[int(RPM_EDGES[i]), int(RPM_EDGES[i + 1]) if i + 2 < len(RPM_EDGES) else "", *rpm[:, i].tolist()]
+         for i in range(len(RPM_EDGES) - 1)])
+    rows = []
+    for pack, total in bms.items():
+        n = total["n"]
+        mean = total["sum"] / n if n else None
+        std = (max(0.0, total["sumsq"] / n - mean * mean)) ** 0.5 if n else None
+        hist = total["hist"].tolist()
+        rows.append([pack, n, _round(mean), _round(std), _round(total["min"]), _round(total["max"]),
+                     *[_round(_percentile(hist, CURRENT_EDGES, q, total["min"], total["max"]))
+                       for q in (0.05, 0.5, 0.95)]])
+    tables["bms_current"] = (
+        ["pack", "samples", "mean_a", "std_a", "min_a", "max_a", "p5_a", "p50_a", "p95_a"], rows)
+    return tables
+
+
+def _round(value):
+    return "" if value is None else round(value, 2) + 0.0     # no "-0.0"
+
+
+# ---------------- Pipeline ----------------
+def find_segments(directory, exclude=None):
+    """[(source, path), ...]: every data segment under `directory`, source = its sub-directory."""
+    found = []
+    for dirpath, dirnames, _ in os.walk(directory):
+        if exclude:
+            dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != exclude]
+        source = os.path.relpath(dirpath, directory)
+        found += [(source, path) for _, _, path in log_query.segments(dirpath)]
+    return found
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "files": {}, "summaries": {}}   # missing, old or corrupt
+
+
+def _save_cache(path, cache):
+    with open(path + ".tmp", "w") as f:
+        json.dump(cache, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+
+def run(directory, out, workers=None, use_cache=True):
+    """Analyse every segment under `directory` into CSV tables in `out`; returns counts."""
+    os.makedirs(out, exist_ok=True)
+    cache_path = os.path.join(out, CACHE_NAME)
+    cache = _load_cache(cache_path if use_cache else os.devnull)
+    segments = find_segments(directory, exclude=os.path.abspath(out))
+
+    hashes = {}
+    unknown = []
+    for _, path in segments:
+        st = os.stat(path)
+        known = cache["files"].get(path)
+        if known and known[:2] == [st.st_size, st.st_mtime_ns]:
+            hashes[path] = known[2]
+        else:
+            unknown.append((path, st.st_size, st.st_mtime_ns))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for (path, size, mtime), digest in zip(unknown, pool.map(file_hash, [u[0] for u in unknown])):
+            hashes[path] = digest
+            cache["files"][path] = [size, mtime, digest]
+        todo = sorted({digest: path for path, digest in hashes.items()
+                       if digest not in cache["summaries"]}.items())
+        failed = 0
+        futures = [(digest, path, pool.submit(summarize, path)) for digest, path in todo]
+        for digest, path, future in futures:
+            try:
+                cache["summaries"][digest] = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[Analytics] {path}: {e}")
+
+    # Forget files and summaries that are gone
+    live = set(hashes.values())
+    cache["files"] = {p: v for p, v in cache["files"].items() if p in hashes}
+    cache["summaries"] = {h: s for h, s in cache["summaries"].items() if h in live}
+    if use_cache:
+        _save_cache(cache_path, cache)
+
+    results = [(source, path, cache["summaries"][hashes[path]]) for source, path in segments
+               if hashes[path] in cache["summaries"]]
+    for name, (headers, rows) in merge(results).items():
+        with open(os.path.join(out, name + ".csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+    return {"files": len(segments), "processed": len(todo) - failed, "failed": failed,
+            "cached": len(segments) - len(todo)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise a directory of telemetry logs")
+    parser.add_argument("directory", help="Log directory (searched recursively)")
+    parser.add_argument("--out", help="Output directory (default: DIRECTORY/analytics)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not write the cache")
+    args = parser.parse_args(argv)
+    out = args.out or os.path.join(args.directory, "analytics")
+
+    start = time.perf_counter()
+    counts = run(args.directory, out, args.workers, not args.no_cache)
+    print(f"[Analytics] {counts['files']} files: {counts['processed']} processed, "
+          f"{counts['cached']} cached, {counts['failed']} failed in "
+          f"{time.perf_counter() - start:.1f}s -> {out}")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
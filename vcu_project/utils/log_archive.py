@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+# log_archive.py
+# Background compression, retention and index for finished log segments.
+#
+# The logger's writer thread closes a segment (by size, age or date) and
+# hands it to LogArchiver.submit(), which only appends to an unbounded
+# queue, so compression never blocks the writer. The archiver thread runs
+# at the lowest CPU priority (nice 19, Linux per-thread) and streams each
+# segment through gzip, or zstd when the optional `zstandard` package is
+# installed, into "<segment>.gz" / ".zst" via a temporary file, then
+# removes the original. A segment with a time index (utils/log_index.py)
+# is compressed as independent members of about MEMBER_BYTES that start on
+# index entries, and its index is rewritten with their stored offsets, so
+# utils/log_query.py can still seek into it.
+#
+# After each segment the directory is held under LOG_DISK_BUDGET_MB by
+# deleting the oldest compressed segments. index.json lists every segment
+# still on disk: name, first / last row time (epoch ns), rows, raw and
+# stored bytes, codec.
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+import state
+from utils import diag
+from utils import log_index
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ---------------- Config ----------------
+CHUNK = 64 * 1024
+MEMBER_BYTES = 256 * 1024   # raw bytes per independently readable member of an indexed segment
+INDEX_NAME = "index.json"
+CODEC_EXT = {"gzip": ".gz", "zstd": ".zst"}
+SEGMENT_EXT = (".csv", ".vbl")
+
+
+class LogArchiver:
+    def __init__(self, directory, codec="gzip", level=6, budget_mb=1024):
+        if codec == "zstd" and zstandard is None:
+            diag.warning("Archive", "zstandard not installed, using gzip")
+            codec = "gzip"
+        if codec not in CODEC_EXT:
+            raise ValueError(f"Unknown log compression '{codec}'")
+        self.directory = directory
+        self.codec = codec
+        self.level = level
+        self.budget = budget_mb * 1024 * 1024
+        self.queue = queue.Queue()
+        self.index = {}
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.seconds = 0.0
+        self.running = False
+        self.thread = None
+
+    # ----------- Writer side -----------
+    def submit(self, path, info=None):
+        """Queue a closed segment; `info` = {"start", "end", "rows"}. Never blocks."""
+        self.queue.put_nowait((path, info or {}))
+
+    def submit_leftovers(self, exclude=()):
+        """Queue raw segments left by an earlier run (power cut before compression)."""
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.endswith(SEGMENT_EXT) and path not in exclude:
+                self.submit(path)
+
+    # ----------- Compression -----------
+    def compress(self, path):
+        """Stream `path` into its compressed file; returns (raw bytes, stored bytes, seconds)."""
+        out = path + CODEC_EXT[self.codec]
+        tmp = out + ".tmp"
+        index = log_index.index_path(path)
+        entries = log_index.read_index(index)
+        start = time.perf_counter()
+        raw = os.path.getsize(path)
+
+        # Member boundaries (raw offsets): the start, then index entries MEMBER_BYTES apart
+        bounds = [0]
+        for _, offset, _, _ in entries:
+            if offset - bounds[-1] >= MEMBER_BYTES and offset < raw:
+                bounds.append(offset)
+        stored = {}
+        with open(path, "rb") as src, open(tmp, "wb") as dst:
+            writer = None
+            if self.codec == "zstd":
+                writer = zstandard.ZstdCompressor(level=self.level).stream_writer(dst, closefd=False)
+            for a, b in zip(bounds, bounds[1:] + [raw]):
+                stored[a] = dst.tell()
+                if writer:
+                    self._copy(src, writer, b - a)
+                    writer.flush(zstandard.FLUSH_FRAME)
+                else:
+                    with gzip.GzipFile(fileobj=dst, mode="wb", compresslevel=self.level) as member:
+                        self._copy(src, member, b - a)
+            if writer:
+                writer.close()
+
+        if entries:
+            member = 0
+            rewritten = []
+            for ts, offset, _, _ in entries:
+                while member + 1 < len(bounds) and bounds[member + 1] <= offset:
+                    member += 1
+                rewritten.append((ts, offset, stored[bounds[member]], bounds[member]))
+            log_index.write_index(index + ".new", rewritten)
+        os.replace(tmp, out)
+        if entries:
+            os.replace(index + ".new", index)
+        os.remove(path)
+        return raw, os.path.getsize(out), time.perf_counter() - start
+
+    @staticmethod
+    def _copy(src, dst, size):
+        while size > 0:
+            chunk = src.read(min(CHUNK, size))
+            if not chunk:
+                return
+            dst.write(chunk)
+            size -= len(chunk)
+
+    # ----------- Retention / index -----------
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_NAME)) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _save_index(self):
+        path = os.path.join(self.directory, INDEX_NAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+    def enforce_budget(self):
+        """Delete the oldest compressed segments until the directory fits the budget."""
+        ext = tuple(CODEC_EXT.values())
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path):
+                size = os.path.getsize(path)
+                total += size
+                if name.endswith(ext):
+                    files.append((os.path.getmtime(path), name, size))
+        files.sort()
+        removed = []
+        while total > self.budget and files:
+            _, name, size = files.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                diag.error("Archive", "could not remove %s: %s", name, e)
+                continue
+            total -= size
+            index = log_index.index_path(os.path.join(self.directory, name))
+            if os.path.exists(index):
+                total -= os.path.getsize(index)
+                os.remove(index)
+            self.index.pop(name, None)
+            removed.append(name)
+        if removed:
+            diag.info("Archive", "disk budget: removed %d oldest segment(s)", len(removed), every=0)
+        state.log_disk_bytes = total
+        return removed
+
+    # ----------- Thread loop -----------
+    def _archive(self, path, info):
+        name = os.path.basename(path)
+        try:
+            raw, stored, seconds = self.compress(path)
+        except OSError as e:
+            diag.error("Archive", "%s: %s", name, e)
+            return
+        self.raw_bytes += raw
+        self.stored_bytes += stored
+        self.seconds += seconds
+        ratio = raw / stored if stored else 0.0
+        rate = raw / seconds / 1e6 if seconds > 0 else 0.0
+        state.log_compress_ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+        state.log_compress_mbps = self.raw_bytes / self.seconds / 1e6 if self.seconds else 0.0
+        diag.info("Archive", "%s: %.0f KiB -> %.0f KiB (x%.1f, %.1f MB/s)",
+                  name, raw / 1024, stored / 1024, ratio, rate, every=0)
+
+        stored_name = name + CODEC_EXT[self.codec]
+        self.index[stored_name] = {
+            "start": info.get("start"), "end": info.get("end"), "rows": info.get("rows"),
+            "raw_bytes": raw, "stored_bytes": stored, "codec": self.codec,
+        }
+        self.enforce_budget()
+        self._save_index()
+
+    def run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        self._load_index()
+        while self.running or not self.queue.empty():
+            try:
+                path, info = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._archive(path, info)
+
+    def start(self):
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Finish the queued segments, then stop."""
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# log_index.py
+# Time -> byte offset sidecar index of a CSV log segment.
+#
+# "<segment>.csv.idx" sits next to the segment (and keeps its name when the
+# segment is compressed to .csv.gz / .csv.zst). The logger appends an entry
+# every config.LOG_INDEX_EVERY rows:
+#   MAGIC | ENTRY ...
+#   ENTRY = row time (epoch ns), offset of the row in the raw CSV,
+#           stored offset and raw offset of the member that holds it
+# For a raw segment the member is the row itself (all three offsets are
+# equal). The archiver compresses an indexed segment as a series of
+# independent gzip members / zstd frames that start on index entries and
+# rewrites the index with their stored offsets, so a reader can seek into
+# the compressed file, decompress from the member start and skip
+# (row offset - member raw offset) bytes to reach the row.
+#
+# utils/log_query.py uses the index to read a time range without scanning.
+import os
+import struct
+
+MAGIC = b"VCUIDX1\n"
+ENTRY = struct.Struct("<qQQQ")  # time ns, row offset, member stored offset, member raw offset
+COMPRESSED_EXT = (".gz", ".zst")
+
+
+def index_path(path):
+    """Sidecar index path of a segment, raw or compressed."""
+    for ext in COMPRESSED_EXT:
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+    return path + ".idx"
+
+
+def read_index(path):
+    """[(time ns, row offset, member stored offset, member raw offset), ...]; [] if missing."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    if not data.startswith(MAGIC):
+        return []
+    body = data[len(MAGIC):]
+    body = body[:len(body) - len(body) % ENTRY.size]      # entry cut by power loss
+    return list(ENTRY.iter_unpack(body))
+
+
+def write_index(path, entries):
+    """Replace an index file atomically."""
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(b"".join(ENTRY.pack(*entry) for entry in entries))
+    os.replace(path + ".tmp", path)
+
+
+class IndexWriter:
+    """Appends entries to the index of a raw segment while it is written."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "ab")
+        if self.f.tell() == 0:
+            self.f.write(MAGIC)
+        self.entries = 0
+
+    def add(self, ts, offset):
+        self.f.write(ENTRY.pack(ts, offset, offset, offset))
+        self.entries += 1
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
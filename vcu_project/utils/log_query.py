@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+# log_query.py
+# Time-range reads across the logger's segments.
+#
+# Segments are found by name (<YYYY-MM-DD_HHMMSS>_data.csv / .csv.gz /
+# .csv.zst / .vbl, and the older daily <YYYY-MM-DD>_data.csv); their time
+# span comes from the archive's index.json where it has one, else from the
+# names. Inside a CSV segment the sidecar index (utils/log_index.py) gives
+# the last indexed row at or before the start of the range: the reader
+# seeks there (decompressing from the member start for .gz / .zst) and
+# stops at the first row past the end. A CSV without an index is read from
+# its start. A .vbl segment is memory-mapped and cut with a binary search
+# on its Timestamp column. Compressed .vbl segments are not read.
+#
+#   python -m utils.log_query "2025-01-01 14:27" "2025-01-01 14:37" > out.csv
+#   python -m utils.log_query --around 14:32 --minutes 10 --columns CurrentRPM,BMS1_Current
+#
+# Library: query() yields (path, headers, rows) per segment, rows being an
+# iterator of CSV rows (lists of text); query_arrays() returns numpy columns.
+import argparse
+import bisect
+import csv
+import gzip
+import io
+import json
+import math
+import os
+import sys
+import time
+from datetime import date, datetime
+
+from utils import binlog
+from utils import clock
+from utils import log_index
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ---------------- Config ----------------
+CHUNK = 64 * 1024
+NAME_FORMATS = ("%Y-%m-%d_%H%M%S", "%Y-%m-%d")
+EXT_PREFERENCE = (".vbl", ".csv", ".csv.gz", ".csv.zst")    # one file per segment, first found wins
+ARCHIVE_INDEX = "index.json"
+
+
+# ---------------- Time ----------------
+def _to_ns(dt):
+    return int(dt.replace(microsecond=0).timestamp()) * clock.NS + dt.microsecond * 1000
+
+
+def parse_time(text, day=None):
+    """Epoch ns of local "YYYY-MM-DD HH:MM[:SS[.fff]]", or "HH:MM[:SS]" on `day` (default today)."""
+    text = text.strip()
+    if "-" not in text:
+        text = f"{(day or date.today()).isoformat()} {text}"
+    return _to_ns(datetime.fromisoformat(text))
+
+
+def text_ns(text):
+    """Epoch ns of a CSV Timestamp cell."""
+    return _to_ns(datetime.fromisoformat(text))
+
+
+# ---------------- Segments ----------------
+def _name_time(base):
+    for fmt in NAME_FORMATS:
+        try:
+            return _to_ns(datetime.strptime(base, fmt))
+        except ValueError:
+            pass
+    return None
+
+
+def _archive_spans(directory):
+    try:
+        with open(os.path.join(directory, ARCHIVE_INDEX)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def segments(directory):
+    """[(start ns, end ns or None, path), ...] of the data segments in `directory`, oldest first."""
+    found = {}
+    for name in os.listdir(directory):
+        for rank, ext in enumerate(EXT_PREFERENCE):
+            if name.endswith("_data" + ext):
+                base = name[:-len("_data" + ext)]
+                if base not in found or rank < found[base][0]:
+                    found[base] = (rank, name)
+                break
+
+    named = sorted((start, name) for start, name in
+                   ((_name_time(base), name) for base, (_, name) in found.items())
+                   if start is not None)
+    spans = _archive_spans(directory)
+    result = []
+    for i, (start, name) in enumerate(named):
+        # A segment ends before the next one starts (names are whole seconds)
+        end = named[i + 1][0] + clock.NS if i + 1 < len(named) else None
+        span = spans.get(name, {})
+        if isinstance(span.get("start"), int) and isinstance(span.get("end"), int):
+            start, end = span["start"], span["end"]
+        result.append((start, end, os.path.join(directory, name)))
+    return result
+
+
+# ---------------- CSV segments ----------------
+def _open_at(path, stored, skip):
+    """(file, binary stream) of `path` read from stored offset `stored`, `skip` raw bytes on."""
+    f = open(path, "rb")
+    f.seek(stored)
+    if path.endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=f)
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            f.close()
+            raise RuntimeError(f"{path}: zstandard is not installed")
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True))
+    else:
+        stream = f
+    while skip > 0:
+        chunk = stream.read(min(CHUNK, skip))
+        if not chunk:
+            break
+        skip -= len(chunk)
+    return f, stream
+
+
+def csv_headers(path):
+    f, stream = _open_at(path, 0, 0)
+    with f:
+        return next(csv.reader(io.TextIOWrapper(stream, encoding="utf-8", newline="")), [])
+
+
+def _csv_rows(path, start_ns, end_ns, width=0):
+    entries = log_index.read_index(log_index.index_path(path))
+    i = bisect.bisect_right([entry[0] for entry in entries], start_ns) - 1
+    if i >= 0 and entries[i][2] <= os.path.getsize(path):
+        _, offset, stored, member = entries[i]
+        f, stream = _open_at(path, stored, offset - member)
+    else:
+        f, stream = _open_at(path, 0, 0)
+    # Timestamp cells are fixed-width local time text, so they compare as strings
+    lo, hi = clock.format_ns(start_ns), clock.format_ns(end_ns)
+    with f:
+        reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+        if i < 0:
+            next(reader, None)          # header row
+        for row in reader:
+            if len(row) < max(1, width):
+                continue                # blank, or cut by a power loss
+            t = row[0]
+            if t < lo:
+                continue
+            if t > hi:
+                break
+            yield row
+
+
+# ---------------- Binary segments ----------------
+def _vbl_times(log):
+    """Timestamp column as int64 epoch ns ("time" = float seconds in older files)."""
+    import numpy as np
+    fd = log.fields[0]
+    ts = log.data[fd["name"]]
+    if fd["format"] == "time":
+        return (ts * clock.NS).astype(np.int64)
+    return ts.astype(np.int64)
+
+
+def _vbl_range(path, start_ns, end_ns):
+    import numpy as np
+    log = binlog.BinaryLog(path)
+    ts = _vbl_times(log)
+    a = int(np.searchsorted(ts, start_ns, "left"))
+    b = int(np.searchsorted(ts, end_ns, "right"))
+    return log, a, b
+
+
+def _vbl_rows(log, a, b):
+    try:
+        yield from log.rows(a, b)
+    finally:
+        log.close()
+
+
+# ---------------- Public API ----------------
+def read_range(path, start_ns, end_ns):
+    """(headers, iterator of CSV rows) of one segment's rows in [start_ns, end_ns]."""
+    if path.endswith(".vbl"):
+        log, a, b = _vbl_range(path, start_ns, end_ns)
+        return [fd["name"] for fd in log.fields], _vbl_rows(log, a, b)
+    headers = csv_headers(path)
+    return headers, _csv_rows(path, start_ns, end_ns, len(headers))
+
+
+def query(directory, start_ns, end_ns):
+    """Yield (path, headers, rows) for every segment overlapping [start_ns, end_ns], oldest first."""
+    for seg_start, seg_end, path in segments(directory):
+        if seg_start > end_ns or (seg_end is not None and seg_end < start_ns):
+            continue
+        headers, rows = read_range(path, start_ns, end_ns)
+        yield path, headers, rows
+
+
+def _array(values):
+    import numpy as np
+    try:
+        return np.array([float(v) if v != "" else math.nan for v in values], dtype=np.float64)
+    except ValueError:
+        return np.array(values, dtype=object)       # text columns (fault codes)
+
+
+def read_arrays(path, start_ns, end_ns, columns=None):
+    """
+    (rows, {column: numpy array}) of one segment's rows in [start_ns,
+    end_ns]. Timestamp is int64 epoch ns, numeric columns float64 (blank ->
+    NaN), text columns (fault codes) object. `columns` defaults to all of
+    the segment's; names it does not have are left out.
+    """
+    import numpy as np
+    if path.endswith(".vbl"):
+        log, a, b = _vbl_range(path, start_ns, end_ns)
+        try:
+            part = {}
+            for fd in log.fields:
+                name = fd["name"]
+                if columns and name not in columns:
+                    continue
+                if name == log.fields[0]["name"]:
+                    part[name] = _vbl_times(log)[a:b].copy()
+                elif fd["format"] == "faults":
+                    part[name] = np.array([binlog.format_value("faults", v)
+                                           for v in log.data[name][a:b].tolist()], dtype=object)
+                else:
+                    part[name] = log.column(name)[a:b]
+            return b - a, part
+        finally:
+            log.close()
+
+    headers, rows = read_range(path, start_ns, end_ns)
+    picks = [(name, j) for j, name in enumerate(headers) if not columns or name in columns]
+    values = {name: [] for name, _ in picks}
+    n = 0
+    for row in rows:
+        n += 1
+        for name, j in picks:
+            values[name].append(row[j] if j < len(row) else "")
+    return n, {name: np.array([text_ns(t) for t in col], dtype=np.int64) if name == headers[0]
+               else _array(col) for name, col in values.items()}
+
+
+def query_arrays(directory, start_ns, end_ns, columns=None):
+    """
+    {column: numpy array} of the rows in [start_ns, end_ns] across segments
+    (read_arrays() types; a column a segment lacks is NaN there).
+    `columns` defaults to the first segment's.
+    """
+    import numpy as np
+    parts = []
+    for seg_start, seg_end, path in segments(directory):
+        if seg_start > end_ns or (seg_end is not None and seg_end < start_ns):
+            continue
+        n, part = read_arrays(path, start_ns, end_ns, columns)
+        if columns is None:
+            columns = list(part)
+        parts.append((n, part))
+
+    result = {}
+    for name in columns or []:
+        pieces = [part[name] if name in part else np.full(n, np.nan) for n, part in parts]
+        result[name] = np.concatenate(pieces) if pieces else np.zeros(0)
+    return result
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract a time range from the telemetry logs")
+    parser.add_argument("start", nargs="?", help='"YYYY-MM-DD HH:MM[:SS]" or "HH:MM[:SS]" (today)')
+    parser.add_argument("end", nargs="?", help="End of the range, same formats")
+    parser.add_argument("--around", help="Centre of the range instead of start / end")
+    parser.add_argument("--minutes", type=float, default=10, help="Range length with --around")
+    parser.add_argument("--dir", help="Log directory (default: the logger's)")
+    parser.add_argument("--columns", help="Comma-separated columns (default: all)")
+    parser.add_argument("--out", help="Output CSV (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.around:
+        centre = parse_time(args.around)
+        half = int(args.minutes * 30 * clock.NS)
+        start_ns, end_ns = centre - half, centre + half
+    elif args.start and args.end:
+        start_ns, end_ns = parse_time(args.start), parse_time(args.end)
+    else:
+        parser.error("give START END or --around TIME")
+    if args.dir is None:
+        from utils.logger import log_dir
+        args.dir = log_dir
+    columns = args.columns.split(",") if args.columns else None
+
+    t0 = time.perf_counter()
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    writer = csv.writer(out)
+    rows = files = 0
+    try:
+        for _, headers, segment_rows in query(args.dir, start_ns, end_ns):
+            files += 1
+            names = columns or headers
+            if columns is None:
+                columns = headers
+            if files == 1:
+                writer.writerow(names)
+            picks = [headers.index(name) if name in headers else None for name in names]
+            for row in segment_rows:
+                writer.writerow([row[j] if j is not None and j < len(row) else "" for j in picks])
+                rows += 1
+    finally:
+        if args.out:
+            out.close()
+    print(f"[Query] {rows} rows from {files} segment(s) in {time.perf_counter() - t0:.3f}s "
+          f"({clock.format_ns(start_ns)} .. {clock.format_ns(end_ns)})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,27 @@
 # -*- coding: utf-8 -*-
 import csv
+import io
 import os
 import state
 import time
 import can
 import threading
-import queue
-from collections import deque
-from datetime import datetime, date
-import RPi.GPIO as GPIO
-
-# -------------------- GPIO --------------------
-GPIO.setmode(GPIO.BCM)
+from datetime import date, datetime, timedelta
+import config
+import hal
+from hal import GPIO
+from control import faults
+from utils import binlog
+from utils import clock
+from utils import diag
+from utils import log_index
+from utils.log_archive import LogArchiver
+from utils.aggregator import WindowAggregator
+from utils.row_queue import BoundedRowQueue
 
 # -------------------- Config --------------------
 BASE_DIR = "/home/orbit/VCU-PT-PRO-2.0/vcu_project/utils"
 log_dir = os.path.join(BASE_DIR, "logs")
-os.makedirs(log_dir, exist_ok=True)
 
 DATA_HEADERS = [
     "Timestamp",
@@ -30,26 +35,77 @@ DATA_HEADERS = [
     "BMS1_Cycles", "BMS1_Capacity", "BMS1_MOSFET_Temperature",
     # ----- BMS 2 -----
     "BMS2_BatteryVoltage", "BMS2_Current", "BMS2_SOH",
-    "BMS2_Cycles", "BMS2_Capacity", "BMS2_MOsSFET_Temperature"
+    "BMS2_Cycles", "BMS2_Capacity", "BMS2_MOsSFET_Temperature",
+    # ----- ACS712 -----
+    "ACS_Current_Mean", "ACS_Current_RMS", "ACS_Current_Peak",
+    # ----- Controller faults (active codes, control/faults.py) -----
+    "Faults_Left", "Faults_Right", "Faults_Rotary",
+    # ----- Monotonic stamp of the row (ns; with Timestamp, maps to wall time) -----
+    "Monotonic_ns"
 ]
 
-data_queue = queue.Queue()
-
-# ---------------- Averaging Config ----------------
-SAMPLE_RATE_HZ = 100
-LOG_RATE_HZ = 50
-SAMPLES_PER_LOG = 5  # Number of samples to average
-
-# ---------------- Buffers ----------------
-numeric_fields = [
-    "current_rpm", "rotary_current_rpm", "rotary_feedbackRPM",
-    "feedbackRPM_Left", "feedbackRPM_Right"
-]
-buffers = {field: deque(maxlen=SAMPLES_PER_LOG) for field in numeric_fields}
+# ---------------- Aggregation ----------------
+# config.LOG_AGG_FIELDS are sampled on every log_data call and reduced over
+# a window (utils/aggregator.py). A field's mean goes in its usual column
+# (AGG_COLUMNS, or the field name appended to the row); every other stat
+# in config.LOG_STATS gets a "<column>_<stat>" column at the end.
+AGG_COLUMNS = {
+    "current_rpm": "CurrentRPM",
+    "rotary_current_rpm": "RotaryCurrentRPM",
+    "device_5_rpm": "rotary_feedbackRPM",
+    "device_6_rpm": "FeedbackRPM_Left",
+    "device_4_rpm": "FeedbackRPM_Right",
+}
+AGG_NAMES = [AGG_COLUMNS.get(field, field) for field in config.LOG_AGG_FIELDS]
+AGG_STATS = ("mean",) + tuple(stat for stat in config.LOG_STATS if stat != "mean")
+BASE_HEADERS = list(DATA_HEADERS)
+DATA_HEADERS += [name for name in AGG_NAMES if name not in BASE_HEADERS]
+DATA_HEADERS += [f"{name}_{stat}" for name in AGG_NAMES for stat in AGG_STATS[1:]]
+
+# Binary log layout per column: (struct type, scale, format); unlisted = float32
+BINARY_FIELDS = {
+    "Timestamp": ("q", 1, "time_ns"), "Monotonic_ns": ("q", 1, None),
+    "CurrentRPM": ("h", 1, None), "RotaryCurrentRPM": ("h", 1, None),
+    "rotary_feedbackRPM": ("h", 0.1, None), "CurrentDirection": ("b", 1, None),
+    "FeedbackRPM_Left": ("h", 0.1, None), "FeedbackRPM_Right": ("h", 0.1, None),
+    "LeftBtn": ("B", 1, None), "RightBtn": ("B", 1, None),
+    "Seafty_switch": ("B", 1, None), "DirectionBtn": ("B", 1, None),
+    "temp_sesnor_1": ("h", 0.01, None), "temp_sesnor_2": ("h", 0.01, None),
+    "temp_sesnor_3": ("h", 0.01, None), "Mode": ("b", 1, None),
+    "BMS1_BatteryVoltage": ("H", 0.1, None), "BMS1_SOH": ("B", 1, None),
+    "BMS1_Cycles": ("H", 1, None), "BMS1_Capacity": ("H", 1, None),
+    "BMS1_MOSFET_Temperature": ("B", 1, None),
+    "BMS2_BatteryVoltage": ("H", 0.1, None), "BMS2_SOH": ("B", 1, None),
+    "BMS2_Cycles": ("H", 1, None), "BMS2_Capacity": ("H", 1, None),
+    "BMS2_MOsSFET_Temperature": ("B", 1, None),
+    "ACS_Current_Mean": ("h", 0.01, None), "ACS_Current_RMS": ("h", 0.01, None),
+    "ACS_Current_Peak": ("h", 0.01, None),
+    "Faults_Left": ("H", 1, "faults"), "Faults_Right": ("H", 1, "faults"),
+    "Faults_Rotary": ("H", 1, "faults"),
+}
+def _binary_field(name):
+    # Stat columns are stored like the column they summarise
+    base = name.rsplit("_", 1)[0] if name.endswith(tuple("_" + s for s in AGG_STATS)) else name
+    return BINARY_FIELDS.get(name) or BINARY_FIELDS.get(base, ("f", 1, None))
+
+
+DATA_FIELDS = [(name, *_binary_field(name)) for name in DATA_HEADERS]
+# Columns stored raw in the row and formatted only when written as CSV
+CSV_FORMATS = [(i, fmt) for i, (_, _, _, fmt) in enumerate(DATA_FIELDS) if fmt]
+
+data_queue = BoundedRowQueue(config.LOG_QUEUE_SIZE, config.LOG_QUEUE_POLICY)
+archiver = None
+
+# ---------------- Window ----------------
+aggregator = WindowAggregator(len(AGG_NAMES), round(config.LOG_WINDOW_S * config.LOG_SAMPLE_HZ),
+                              AGG_STATS)
+OUTPUT_EVERY = max(1, round(config.LOG_SAMPLE_HZ / config.LOG_OUTPUT_HZ))   # samples per row
+NAN = float("nan")
 
 # ---------------- BMS Setup ----------------
 BMS_IDS = ["0746D608", "0746CD62"] # cf11e04
 battery_data = {bms_id: {"decoded": {}} for bms_id in BMS_IDS}
+BMS_SIGNAL = {"0746D608": "bms1", "0746CD62": "bms2"}   # state freshness signal
 
 
 # ---------------- CAN Decode Functions ----------------
@@ -97,11 +153,12 @@ def parse_frame(bms_id, mux, data):
         decoded = decode_mux7(data)
     if decoded:
         battery_data[bms_id]["decoded"].update(decoded)
+        state.stamp(BMS_SIGNAL[bms_id])
 
 # ---------------- BMS Listener Thread ----------------
 def bms_listener_thread():
     try:
-        bus = can.interface.Bus(channel="can0", interface="socketcan")
+        bus = hal.open_can_bus("can0")
         print("[BMS] Listening on CAN0 ...")
         while True:
             msg = bus.recv()
@@ -115,62 +172,227 @@ def bms_listener_thread():
                         #print(msg)
                     parse_frame(hex_id, mux, list(msg.data))
     except Exception as e:
-        print(f"[BMS] Listener Error: {e}")
+        diag.error("BMS", "Listener Error: %s", e)
+
+# ---------------- Writer Thread ----------------
+def _csv_row(row):
+    """Format the raw columns (timestamp, fault words) of a queued row for CSV."""
+    row = list(row)
+    for i, fmt in CSV_FORMATS:
+        row[i] = binlog.format_value(fmt, row[i])
+    return row
+
+
+class LogSegment:
+    """
+    One log segment: a CSV and/or binary file named after its first row
+    (epoch ns). The CSV is formatted in memory and written as bytes so the
+    offset of every LOG_INDEX_EVERY-th row goes to its sidecar index
+    (utils/log_index.py) without asking the file.
+    """
+
+    def __init__(self, headers, ts):
+        self.start = ts
+        self.end = ts
+        day = date.fromtimestamp(ts // clock.NS)
+        self.next_day = int(datetime.combine(day + timedelta(days=1), datetime.min.time())
+                            .timestamp()) * clock.NS
+        self.rows = 0
+        self.bytes = 0
+        self.paths = []
+        self.f = self.writer = self.binary = self.index = None
+        base = os.path.join(log_dir, clock.format_ns(ts, 0, "%Y-%m-%d_%H%M%S_data"))
+        if config.LOG_FORMAT in ("csv", "both"):
+            self.paths.append(base + ".csv")
+            self.f = open(base + ".csv", "ab")
+            self.buf = io.StringIO()
+            self.writer = csv.writer(self.buf)
+            self.offset = self.f.tell()
+            if self.offset == 0:
+                self.writer.writerow(headers)
+                self._put_text()
+            self.index = log_index.IndexWriter(log_index.index_path(base + ".csv"))
+        if config.LOG_FORMAT in ("binary", "both"):
+            self.paths.append(base + ".vbl")
+            self.binary = binlog.BinaryLogWriter(base + ".vbl", DATA_FIELDS)
+
+    def _put_text(self):
+        data = self.buf.getvalue().encode()
+        self.buf.seek(0)
+        self.buf.truncate()
+        self.f.write(data)
+        self.offset += len(data)
+
+    def write_rows(self, rows):
+        if self.writer:
+            every = config.LOG_INDEX_EVERY
+            i = 0
+            while i < len(rows):
+                # Chunks end on index rows, so self.offset is where each one starts
+                k = (self.rows + i) % every
+                if k == 0:
+                    self.index.add(rows[i][0], self.offset)
+                j = min(len(rows), i + every - k)
+                self.writer.writerows(map(_csv_row, rows[i:j]))
+                self._put_text()
+                i = j
+        if self.binary:
+            for row in rows:
+                self.binary.write(row)
+        self.rows += len(rows)
+        self.end = rows[-1][0]
+        self.bytes = (self.offset if self.f else 0) + (self.binary.f.tell() if self.binary else 0)
+
+    def due(self, ts):
+        """
+        True when the row at `ts` belongs in a new segment (size as of the last
+        batch). A wall clock stepped back (NTP sync) also starts one.
+        """
+        return (ts - self.start >= config.LOG_SEGMENT_MINUTES * 60 * clock.NS
+                or ts >= self.next_day or ts < self.start
+                or self.bytes >= config.LOG_SEGMENT_KB * 1024)
+
+    def flush(self, fsync=False):
+        for f in (self.f, self.binary.f if self.binary else None, self.index.f if self.index else None):
+            if f:
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+
+    def close(self):
+        if self.f:
+            self.f.close()
+            self.index.close()
+        if self.binary:
+            self.binary.close()
+        info = {"start": self.start, "end": self.end, "rows": self.rows}
+        if archiver:
+            for path in self.paths:
+                archiver.submit(path, info)
+
+
+def _write_batch(segment, headers, batch):
+    """Write (enqueue time, row) pairs, starting new segments as they come due."""
+    chunk = []
+    for _, row in batch:
+        if segment is None or segment.due(row[0]):
+            if chunk:
+                segment.write_rows(chunk)
+                chunk = []
+            if segment:
+                segment.close()
+            segment = LogSegment(headers, row[0])
+        chunk.append(row)
+    segment.write_rows(chunk)
+    return segment
+
 
-# ---------------- CSV Writer Thread ----------------
 def _writer_thread(q, headers):
-    current_day, f, writer = None, None, None
-    flush_counter = 0
+    """
+    Drain the queue in batches of config.LOG_BATCH_ROWS. Files are flushed
+    every config.LOG_FLUSH_S and fsynced every config.LOG_FSYNC_S, so a
+    queued row reaches the OS within about LOG_FLUSH_S and the card within
+    about LOG_FSYNC_S (state.log_flush_latency / log_fsync_latency).
+    """
+    segment = None
+    unflushed = unsynced = None     # enqueue time of the oldest row not yet flushed / synced
+    last_flush = last_fsync = time.monotonic()
     while True:
+        batch = q.get_batch(config.LOG_BATCH_ROWS, timeout=config.LOG_FLUSH_S)
+        if batch is None:
+            break
         try:
-            row = q.get()
-            if row is None:
-                break
-
-            today = date.today()
-            if today != current_day:
-                if f:
-                    f.close()
-                filename = os.path.join(log_dir, f"{today}_data.csv")
-                f = open(filename, "a", newline="")
-                writer = csv.writer(f)
-                if os.stat(filename).st_size == 0:
-                    writer.writerow(headers)
-                current_day = today
-
-            writer.writerow(row)
-            flush_counter += 1
-            if flush_counter >= 10:
-                f.flush()
-                flush_counter = 0
+            if batch:
+                segment = _write_batch(segment, headers, batch)
+                if unflushed is None:
+                    unflushed = batch[0][0]
+                if unsynced is None:
+                    unsynced = batch[0][0]
+
+            now = time.monotonic()
+            if unflushed is not None and now - last_flush >= config.LOG_FLUSH_S:
+                fsync = (config.LOG_FSYNC_S > 0 and unsynced is not None
+                         and now - last_fsync >= config.LOG_FSYNC_S)
+                segment.flush(fsync)
+                done = time.monotonic()
+                state.log_flush_latency = done - unflushed
+                unflushed = None
+                last_flush = now
+                if fsync:
+                    state.log_fsync_latency = done - unsynced
+                    unsynced = None
+                    last_fsync = now
 
         except Exception as e:
-            print(f"[Logger] Error writing row: {e}")
-
-# Start threads
-threading.Thread(target=_writer_thread, args=(data_queue, DATA_HEADERS), daemon=True).start()
-threading.Thread(target=bms_listener_thread, daemon=True).start()
+            diag.error("Logger", "Error writing rows: %s", e)
+
+        state.log_queue_depth = len(q)
+        state.log_rows_queued = q.queued
+        state.log_rows_dropped = q.dropped
+
+    if segment:
+        segment.close()
+    if archiver:
+        archiver.stop()
+
+def init():
+    """Create the log folder and start the writer + BMS listener threads (startup phase)."""
+    global archiver
+    os.makedirs(log_dir, exist_ok=True)
+    archiver = LogArchiver(log_dir, config.LOG_COMPRESSION, budget_mb=config.LOG_DISK_BUDGET_MB)
+    archiver.submit_leftovers()
+    archiver.start()
+    threading.Thread(target=_writer_thread, args=(data_queue, DATA_HEADERS), daemon=True).start()
+    threading.Thread(target=bms_listener_thread, daemon=True).start()
 
 # ---------------- Utils ----------------
 def safe_val(val):
     return val if val is not None else 0
 
 
+def _blank(values):
+    """Row values from a numpy stats row: NaN (no valid sample) -> blank."""
+    return ["" if v != v else v for v in values.tolist()]
+
+
+def _sample(field):
+    """Current value of a state field for the window; stale or None -> NaN."""
+    value = state.fresh_value(field) if field in state.FIELD_SIGNAL else getattr(state, field, None)
+    return NAN if value is None else value
+
+
+def _fresh(name):
+    """Field value if fresh (state.is_fresh), else blank: stale is not logged as live."""
+    value = state.fresh_value(name)
+    return "" if value is None else value
+
+
+def _bms_fields(signal, decoded):
+    if not state.is_fresh(signal):
+        return [""] * 6
+    return [decoded.get(key, 0) for key in ("Battery_Voltage", "Battery_Current", "SOH",
+                                            "Cycles", "Battery_Capacity", "MOSFET_Temperature")]
+
+
 # ---------------- Public API ----------------
 def log_data(state):
-    """Collect samples and log row with averaged motor data and live BMS."""
-    # ---------------- Motor Buffers ----------------
-    buffers["current_rpm"].append(safe_val(getattr(state, "current_rpm", 0)))
-    buffers["rotary_current_rpm"].append(safe_val(getattr(state, "rotary_current_rpm", 0)))
-    buffers["rotary_feedbackRPM"].append(safe_val(getattr(state, "device_5_rpm", 0)))
-    buffers["feedbackRPM_Left"].append(safe_val(getattr(state, "device_6_rpm", 0)))
-    buffers["feedbackRPM_Right"].append(safe_val(getattr(state, "device_4_rpm", 0)))
-
-    # Wait until buffers fill
-    if len(buffers["current_rpm"]) < SAMPLES_PER_LOG:
+    """Sample the windowed fields; every OUTPUT_EVERY samples queue one row."""
+    aggregator.add([_sample(field) for field in config.LOG_AGG_FIELDS])
+    if aggregator.count % OUTPUT_EVERY:
         return
+    stats = aggregator.reduce()
+    means = dict(zip(AGG_NAMES, _blank(stats[0])))
 
-    ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    def column(name, field):
+        # Window mean when the field is aggregated, else its value now
+        if name in means:
+            return means[name]
+        value = _sample(field)
+        return "" if value != value else value
+
+    # Epoch ns: formatted by the writer thread (CSV) or stored as is (binary)
+    ts = time.time_ns()
+    mono = time.monotonic_ns()
 
     # ----- BMS data -----
     b1 = battery_data["0746D608"]["decoded"]
@@ -178,21 +400,21 @@ def log_data(state):
 
     row = [
         ts,
-        sum(buffers["current_rpm"]) / len(buffers["current_rpm"]),
-        sum(buffers["rotary_current_rpm"]) / len(buffers["rotary_current_rpm"]),
-        sum(buffers["rotary_feedbackRPM"]) / len(buffers["rotary_feedbackRPM"]),
+        column("CurrentRPM", "current_rpm"),
+        column("RotaryCurrentRPM", "rotary_current_rpm"),
+        column("rotary_feedbackRPM", "device_5_rpm"),
         getattr(state, "current_direction", 0),
-        sum(buffers["feedbackRPM_Left"]) / len(buffers["feedbackRPM_Left"]),
-        sum(buffers["feedbackRPM_Right"]) / len(buffers["feedbackRPM_Right"]),
+        column("FeedbackRPM_Left", "device_6_rpm"),
+        column("FeedbackRPM_Right", "device_4_rpm"),
         GPIO.input(getattr(state, "LEFT_BTN_PIN", 0)),
         GPIO.input(getattr(state, "RIGHT_BTN_PIN", 0)),
         GPIO.input(getattr(state, "MODE_SWITCH_PIN", 0)),
         GPIO.input(getattr(state, "DIRECTION_BTN_PIN", 0)),
 
         # Temperature sensors
-        state.temp_sesnor_1,
-        state.temp_sesnor_2,
-        state.temp_sesnor_3,
+        _fresh("temp_sesnor_1"),
+        _fresh("temp_sesnor_2"),
+        _fresh("temp_sesnor_3"),
         #state.power,             # W
         #state.total_energy,     # Wh
         #state.trip_runtime,  
@@ -200,31 +422,28 @@ def log_data(state):
         #GPIO.input(getattr(state, "ROTARY_SWITCH_PIN", 0)),
         getattr(state, "mode", 0),
 
-        # BMS1
-        b1.get("Battery_Voltage", 0),
-        b1.get("Battery_Current", 0),
-        b1.get("SOH", 0),
-        b1.get("Cycles", 0),
-        b1.get("Battery_Capacity", 0),
-        b1.get("MOSFET_Temperature", 0),
-
-        # BMS2
-        b2.get("Battery_Voltage", 0),
-        b2.get("Battery_Current", 0),
-        b2.get("SOH", 0),
-        b2.get("Cycles", 0),
-        b2.get("Battery_Capacity", 0),
-        b2.get("MOSFET_Temperature", 0),
-        
+        # BMS1, BMS2
+        *_bms_fields("bms1", b1),
+        *_bms_fields("bms2", b2),
+
+        # ACS712
+        _fresh("acs_current_mean"),
+        _fresh("acs_current_rms"),
+        _fresh("acs_current_peak"),
+
+        # Controller faults (raw error words)
+        faults.monitor.words[6],
+        faults.monitor.words[4],
+        faults.monitor.words[5],
+
+        mono,
     ]
-    print(b1.get("Battery_Current", 0))  # ? Will now print updated values
-    print(b2.get("Battery_Current", 0))
+    # Aggregated fields without a fixed column, then the extra stats per field
+    row += [means[name] for name in AGG_NAMES if name not in BASE_HEADERS]
+    row += _blank(stats[1:].T.ravel())
+    diag.debug("Logger", "BMS currents %s / %s", b1.get("Battery_Current", 0), b2.get("Battery_Current", 0))
     data_queue.put(row)
 
-    # Clear buffers
-    for field in buffers:
-        buffers[field].clear()
-
 def stop_logger():
-    data_queue.put(None)
+    data_queue.close()
     print("[Logger] Stopped.")
@@ -11,8 +11,9 @@ LAST_TRIP_FILE = "/home/orbit/VCU-PT-PRO-2.0/vcu_project/utils/logs/last_trip.js
 LAST_TRIP_DIR = os.path.dirname(LAST_TRIP_FILE)
 SAVE_INTERVAL = 60  # seconds
 
-# Internal time tracking
-_last_time = time.time()
+# Internal time tracking (monotonic ns: an NTP step of the wall clock must
+# not show up as hours of runtime)
+_last_time = time.monotonic_ns()
 
 
 # ------------------------
@@ -32,10 +33,10 @@ def update_energy(dt=None):
     dt = time difference in seconds, if None uses internal timer
     """
     global _last_time
-    now = time.time()
+    now = time.monotonic_ns()
     
     if dt is None:
-        dt = now - _last_time
+        dt = (now - _last_time) / 1e9
     
     dt_hours = dt / 3600.0
     _last_time = now
@@ -70,7 +71,7 @@ def _save_last_trip():
             data = {
                 "Last_trip_total_energy": state.total_energy,
                 "Last_trip_trip_runtime": state.trip_runtime,
-                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+                "timestamp_ns": time.time_ns()    # format with utils.clock.format_ns()
             }
 
             with open(LAST_TRIP_FILE, "w") as f:
@@ -108,7 +109,7 @@ def start_energy_monitor(interval=0.2, delay=10):
     delay = wait before starting calculations
     """
     global _last_time
-    _last_time = time.time()
+    _last_time = time.monotonic_ns()
 
     def delayed_start():
         print(f"[INFO] Energy monitor started after {delay}s delay")
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# row_queue.py
+# Bounded row queue between log_data (producer) and the logger's writer
+# thread (consumer).
+#
+# put() never blocks the producer. When the queue is full the policy decides
+# what is lost:
+#   drop_oldest   discard the oldest queued row (keep the newest data)
+#   drop_newest   discard the incoming row (keep the backlog contiguous)
+#   decimate      discard every second queued row, oldest first, so the
+#                 backlog keeps its full time span at half the resolution
+# Every row is queued with its monotonic enqueue time so the writer can
+# report queue-to-disk latency.
+import threading
+import time
+from collections import deque
+
+POLICIES = ("drop_oldest", "drop_newest", "decimate")
+
+
+class BoundedRowQueue:
+    def __init__(self, maxsize, policy="drop_oldest"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}'")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.queued = 0             # rows accepted
+        self.dropped = 0            # rows lost to the policy
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def put(self, row, _now=time.monotonic):
+        """Queue a row; returns False if the row itself was dropped."""
+        with self._cond:
+            rows = self._rows
+            if len(rows) >= self.maxsize:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+                if self.policy == "drop_oldest":
+                    rows.popleft()
+                    self.dropped += 1
+                else:
+                    kept = list(rows)[1::2]
+                    self.dropped += len(rows) - len(kept)
+                    rows.clear()
+                    rows.extend(kept)
+            rows.append((_now(), row))
+            self.queued += 1
+            if len(rows) > self.high_water:
+                self.high_water = len(rows)
+            self._cond.notify()
+            return True
+
+    def get_batch(self, max_rows, timeout=None):
+        """
+        Up to `max_rows` (enqueue time, row) pairs, oldest first. Waits up to
+        `timeout` for the first row; returns [] on timeout and None once the
+        queue is closed and empty.
+        """
+        with self._cond:
+            if not self._rows and not self._closed:
+                self._cond.wait(timeout)
+            rows = self._rows
+            if not rows:
+                return None if self._closed else []
+            n = min(max_rows, len(rows))
+            return [rows.popleft() for _ in range(n)]
+
+    def close(self):
+        """No more rows; the writer drains what is queued, then stops."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -1 +1,157 @@
 # Watchdog to keep system alive
+#
+# Each critical loop registers a heartbeat with a deadline and calls
+# beat() once per iteration (one monotonic clock read and a store). A
+# checker thread scans the heartbeats every CHECK_PERIOD; a loop whose
+# last beat is older than its deadline gets a graded response:
+#
+#   RESPONSE_LOG    report the miss and the recovery
+#   RESPONSE_STOP   + MotorManager.stop_all(emergency=True) on every check
+#                   while the loop stays hung
+#   RESPONSE_RESET  + stop feeding the hardware watchdog once the loop has
+#                   been hung for config.WATCHDOG_INTERVAL seconds, so the
+#                   board resets (only if config.WATCHDOG_DEVICE is set)
+#
+# Detection latency is at most deadline + CHECK_PERIOD. A heartbeat is
+# armed by its first beat, so slow start-up (LCD splash, ADC calibration)
+# does not count as a miss.
+import time
+import threading
+
+import config
+import state
+from utils import diag
+
+# ---------------- Config ----------------
+CHECK_PERIOD = 0.05
+
+RESPONSE_LOG = 0
+RESPONSE_STOP = 1
+RESPONSE_RESET = 2
+RESPONSE_NAMES = ("log", "stop", "reset")
+
+
+class Heartbeat:
+    __slots__ = ("name", "deadline", "response", "last", "missed_since", "misses")
+
+    def __init__(self, name, deadline, response):
+        self.name = name
+        self.deadline = deadline
+        self.response = response
+        self.last = None            # monotonic time of the last beat; None = not armed
+        self.missed_since = None    # deadline expiry of the current miss
+        self.misses = 0
+
+    def beat(self, _now=time.monotonic):
+        self.last = _now()
+
+
+class Watchdog:
+    def __init__(self, motor_manager=None, check_period=CHECK_PERIOD,
+                 reset_after=None, device=None):
+        self.motor_manager = motor_manager
+        self.check_period = check_period
+        self.reset_after = config.WATCHDOG_INTERVAL if reset_after is None else reset_after
+        self.device = config.WATCHDOG_DEVICE if device is None else device
+        self.heartbeats = []
+        self.max_latency = 0.0      # s between a deadline expiring and its detection
+        self._hw = None
+        self.running = False
+        self.thread = None
+
+    def register(self, name, deadline, response=RESPONSE_LOG):
+        """Add a loop to watch; returns the Heartbeat it must beat()."""
+        hb = Heartbeat(name, deadline, response)
+        self.heartbeats.append(hb)
+        return hb
+
+    # ----------- Hardware watchdog -----------
+    def _open_hw(self):
+        if not self.device:
+            return
+        try:
+            self._hw = open(self.device, "wb", buffering=0)
+            print(f"[WATCHDOG] Feeding {self.device}")
+        except OSError as e:
+            print(f"[WATCHDOG] Could not open {self.device}: {e}")
+            self._hw = None
+
+    def _feed_hw(self):
+        if self._hw:
+            try:
+                self._hw.write(b"\0")
+            except OSError as e:
+                diag.error("WATCHDOG", "feed failed: %s", e)
+
+    def _close_hw(self):
+        if self._hw:
+            try:
+                self._hw.write(b"V")    # magic close: disarm on clean exit
+                self._hw.close()
+            except OSError:
+                pass
+            self._hw = None
+
+    # ----------- Checking -----------
+    def check(self, now):
+        """One scan; returns True if the hardware watchdog may be fed."""
+        feed = True
+        for hb in self.heartbeats:
+            last = hb.last
+            if last is None:
+                continue
+            expiry = last + hb.deadline
+            if now <= expiry:
+                if hb.missed_since is not None:
+                    diag.info("WATCHDOG", "%s recovered after %.2fs", hb.name, now - hb.missed_since, every=0)
+                    hb.missed_since = None
+                continue
+
+            if hb.missed_since is None:
+                hb.missed_since = expiry
+                hb.misses += 1
+                latency = now - expiry
+                if latency > self.max_latency:
+                    self.max_latency = latency
+                    state.watchdog_max_latency = latency
+                state.watchdog_misses += 1
+                diag.warning("WATCHDOG", "%s missed its %.0f ms deadline (detected %.0f ms late, response: %s)",
+                             hb.name, hb.deadline * 1000, latency * 1000, RESPONSE_NAMES[hb.response], every=0)
+
+            if hb.response >= RESPONSE_STOP and self.motor_manager is not None:
+                try:
+                    self.motor_manager.stop_all(emergency=True)
+                except Exception as e:
+                    diag.error("WATCHDOG", "stop_all failed: %s", e)
+            if hb.response == RESPONSE_RESET and now - hb.missed_since >= self.reset_after:
+                feed = False
+        return feed
+
+    def run(self):
+        self._open_hw()
+        next_time = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            if self.check(now):
+                self._feed_hw()
+            state.watchdog_last_check = now
+
+            next_time += self.check_period
+            sleep_time = next_time - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_time = time.monotonic()
+        self._close_hw()
+
+    def start(self):
+        if not self.thread:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None